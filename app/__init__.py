@@ -1,17 +1,36 @@
-from dotenv import load_dotenv
+from app.config import load_env
+
+# Before the services are imported: their settings are read from the environment.
+load_env()
+
 from flask import Flask
 from app.routes.process import process_bp
 from app.routes.tools import tools
+from app.routes.jobs import jobs_bp
+from app.routes.health import health_bp
+from app.routes.metrics import metrics_bp, register_request_metrics
+from app.routes.admission import admission_bp, register_admission
+from app.services.dictionary import start_prewarm
+from app.services.jobs import resume_pending_jobs
+from app.utils.log import configure_logging
 from flask_cors import CORS
 
 
-load_dotenv()
-
 def create_app():
+    configure_logging()
     app=Flask(__name__)
     CORS(app,supports_credentials=True)
     app.register_blueprint(process_bp)
     app.register_blueprint(tools)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(admission_bp)
+    register_request_metrics(app)
+    register_admission(app)
+
+    resume_pending_jobs()
+    start_prewarm()
 
 
     return app
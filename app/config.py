@@ -0,0 +1,42 @@
+import os
+import threading
+from pathlib import Path
+from dotenv import load_dotenv
+
+ENV_PATH = Path(__file__).resolve().parent.parent / '.env'
+
+_env_loaded = False
+_config = None
+_lock = threading.Lock()
+
+
+def load_env():
+    """Loads .env into the environment once per process. Variables already set win."""
+    global _env_loaded
+    if not _env_loaded:
+        with _lock:
+            if not _env_loaded:
+                load_dotenv(ENV_PATH)
+                _env_loaded = True
+
+
+class Config:
+    """Credentials and backend choices, read from the environment once."""
+
+    def __init__(self, environ=None):
+        environ = os.environ if environ is None else environ
+        self.gemini_api_key = environ.get("GEMINI_API_KEY") or None
+        self.gemini_model = environ.get("GEMINI_MODEL", "gemini-1.5-flash")
+        self.ocr_space_api_key = environ.get("OCR_SPACE_API_KEY", "helloworld")
+        self.ocr_engine = environ.get("OCR_ENGINE", "remote").lower()
+        self.result_cache_backend = environ.get("RESULT_CACHE_BACKEND", "memory").lower()
+
+
+def get_config():
+    global _config
+    if _config is None:
+        load_env()
+        with _lock:
+            if _config is None:
+                _config = Config()
+    return _config
@@ -0,0 +1,68 @@
+import time
+from flask import Blueprint, g, jsonify, request
+from app.services.admission import (
+    ADMISSION_MAX_WAIT, ADMISSION_WAIT_SECONDS, LANES, Overloaded, admission_status, lane_for_path, lane_var,
+    max_wait_var, overloaded_body, retry_after_seconds
+)
+
+admission_bp = Blueprint('admission', __name__)
+
+@admission_bp.route('/admission', methods=['GET'])
+def admission():
+    """Lane queues of this worker and stage budget usage across the host."""
+    return jsonify(admission_status())
+
+
+def _max_wait():
+    """ADMISSION_MAX_WAIT, or less if the client sent X-Request-Timeout (seconds)."""
+    try:
+        requested = float(request.headers.get("X-Request-Timeout", ""))
+    except ValueError:
+        return ADMISSION_MAX_WAIT
+    return max(0.0, min(requested, ADMISSION_MAX_WAIT))
+
+
+def register_admission(app):
+    """
+    Admits /tools/* requests through the interactive lane and /process-and-simplify
+    requests through the documents lane. The lane also sets the priority of the
+    request's download, OCR and Gemini calls, and how long each may wait for a slot.
+    Rejected requests get a 429 with a Retry-After header.
+    """
+
+    @app.before_request
+    def enter_lane():
+        lane_name = lane_for_path(request.path)
+        if lane_name is None or request.method == "OPTIONS":
+            return
+
+        max_wait = _max_wait()
+        g.admission_tokens = (lane_var.set(lane_name), max_wait_var.set(max_wait))
+        started = time.monotonic()
+        LANES[lane_name].enter(max_wait)
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, queue=lane_name, lane=lane_name)
+        g.admission_lane = lane_name
+        g.admitted_at = time.monotonic()
+
+    @app.teardown_request
+    def leave_lane(error=None):
+        lane_name = g.pop("admission_lane", None)
+        if lane_name is not None:
+            LANES[lane_name].leave(time.monotonic() - g.pop("admitted_at"))
+
+        tokens = g.pop("admission_tokens", None)
+        if tokens is not None:
+            # Worker threads and greenlets are reused: don't leave the next request in this lane.
+            for var, token in zip((lane_var, max_wait_var), tokens):
+                try:
+                    var.reset(token)
+                except ValueError:
+                    # Torn down in another context (a streamed response), where the values were never set.
+                    pass
+
+    @app.errorhandler(Overloaded)
+    def overloaded(error):
+        response = jsonify(overloaded_body(error))
+        response.status_code = 429
+        response.headers["Retry-After"] = str(retry_after_seconds(error))
+        return response
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+from app.config import get_config
+from app.services.health import check_backends
+
+health_bp = Blueprint('health', __name__)
+
+@health_bp.route('/health', methods=['GET'])
+def health():
+    """Liveness: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """Readiness: which backends are usable. 503 until documents can be processed."""
+    is_ready, backends = check_backends()
+    return jsonify({
+        "status": "ready" if is_ready else "unavailable",
+        "ocr_engine": get_config().ocr_engine,
+        "backends": backends,
+    }), 200 if is_ready else 503
@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify, url_for
+from app.services.jobs import submit_job, get_job_store
+from app.services.pipeline import parse_process_request, parse_page_options
+
+jobs_bp = Blueprint('jobs', __name__)
+
+@jobs_bp.route('/jobs/process-and-simplify', methods=['POST'])
+def create_process_job():
+    data = request.get_json()
+    file_url, language, auto_detect, error = parse_process_request(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    page_ranges, max_pages, per_page, error = parse_page_options(data)
+    if error:
+        return jsonify({"error": error}), 400
+
+    callback_url = (data or {}).get("callback_url")
+    if callback_url and not callback_url.lower().startswith(("http://", "https://")):
+        return jsonify({"error": "callback_url must be an http(s) URL"}), 400
+
+    job_id = submit_job(
+        file_url,
+        language,
+        auto_detect,
+        callback_url=callback_url,
+        ocr_engine=data.get("ocr_engine"),
+        page_ranges=page_ranges,
+        max_pages=max_pages,
+        per_page=per_page
+    )
+    return jsonify({
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": url_for('jobs.get_job', job_id=job_id),
+    }), 202
+
+
+@jobs_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = get_job_store().get(job_id)
+    if job is None:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+
+    job.pop("callback_url", None)
+    return jsonify(job)
@@ -0,0 +1,73 @@
+import json
+import logging
+import time
+import uuid
+from flask import Blueprint, Response, g, request
+from app.services.metrics import HTTP_IN_FLIGHT, HTTP_REQUEST_SECONDS, render_metrics, start_request_timings
+from app.utils.log import request_id_var
+
+metrics_bp = Blueprint('metrics', __name__)
+logger = logging.getLogger(__name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+
+def _wants_timings():
+    value = request.args.get("timings") or request.headers.get("X-Debug-Timings")
+    return str(value).lower() in ("1", "true", "yes")
+
+
+def _endpoint_label():
+    return request.url_rule.rule if request.url_rule is not None else "unmatched"
+
+
+def register_request_metrics(app):
+    """
+    Times every request into the HTTP histogram and tracks in-flight requests. With
+    ?timings=1 (or an X-Debug-Timings: 1 header) JSON responses also carry a "timings"
+    object with the per-stage breakdown, mirrored in a Server-Timing header.
+    """
+
+    @app.before_request
+    def start_request():
+        g.request_started_at = time.perf_counter()
+        g.request_timings = start_request_timings()
+        request_id_var.set(request.headers.get("X-Request-ID") or uuid.uuid4().hex)
+        HTTP_IN_FLIGHT.inc(endpoint=_endpoint_label())
+
+    @app.after_request
+    def finish_request(response):
+        if "request_started_at" not in g:
+            return response
+
+        endpoint = _endpoint_label()
+        elapsed = time.perf_counter() - g.request_started_at
+        HTTP_IN_FLIGHT.dec(endpoint=endpoint)
+        HTTP_REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, method=request.method, status=response.status_code)
+        response.headers["X-Request-ID"] = request_id_var.get()
+
+        if endpoint != "/metrics":
+            logger.info(
+                "request finished",
+                extra={
+                    "method": request.method,
+                    "path": request.path,
+                    "status": response.status_code,
+                    "duration_ms": round(elapsed * 1000, 1),
+                }
+            )
+
+        if _wants_timings():
+            timings = g.request_timings.as_dict()
+            response.headers["Server-Timing"] = ", ".join(
+                [f"{stage};dur={entry['total_ms']}" for stage, entry in timings["stages"].items()]
+                + [f"total;dur={timings['total_ms']}"]
+            )
+            if response.is_json and not response.is_streamed:
+                body = response.get_json(silent=True)
+                if isinstance(body, dict):
+                    body["timings"] = timings
+                    response.set_data(json.dumps(body))
+        return response
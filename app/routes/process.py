@@ -1,82 +1,75 @@
-from flask import Blueprint, request, jsonify
-from app.services.ocr import extract_text_from_file, ocr_space_url, LANGUAGE_CODES
-from app.services.gemini import simplify_and_translate
-from app.utils.downloader import download_file_from_url
-import os
+import json
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from app.services.batch import run_batch, BATCH_MAX_ITEMS
+from app.services.cache import get_result_cache
+from app.services.llm import get_llm_metrics
+from app.services.pipeline import parse_process_request, parse_page_options, process_file_url, stream_process_file_url
+from app.utils.sse import sse_response, wants_stream
 
 process_bp = Blueprint('process', __name__)
 
 @process_bp.route('/process-and-simplify', methods=['POST'])
 def process_document():
     data = request.get_json()
-    file_url = data.get("file_url")
-    
-    language = data.get("language")
-    if language is None:
-        language = data.get("langauge", "English")
-    
-    auto_detect = data.get("auto_detect", False)
-    
-    if language not in LANGUAGE_CODES and language != "English":
-        return jsonify({
-            "error": f"Unsupported language: {language}. Supported languages are: {', '.join(LANGUAGE_CODES.keys())}"
-        }), 400
+    file_url, language, auto_detect, error = parse_process_request(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    if not file_url:
-        return jsonify({"error": "file_url is required"}), 400
+    page_ranges, max_pages, per_page, error = parse_page_options(data)
+    if error:
+        return jsonify({"error": error}), 400
 
-    try:
-        lower_url = file_url.lower()
-        direct_ocr = any(lower_url.endswith(ext) for ext in ['.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif'])
-        
-        if direct_ocr:
-            if auto_detect:
-                file_path = download_file_from_url(file_url)
-                extracted_text = extract_text_from_file(file_path, auto_detect=True)
-                
-                if os.path.exists(file_path):
-                    os.remove(file_path)
-            else:
-                ocr_lang_code = "eng"
-                
-                extracted_text = ocr_space_url(file_url, ocr_lang_code)
-        else:
-            file_path = download_file_from_url(file_url)
-            
-            extracted_text = extract_text_from_file(file_path, auto_detect=auto_detect)
-            
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        
-        if extracted_text.startswith("ERROR:"):
-            return jsonify({
-                "error": extracted_text,
-                "suggestion": "Make sure the document is properly formatted and contains actual text content."
-            }), 422
-        
-        if len(extracted_text.strip()) < 10:
-            return jsonify({
-                "error": "The OCR process produced too little text. The document may be blank or illegible.",
-                "original_text": extracted_text,
-                "suggestion": "Try a clearer document or a different file format."
-            }), 422
-        
-        result = simplify_and_translate(extracted_text, language)
-        
-        if result and result.startswith("Sorry,"):
-            return jsonify({
-                "error": result,
-                "original_text": extracted_text,
-                "language": language,
-            }), 422
-            
-        return jsonify({
-            "original_text": extracted_text,
-            "simplified_text": result,
-            "language": language,
-        })
-        
-    except Exception as e:
-        if 'file_path' in locals() and os.path.exists(file_path):
-            os.remove(file_path)
-        return jsonify({"error": str(e)}), 500
+    if wants_stream(data):
+        if per_page:
+            return jsonify({"error": "per_page is not supported for streaming responses"}), 400
+        return sse_response(stream_process_file_url(
+            file_url, language, auto_detect, ocr_engine=data.get("ocr_engine"), page_ranges=page_ranges, max_pages=max_pages
+        ))
+
+    body, status = process_file_url(
+        file_url,
+        language,
+        auto_detect,
+        simplify_mode=data.get("simplify_mode"),
+        ocr_engine=data.get("ocr_engine"),
+        page_ranges=page_ranges,
+        max_pages=max_pages,
+        per_page=per_page
+    )
+    return jsonify(body), status
+
+
+@process_bp.route('/process-and-simplify/batch', methods=['POST'])
+def process_batch():
+    data = request.get_json() or {}
+    items = data.get("items")
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "items must be a non-empty list of {file_url, language, auto_detect} objects"}), 400
+    if len(items) > BATCH_MAX_ITEMS:
+        return jsonify({"error": f"A batch can contain at most {BATCH_MAX_ITEMS} items"}), 400
+
+    defaults = {key: data[key] for key in ("language", "auto_detect", "pages", "max_pages") if key in data}
+    ocr_engine = data.get("ocr_engine")
+    results = run_batch(items, defaults=defaults, ocr_engine=ocr_engine)
+
+    if data.get("stream") or "application/x-ndjson" in request.headers.get("Accept", ""):
+        def generate():
+            for index, body, status_code in results:
+                yield json.dumps({"index": index, "status_code": status_code, **body}, ensure_ascii=False) + "\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    ordered = [None] * len(items)
+    for index, body, status_code in results:
+        ordered[index] = {"index": index, "status_code": status_code, **body}
+    return jsonify({"results": ordered})
+
+
+@process_bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    return jsonify(get_result_cache().stats())
+
+
+@process_bp.route('/llm-metrics', methods=['GET'])
+def llm_metrics():
+    return jsonify(get_llm_metrics())
@@ -1,10 +1,67 @@
+import json
+import logging
 from flask import Blueprint,request,jsonify
-from app.services.gemini import load_api_key
-from google import genai
+from app.services import llm
+from app.services.admission import Overloaded, overloaded_body
+from app.services.dictionary import WORD_BULK_MAX_WORDS, lookup_word, lookup_words, stream_lookup_word
+from app.services.gemini import stream_text
+from app.services.multitool import TOOLS_BATCH_MAX_TEXTS, parse_operations, run_tool_operations
+from app.services.singleflight import coalesce, flight_key
+from app.utils.sse import sse_response, wants_stream
 
 tools=Blueprint("tools",__name__)
-API_KEY=load_api_key()
-client = genai.Client(api_key=API_KEY)
+logger = logging.getLogger(__name__)
+
+def generate_text(prompt, endpoint):
+    """
+    Stripped text of one completion, or "" for an empty or blocked response. Identical
+    requests to the same tool in flight at the same time share one call.
+    """
+    def generate():
+        response = llm.generate(prompt, endpoint=endpoint)
+        return response.text.strip() if response.text else ""
+
+    return coalesce("tools", flight_key(endpoint, prompt), generate, share=bool)
+
+def stream_completion(prompt, result_key, error_message, endpoint):
+    """Yields SSE (event, data) tuples for a streamed completion, ending with a done or error event."""
+    pieces = []
+    try:
+        for piece in stream_text(prompt, endpoint=endpoint):
+            pieces.append(piece)
+            yield "token", {"text": piece}
+    except Overloaded as e:
+        yield "error", overloaded_body(e)
+        return
+    except Exception as e:
+        logger.error("An error occurred while streaming", extra={"endpoint": endpoint, "error": str(e)})
+        yield "error", {"error": error_message}
+        return
+
+    text = "".join(pieces).strip()
+    if not text:
+        logger.warning("Received an empty or blocked streamed response", extra={"endpoint": endpoint})
+        yield "error", {"error": error_message}
+        return
+    yield "done", {result_key: text}
+
+def stream_word_meaning(word, language):
+    """SSE (event, data) tuples for a word lookup, ending with the same body as the non-streaming route."""
+    error_message = f"Sorry, I couldn't find the meaning of '{word}'."
+    try:
+        for event, data in stream_lookup_word(word, language):
+            if event != "done":
+                yield event, data
+            elif data["meaning"] is None:
+                logger.warning("Received an empty or blocked meaning response", extra={"word": word})
+                yield "error", {"error": error_message}
+            else:
+                yield "done", {"result": json.dumps(data["meaning"], ensure_ascii=False), **data}
+    except Overloaded as e:
+        yield "error", overloaded_body(e)
+    except Exception as e:
+        logger.error("An error occurred while streaming word meaning", extra={"word": word, "error": str(e)})
+        yield "error", {"error": error_message}
 
 @tools.route("/tools/translate",methods=["POST"])
 def translate():
@@ -22,23 +79,23 @@ def translate():
     "{text}"
     {language} Translation:"""
 
-    print(f"--- Requesting Translation to {language} ---")
+    if wants_stream(data):
+        return sse_response(stream_completion(translate_prompt, "translated_text", "Sorry, I couldn't translate the text to the requested language.", "tools.translate"))
+
+    logger.debug("Requesting translation", extra={"language": language})
     try:
-        response_translate = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=translate_prompt
-        )
-        
-        if response_translate.text:
-            translated_text = response_translate.text.strip()
-            print(f"--- Translation to {language} Successful ---")
+        translated_text = generate_text(translate_prompt, "tools.translate")
+
+        if translated_text:
+            logger.debug("Translation successful", extra={"language": language})
             return jsonify({"translated_text":translated_text})
         else:
-            print(f"Warning: Received an empty or blocked translation response for {language}.")
-            print(f"Translation Response: {response_translate}")
+            logger.warning("Received an empty or blocked translation response", extra={"language": language})
             return jsonify({"error":"Sorry, I couldn't translate the text to the requested language."})
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"An error occurred during translation to {language}: {e}")
+        logger.error("An error occurred during translation", extra={"language": language, "error": str(e)})
         return jsonify({"error":"Sorry, I couldn't translate the text to the requested language."})
     
 
@@ -61,23 +118,23 @@ def summarize():
     
     Summary:"""
 
-    print("--- Requesting Text Summarization ---")
+    if wants_stream(data):
+        return sse_response(stream_completion(summarize_prompt, "summary", "Sorry, I couldn't summarize the provided text.", "tools.summarize"))
+
+    logger.debug("Requesting text summarization")
     try:
-        response_summarize = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=summarize_prompt
-        )
-        
-        if response_summarize.text:
-            summary_text = response_summarize.text.strip()
-            print("--- Summarization Successful ---")
+        summary_text = generate_text(summarize_prompt, "tools.summarize")
+
+        if summary_text:
+            logger.debug("Summarization successful")
             return jsonify({"summary": summary_text})
         else:
-            print("Warning: Received an empty or blocked summarization response.")
-            print(f"Summarization Response: {response_summarize}")
+            logger.warning("Received an empty or blocked summarization response")
             return jsonify({"error":"Sorry, I couldn't summarize the provided text."})
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"An error occurred during summarization: {e}")
+        logger.error("An error occurred during summarization", extra={"error": str(e)})
         return jsonify({"error":"Sorry, I couldn't summarize the provided text."})
 
 
@@ -100,23 +157,23 @@ def grammar_corrector():
     
     Corrected Text:"""
 
-    print("--- Requesting Grammar Correction ---")
+    if wants_stream(data):
+        return sse_response(stream_completion(grammar_prompt, "corrected_text", "Sorry, I couldn't correct the provided text.", "tools.grammar_corrector"))
+
+    logger.debug("Requesting grammar correction")
     try:
-        response_grammar = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=grammar_prompt
-        )
-        
-        if response_grammar.text:
-            corrected_text = response_grammar.text.strip()
-            print("--- Grammar Correction Successful ---")
+        corrected_text = generate_text(grammar_prompt, "tools.grammar_corrector")
+
+        if corrected_text:
+            logger.debug("Grammar correction successful")
             return jsonify({"corrected_text": corrected_text})
         else:
-            print("Warning: Received an empty or blocked grammar correction response.")
-            print(f"Grammar Correction Response: {response_grammar}")
+            logger.warning("Received an empty or blocked grammar correction response")
             return jsonify({"error":"Sorry, I couldn't correct the provided text."})
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"An error occurred during grammar correction: {e}")
+        logger.error("An error occurred during grammar correction", extra={"error": str(e)})
         return jsonify({"error":"Sorry, I couldn't correct the provided text."})
 
 
@@ -124,35 +181,73 @@ def grammar_corrector():
 def word_meaning():
     data = request.get_json()
     word = data.get("word")
+    language = data.get("language") or "English"
     
     if not word:
         return jsonify({
             "error":"please provide a word to look up"
         })
-    
-    meaning_prompt = f"""Please provide the meaning/definition of the following word.
-    Also include part of speech, and a simple example sentence:
 
-    Word: "{word}"
-    
-    Format the response as a JSON structure with fields: definition, part_of_speech, example"""
+    if wants_stream(data):
+        return sse_response(stream_word_meaning(word, language))
 
-    print(f"--- Requesting Meaning for '{word}' ---")
+    logger.debug("Requesting word meaning", extra={"word": word})
     try:
-        response_meaning = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=meaning_prompt
-        )
-        
-        if response_meaning.text:
-            meaning_text = response_meaning.text.strip()
-            print(f"--- Meaning for '{word}' Retrieved Successfully ---")
-            return jsonify({"result": meaning_text})
+        meaning, cached = lookup_word(word, language)
+
+        if meaning is not None:
+            logger.debug("Word meaning retrieved", extra={"word": word, "cached": cached})
+            # "result" keeps the JSON string earlier clients parse; "meaning" is the same entry as an object.
+            return jsonify({"result": json.dumps(meaning, ensure_ascii=False), "meaning": meaning, "cached": cached})
         else:
-            print(f"Warning: Received an empty or blocked meaning response for '{word}'.")
-            print(f"Meaning Response: {response_meaning}")
+            logger.warning("Received an empty or blocked meaning response", extra={"word": word})
             return jsonify({"error":f"Sorry, I couldn't find the meaning of '{word}'."})
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"An error occurred while getting meaning for '{word}': {e}")
+        logger.error("An error occurred while getting word meaning", extra={"word": word, "error": str(e)})
         return jsonify({"error":f"Sorry, I couldn't find the meaning of '{word}'."})
 
+
+
+@tools.route("/tools/word-meaning/bulk",methods=["POST"])
+def word_meaning_bulk():
+    data = request.get_json() or {}
+    words = data.get("words")
+    language = data.get("language") or "English"
+
+    if not isinstance(words, list) or not words or not all(isinstance(word, str) and word.strip() for word in words):
+        return jsonify({"error": "please provide words as a non-empty list of strings"}), 400
+    if len(words) > WORD_BULK_MAX_WORDS:
+        return jsonify({"error": f"At most {WORD_BULK_MAX_WORDS} words can be looked up per request"}), 400
+
+    results, calls = lookup_words(words, language)
+    return jsonify({"results": results, "calls": calls})
+
+
+@tools.route("/tools/batch",methods=["POST"])
+def tools_batch():
+    data = request.get_json() or {}
+    operations, error = parse_operations(data.get("operations"))
+    if error:
+        return jsonify({"error": error}), 400
+
+    texts = data.get("texts")
+    if texts is None and data.get("text"):
+        texts = [data["text"]]
+    if not isinstance(texts, list) or not texts or not all(isinstance(text, str) and text.strip() for text in texts):
+        return jsonify({"error": "please provide texts as a non-empty list of strings"}), 400
+    if len(texts) > TOOLS_BATCH_MAX_TEXTS:
+        return jsonify({"error": f"At most {TOOLS_BATCH_MAX_TEXTS} texts can be processed per request"}), 400
+
+    def run():
+        results, calls = run_tool_operations(operations, texts)
+        return {"results": results, "calls": calls}
+
+    outcome = coalesce(
+        "tools",
+        flight_key("tools.batch", operations, texts),
+        run,
+        share=lambda outcome: any("operations" in result for result in outcome["results"])
+    )
+    return jsonify(outcome)
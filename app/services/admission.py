@@ -0,0 +1,468 @@
+"""
+Admission control: bounds how much download, OCR and Gemini work runs at once, so a
+load spike delays requests instead of overrunning the providers' quotas and failing
+all of them together.
+
+Stage budgets (download, ocr, llm) are shared by every worker on the host through a
+SQLite file (ADMISSION_PATH). Each has a concurrency limit and an optional rate limit,
+and callers waiting for a stage are served in lane priority order: interactive
+/tools/* calls first, then synchronous document requests, then background work (jobs,
+pre-warming). Waiting callers only read the store, backing off up to
+ADMISSION_POLL_MAX_INTERVAL (a slot freed in the same worker wakes them at once), and
+write only to take a slot. A request waits for a stage at most as long as it may wait
+in its lane, then fails with Overloaded; background work waits as long as it takes.
+
+Request lanes bound the requests each worker takes on at once. Past the limit,
+requests wait in a bounded queue; when it is full, or the expected wait is longer than
+the request may wait, the request is rejected with Overloaded (429 with Retry-After)
+before any work is done.
+"""
+import contextvars
+import logging
+import math
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from app.services.metrics import ADMISSION_ACTIVE, ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS
+from app.utils.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+# Share the stage budgets across gunicorn workers through ADMISSION_PATH; otherwise each worker has its own.
+ADMISSION_SHARED = os.getenv("ADMISSION_SHARED", "true").lower() in ("1", "true", "yes")
+ADMISSION_PATH = os.getenv(
+    "ADMISSION_PATH",
+    os.path.join(tempfile.gettempdir(), "simplifai_admission.sqlite3")
+)
+# Host-wide stage budgets: concurrent calls and calls per second (0 = unlimited), with a burst of tokens.
+ADMISSION_DOWNLOAD_CONCURRENCY = int(os.getenv("ADMISSION_DOWNLOAD_CONCURRENCY", "16"))
+ADMISSION_OCR_CONCURRENCY = int(os.getenv("ADMISSION_OCR_CONCURRENCY", "8"))
+ADMISSION_OCR_RATE = float(os.getenv("ADMISSION_OCR_RATE", "0"))
+ADMISSION_OCR_BURST = int(os.getenv("ADMISSION_OCR_BURST", "5"))
+ADMISSION_LLM_CONCURRENCY = int(os.getenv("ADMISSION_LLM_CONCURRENCY", "16"))
+ADMISSION_LLM_RATE = float(os.getenv("ADMISSION_LLM_RATE", "0"))
+ADMISSION_LLM_BURST = int(os.getenv("ADMISSION_LLM_BURST", "10"))
+# Per-worker request lanes: requests running at once and requests allowed to wait (0 active = unlimited).
+ADMISSION_INTERACTIVE_MAX_ACTIVE = int(os.getenv("ADMISSION_INTERACTIVE_MAX_ACTIVE", "32"))
+ADMISSION_INTERACTIVE_QUEUE = int(os.getenv("ADMISSION_INTERACTIVE_QUEUE", "64"))
+ADMISSION_DOCUMENTS_MAX_ACTIVE = int(os.getenv("ADMISSION_DOCUMENTS_MAX_ACTIVE", "4"))
+ADMISSION_DOCUMENTS_QUEUE = int(os.getenv("ADMISSION_DOCUMENTS_QUEUE", "16"))
+# Longest a request waits in its lane's queue. Clients can ask for less with an X-Request-Timeout header.
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "30"))
+# A stage slot not released after this long (crashed worker) is reclaimed.
+ADMISSION_LEASE_SECONDS = float(os.getenv("ADMISSION_LEASE_SECONDS", "600"))
+# Waiting for a stage slot polls after ADMISSION_POLL_INTERVAL, doubling up to ADMISSION_POLL_MAX_INTERVAL.
+ADMISSION_POLL_INTERVAL = float(os.getenv("ADMISSION_POLL_INTERVAL", "0.05"))
+ADMISSION_POLL_MAX_INTERVAL = float(os.getenv("ADMISSION_POLL_MAX_INTERVAL", "1.0"))
+
+STAGE_BUDGETS = {
+    "download": {"concurrency": ADMISSION_DOWNLOAD_CONCURRENCY, "rate": 0.0, "burst": 1},
+    "ocr": {"concurrency": ADMISSION_OCR_CONCURRENCY, "rate": ADMISSION_OCR_RATE, "burst": max(1, ADMISSION_OCR_BURST)},
+    "llm": {"concurrency": ADMISSION_LLM_CONCURRENCY, "rate": ADMISSION_LLM_RATE, "burst": max(1, ADMISSION_LLM_BURST)},
+}
+
+# Lower goes first when callers wait for the same stage.
+LANE_PRIORITY = {"interactive": 0, "documents": 1, "background": 2}
+
+# Waiters refresh their row every third of this; one that stops (its worker died) drops out after this long.
+_WAITER_TTL = max(15.0, ADMISSION_POLL_MAX_INTERVAL * 15)
+
+lane_var = contextvars.ContextVar("simplifai_admission_lane", default="background")
+# Longest the current request may wait for a stage slot, in seconds (None = no limit).
+max_wait_var = contextvars.ContextVar("simplifai_admission_max_wait", default=None)
+
+
+class Overloaded(Exception):
+    """A request was not admitted. retry_after is the estimated wait in seconds."""
+
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"{lane} lane is overloaded ({reason})")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class StageBudgets:
+    """
+    Slot, waiter and token rows of the stage budgets. With path ":memory:" they are per
+    process. Database calls go through _run, as in SQLiteCache.
+    """
+
+    def __init__(self, path=ADMISSION_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # Notified when this process frees a slot or a place in line, so its waiters needn't wait for their next poll.
+        self._changed = threading.Condition()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._run(self._create)
+
+    def _run(self, func, *args):
+        with self._lock:
+            return run_blocking(func, *args)
+
+    def _execute(self, sql, params):
+        with self._conn:
+            self._conn.execute(sql, params)
+
+    def _create(self):
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            # Coordination state only: losing it in a crash just resets the budgets.
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS admission_slots ("
+                "id TEXT PRIMARY KEY, stage TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS admission_waiters ("
+                "id TEXT PRIMARY KEY, stage TEXT NOT NULL, priority INTEGER NOT NULL, "
+                "queued_at REAL NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS admission_tokens ("
+                "stage TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+
+    def enqueue(self, stage, ticket, priority, queued_at):
+        """Puts ticket in line for stage, or refreshes its row so it doesn't expire."""
+        self._run(
+            self._execute,
+            "INSERT OR REPLACE INTO admission_waiters (id, stage, priority, queued_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+            (ticket, stage, priority, queued_at, time.time() + _WAITER_TTL)
+        )
+
+    def check(self, stage, ticket, budget):
+        """
+        Whether ticket could take a slot now, without writing anything: it is first in
+        line for stage and the stage has a free slot and a rate token. Returns (ready,
+        delay, waiting): delay is how long until the next rate token (0 if not rate
+        limited) and waiting the stage's queue length.
+        """
+        ready, delay, waiting, _ = self._run(self._check, stage, ticket, budget, time.time())
+        return ready, delay, waiting
+
+    def _check(self, stage, ticket, budget, now):
+        waiting = self._conn.execute(
+            "SELECT COUNT(*) FROM admission_waiters WHERE stage = ? AND expires_at >= ?", (stage, now)
+        ).fetchone()[0]
+        head = self._conn.execute(
+            "SELECT id FROM admission_waiters WHERE stage = ? AND expires_at >= ? ORDER BY priority, queued_at, id LIMIT 1",
+            (stage, now)
+        ).fetchone()
+        if head is None or head[0] != ticket:
+            return False, 0.0, waiting, None
+
+        if budget["concurrency"] > 0:
+            active = self._conn.execute(
+                "SELECT COUNT(*) FROM admission_slots WHERE stage = ? AND expires_at >= ?", (stage, now)
+            ).fetchone()[0]
+            if active >= budget["concurrency"]:
+                return False, 0.0, waiting, None
+
+        tokens = None
+        if budget["rate"] > 0:
+            row = self._conn.execute(
+                "SELECT tokens, updated_at FROM admission_tokens WHERE stage = ?", (stage,)
+            ).fetchone()
+            tokens = budget["burst"] if row is None else min(budget["burst"], row[0] + (now - row[1]) * budget["rate"])
+            if tokens < 1:
+                return False, (1 - tokens) / budget["rate"], waiting, None
+        return True, 0.0, waiting, tokens
+
+    def try_acquire(self, stage, ticket, budget):
+        """
+        Takes a slot for ticket if check() still allows it, in one write transaction.
+        Returns (admitted, delay, waiting) as check() does.
+        """
+        admitted, delay, waiting = self._run(self._try_acquire, stage, ticket, budget, time.time())
+        if admitted:
+            self._notify()
+        return admitted, delay, waiting
+
+    def _try_acquire(self, stage, ticket, budget, now):
+        with self._conn:
+            self._conn.execute("DELETE FROM admission_slots WHERE expires_at < ?", (now,))
+            self._conn.execute("DELETE FROM admission_waiters WHERE expires_at < ?", (now,))
+            ready, delay, waiting, tokens = self._check(stage, ticket, budget, now)
+            if not ready:
+                return False, delay, waiting
+
+            if tokens is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO admission_tokens (stage, tokens, updated_at) VALUES (?, ?, ?)",
+                    (stage, tokens - 1, now)
+                )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO admission_slots (id, stage, expires_at) VALUES (?, ?, ?)",
+                (ticket, stage, now + ADMISSION_LEASE_SECONDS)
+            )
+            self._conn.execute("DELETE FROM admission_waiters WHERE id = ?", (ticket,))
+        return True, 0.0, waiting - 1
+
+    def wait(self, timeout):
+        """Sleeps up to timeout seconds, waking early when this process frees a slot or a place in line."""
+        with self._changed:
+            self._changed.wait(timeout)
+
+    def _notify(self):
+        with self._changed:
+            self._changed.notify_all()
+
+    def release(self, ticket):
+        self._run(self._execute, "DELETE FROM admission_slots WHERE id = ?", (ticket,))
+        self._notify()
+
+    def abandon(self, ticket):
+        self._run(self._execute, "DELETE FROM admission_waiters WHERE id = ?", (ticket,))
+        self._notify()
+
+    def status(self):
+        """{stage: {"active", "waiting"}} across every worker sharing the store."""
+        active, waiting = self._run(self._status, time.time())
+        return {stage: {"active": active.get(stage, 0), "waiting": waiting.get(stage, 0)} for stage in STAGE_BUDGETS}
+
+    def _status(self, now):
+        active = dict(self._conn.execute(
+            "SELECT stage, COUNT(*) FROM admission_slots WHERE expires_at >= ? GROUP BY stage", (now,)
+        ).fetchall())
+        waiting = dict(self._conn.execute(
+            "SELECT stage, COUNT(*) FROM admission_waiters WHERE expires_at >= ? GROUP BY stage", (now,)
+        ).fetchall())
+        return active, waiting
+
+
+_budgets = None
+_budgets_lock = threading.Lock()
+
+
+def get_stage_budgets():
+    """The stage budget store: shared across workers when enabled and available, else per process."""
+    global _budgets
+    if _budgets is None:
+        with _budgets_lock:
+            if _budgets is None:
+                if ADMISSION_SHARED:
+                    try:
+                        _budgets = StageBudgets()
+                    except Exception as e:
+                        logger.warning("Shared admission store unavailable, budgets apply per worker", extra={"error": str(e)})
+                if _budgets is None:
+                    _budgets = StageBudgets(":memory:")
+    return _budgets
+
+
+def _safely(method, *args):
+    try:
+        method(*args)
+    except Exception as e:
+        logger.warning("Admission store failed", extra={"error": str(e)})
+
+
+def _wait_for_slot(store, stage, ticket, priority, budget, deadline):
+    """Waits until ticket holds a slot of stage. Returns False if the store failed first."""
+    queued_at = time.time()
+    interval = ADMISSION_POLL_INTERVAL
+    refreshed = time.monotonic()
+    try:
+        store.enqueue(stage, ticket, priority, queued_at)
+    except Exception as e:
+        logger.warning("Admission store failed, running without a slot", extra={"stage": stage, "error": str(e)})
+        return False
+
+    while True:
+        try:
+            ready, delay, waiting = store.check(stage, ticket, budget)
+            if ready:
+                ready, delay, waiting = store.try_acquire(stage, ticket, budget)
+            if not ready and time.monotonic() - refreshed >= _WAITER_TTL / 3:
+                store.enqueue(stage, ticket, priority, queued_at)
+                refreshed = time.monotonic()
+        except Exception as e:
+            logger.warning("Admission store failed, running without a slot", extra={"stage": stage, "error": str(e)})
+            return False
+        ADMISSION_QUEUE_DEPTH.set(waiting, queue=stage)
+        if ready:
+            return True
+
+        timeout = min(max(delay, interval), ADMISSION_POLL_MAX_INTERVAL)
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Overloaded(lane_var.get(), "timeout", max(delay, max_wait_var.get() or 0.0))
+            timeout = min(timeout, remaining)
+        store.wait(timeout)
+        interval = min(interval * 2, ADMISSION_POLL_MAX_INTERVAL)
+
+
+@contextmanager
+def admit(stage):
+    """
+    Holds one slot of stage's budget for the duration of the block. Callers wait for it
+    in order of their lane's priority, then arrival, for at most max_wait_var seconds:
+    after that Overloaded is raised. If the store fails the call goes ahead unbounded
+    rather than failing.
+    """
+    budget = STAGE_BUDGETS[stage]
+    if not ADMISSION_ENABLED or (budget["concurrency"] <= 0 and budget["rate"] <= 0):
+        yield
+        return
+
+    lane = lane_var.get()
+    priority = LANE_PRIORITY.get(lane, LANE_PRIORITY["background"])
+    ticket = uuid.uuid4().hex
+    store = get_stage_budgets()
+    started = time.monotonic()
+    max_wait = max_wait_var.get()
+    try:
+        admitted = _wait_for_slot(store, stage, ticket, priority, budget, None if max_wait is None else started + max_wait)
+    except Overloaded as e:
+        _safely(store.abandon, ticket)
+        ADMISSION_REJECTED.inc(lane=lane, reason="timeout")
+        logger.warning(
+            "Request gave up waiting for a stage slot",
+            extra={"lane": lane, "stage": stage, "max_wait_s": max_wait, "retry_after_s": round(e.retry_after, 1)}
+        )
+        raise
+    except BaseException:
+        _safely(store.abandon, ticket)
+        raise
+
+    ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, queue=stage, lane=lane)
+    ADMISSION_ACTIVE.inc(queue=stage)
+    try:
+        yield
+    finally:
+        ADMISSION_ACTIVE.dec(queue=stage)
+        if admitted:
+            _safely(store.release, ticket)
+
+
+class Lane:
+    """Requests of one lane in this worker: at most max_active run and at most max_queue wait."""
+
+    def __init__(self, name, max_active, max_queue):
+        self.name = name
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue = deque()
+        # Moving average of how long admitted requests take, for wait estimates.
+        self._avg_seconds = None
+
+    def estimate_wait(self, position):
+        """Expected wait in seconds for the request at position (1-based) in the queue."""
+        avg_seconds = self._avg_seconds if self._avg_seconds is not None else 1.0
+        return position * avg_seconds / max(1, self.max_active)
+
+    def _reject(self, reason, retry_after):
+        ADMISSION_REJECTED.inc(lane=self.name, reason=reason)
+        logger.warning(
+            "Request rejected by admission control",
+            extra={"lane": self.name, "reason": reason, "queued": len(self._queue), "retry_after_s": round(retry_after, 1)}
+        )
+        return Overloaded(self.name, reason, retry_after)
+
+    def enter(self, max_wait):
+        """
+        Waits for this request's turn, at most max_wait seconds. Raises Overloaded if the
+        queue is full, the expected wait is longer than max_wait, or max_wait runs out.
+        """
+        if not ADMISSION_ENABLED or self.max_active <= 0:
+            return
+
+        with self._cond:
+            if self._active < self.max_active and not self._queue:
+                self._active += 1
+                ADMISSION_ACTIVE.set(self._active, queue=self.name)
+                return
+
+            estimate = self.estimate_wait(len(self._queue) + 1)
+            if len(self._queue) >= self.max_queue:
+                raise self._reject("queue_full", estimate)
+            if estimate > max_wait:
+                raise self._reject("deadline", estimate)
+
+            ticket = object()
+            self._queue.append(ticket)
+            ADMISSION_QUEUE_DEPTH.set(len(self._queue), queue=self.name)
+            deadline = time.monotonic() + max_wait
+            try:
+                while self._queue[0] is not ticket or self._active >= self.max_active:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise self._reject("timeout", self.estimate_wait(self._queue.index(ticket) + 1))
+                    self._cond.wait(remaining)
+                self._active += 1
+                ADMISSION_ACTIVE.set(self._active, queue=self.name)
+            finally:
+                self._queue.remove(ticket)
+                ADMISSION_QUEUE_DEPTH.set(len(self._queue), queue=self.name)
+                self._cond.notify_all()
+
+    def leave(self, seconds):
+        """Frees the slot of a request admitted by enter() that ran for seconds."""
+        if not ADMISSION_ENABLED or self.max_active <= 0:
+            return
+
+        with self._cond:
+            self._active -= 1
+            ADMISSION_ACTIVE.set(self._active, queue=self.name)
+            self._avg_seconds = seconds if self._avg_seconds is None else 0.8 * self._avg_seconds + 0.2 * seconds
+            self._cond.notify_all()
+
+    def status(self):
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "max_active": self.max_active,
+                "max_queue": self.max_queue,
+                "avg_seconds": round(self._avg_seconds, 3) if self._avg_seconds is not None else None,
+            }
+
+
+LANES = {
+    "interactive": Lane("interactive", ADMISSION_INTERACTIVE_MAX_ACTIVE, ADMISSION_INTERACTIVE_QUEUE),
+    "documents": Lane("documents", ADMISSION_DOCUMENTS_MAX_ACTIVE, ADMISSION_DOCUMENTS_QUEUE),
+}
+
+
+def lane_for_path(path):
+    """The lane a request path is admitted through, or None for requests that aren't gated."""
+    if path.startswith("/tools/"):
+        return "interactive"
+    if path.startswith("/process-and-simplify"):
+        return "documents"
+    return None
+
+
+def retry_after_seconds(error):
+    """Whole seconds for a Retry-After header, at least 1."""
+    return max(1, math.ceil(error.retry_after))
+
+
+def overloaded_body(error):
+    """Response body for a request rejected with Overloaded."""
+    return {"error": "The server is busy. Please retry later.", "retry_after": retry_after_seconds(error)}
+
+
+def admission_status():
+    """Lane and stage occupancy of this worker (lanes) and the host (stages)."""
+    status = {
+        "enabled": ADMISSION_ENABLED,
+        "lanes": {name: lane.status() for name, lane in LANES.items()},
+        "stages": {stage: dict(budget) for stage, budget in STAGE_BUDGETS.items()},
+    }
+    try:
+        for stage, counts in get_stage_budgets().status().items():
+            status["stages"][stage].update(counts)
+    except Exception as e:
+        logger.warning("Admission store failed", extra={"error": str(e)})
+    return status
@@ -0,0 +1,159 @@
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from app.services.admission import Overloaded, admit, overloaded_body
+from app.services.cache import hash_file
+from app.services.metrics import propagate_context, timed
+from app.services.ocr import ocr_language_prior
+from app.services.pipeline import (
+    parse_process_request, parse_page_options, add_failed_pages, check_extracted_text, document_key, extract_downloaded,
+    join_pages, simplify_document
+)
+from app.utils.downloader import download_file_from_url, DownloadError
+
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '50'))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '16'))
+BATCH_DOWNLOAD_CONCURRENCY = int(os.getenv('BATCH_DOWNLOAD_CONCURRENCY', '8'))
+BATCH_OCR_CONCURRENCY = int(os.getenv('BATCH_OCR_CONCURRENCY', '4'))
+BATCH_LLM_CONCURRENCY = int(os.getenv('BATCH_LLM_CONCURRENCY', '4'))
+
+# Shared by every batch request in the process, so concurrent batches compete for
+# the same download, OCR and LLM budgets instead of multiplying them.
+_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix="batch")
+_download_slots = threading.BoundedSemaphore(BATCH_DOWNLOAD_CONCURRENCY)
+_ocr_slots = threading.BoundedSemaphore(BATCH_OCR_CONCURRENCY)
+_llm_slots = threading.BoundedSemaphore(BATCH_LLM_CONCURRENCY)
+
+
+def _download(file_url):
+    with _download_slots, admit("download"), timed("download"):
+        return download_file_from_url(file_url)
+
+
+def _extract(file_path, key, auto_detect, ocr_engine, language="English", page_ranges=None, max_pages=None):
+    # Identical content is extracted once per OCR language, across this batch and any other request.
+    pages = extract_downloaded(
+        file_path, key, language=language, auto_detect=auto_detect, ocr_engine=ocr_engine, slots=_ocr_slots,
+        page_ranges=page_ranges, max_pages=max_pages
+    )
+    return join_pages(pages), pages if isinstance(pages, list) else []
+
+
+def _failure(e):
+    if isinstance(e, DownloadError):
+        return {"error": str(e)}, 400
+    if isinstance(e, Overloaded):
+        return overloaded_body(e), 429
+    return {"error": str(e)}, 500
+
+
+def _simplify(content_hash, extracted_text, language, auto_detect, pages=()):
+    result = simplify_document(content_hash, extracted_text, language, auto_detect, slots=_llm_slots)
+    if result and result.startswith("Sorry,"):
+        return add_failed_pages({
+            "error": result,
+            "original_text": extracted_text,
+            "language": language,
+        }, pages), 422
+
+    return add_failed_pages({
+        "original_text": extracted_text,
+        "simplified_text": result,
+        "language": language,
+    }, pages), 200
+
+
+def run_batch(items, defaults=None, ocr_engine=None):
+    """
+    Processes many documents at once. Items with the same file_url, auto_detect and
+    page selection (pages, max_pages) are downloaded once and extracted once per OCR
+    language prior, documents with identical content are OCR'd once per prior, and each
+    (document, language) pair is simplified once.
+    Yields (index, body, status_code) for every item as soon as it is finished, so a
+    failing item never fails the rest of the batch.
+    """
+    defaults = defaults or {}
+    results = queue.Queue()
+    groups = {}
+
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            yield index, {"error": "Each item must be an object with a file_url"}, 400
+            continue
+
+        file_url, language, auto_detect, error = parse_process_request({**defaults, **item})
+        if error:
+            yield index, {"error": error}, 400
+            continue
+
+        page_ranges, max_pages, per_page, error = parse_page_options({**defaults, **item})
+        if error or per_page:
+            yield index, {"error": error or "per_page is not supported in batches"}, 400
+            continue
+
+        priors = groups.setdefault((file_url, bool(auto_detect), page_ranges, max_pages), {})
+        languages = priors.setdefault(ocr_language_prior(language), {})
+        languages.setdefault(language, []).append(index)
+
+    def put_all(indexes, body, status_code):
+        for index in indexes:
+            results.put((index, body, status_code))
+
+    def simplify_group(content_hash, extracted_text, pages, language, auto_detect, indexes):
+        try:
+            body, status_code = _simplify(content_hash, extracted_text, language, auto_detect, pages)
+        except Overloaded as e:
+            body, status_code = overloaded_body(e), 429
+        except Exception as e:
+            body, status_code = {"error": str(e)}, 500
+        put_all(indexes, body, status_code)
+
+    def extract_languages(file_path, key, auto_detect, page_ranges, max_pages, languages):
+        # Every language here has the same OCR prior, so one extraction serves them all.
+        indexes_for_prior = [index for indexes in languages.values() for index in indexes]
+        try:
+            extracted_text, pages = _extract(
+                file_path, key, auto_detect, ocr_engine, next(iter(languages)), page_ranges, max_pages
+            )
+        except Exception as e:
+            put_all(indexes_for_prior, *_failure(e))
+            return
+
+        error = check_extracted_text(extracted_text)
+        if error:
+            put_all(indexes_for_prior, *error)
+            return
+
+        for language, indexes in languages.items():
+            try:
+                _executor.submit(
+                    propagate_context(simplify_group), key, extracted_text, pages, language, auto_detect, indexes
+                )
+            except Exception as e:
+                put_all(indexes, {"error": str(e)}, 500)
+
+    def extract_group(file_url, auto_detect, page_ranges, max_pages, priors):
+        file_path = None
+        try:
+            try:
+                file_path = _download(file_url)
+                key = document_key(hash_file(file_path), page_ranges, max_pages)
+            except Exception as e:
+                all_indexes = [index for languages in priors.values() for indexes in languages.values() for index in indexes]
+                put_all(all_indexes, *_failure(e))
+                return
+
+            for languages in priors.values():
+                extract_languages(file_path, key, auto_detect, page_ranges, max_pages, languages)
+        finally:
+            if file_path and os.path.exists(file_path):
+                os.remove(file_path)
+
+    pending = 0
+    for (file_url, auto_detect, page_ranges, max_pages), priors in groups.items():
+        pending += sum(len(indexes) for languages in priors.values() for indexes in languages.values())
+        _executor.submit(propagate_context(extract_group), file_url, auto_detect, page_ranges, max_pages, priors)
+
+    for _ in range(pending):
+        yield results.get()
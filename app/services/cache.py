@@ -0,0 +1,310 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from app.config import get_config
+from app.services import metrics as prom
+from app.utils.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_BACKEND = get_config().result_cache_backend
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1000'))
+RESULT_CACHE_TTL = float(os.getenv('RESULT_CACHE_TTL', str(7 * 24 * 3600)))
+RESULT_CACHE_PATH = os.getenv(
+    'RESULT_CACHE_PATH',
+    os.path.join(tempfile.gettempdir(), 'simplifai_cache.sqlite3')
+)
+# SQLite caches write hits and evict in one batch at most this often (or once this many
+# hits are pending), instead of writing on every read and scanning on every write.
+CACHE_MAINTENANCE_INTERVAL = float(os.getenv('CACHE_MAINTENANCE_INTERVAL', '30'))
+CACHE_MAX_PENDING_HITS = int(os.getenv('CACHE_MAX_PENDING_HITS', '1000'))
+
+
+def hash_file(file_path, chunk_size=1024 * 1024):
+    """
+    Returns the SHA-256 hex digest of a file, read in chunks so large
+    documents are never held in memory at once.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class MemoryCache:
+    """In-process LRU cache with a per-entry TTL."""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            value, created_at = entry
+            if self.ttl and time.time() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteCache:
+    """
+    On-disk cache shared by every worker on the host. Values are stored as JSON.
+    Entries are evicted by TTL and then least-recently-used once max_entries is reached.
+    Reads only read: access times are kept in memory and written, together with the
+    eviction pass, every CACHE_MAINTENANCE_INTERVAL seconds. Between passes the cache
+    can hold a few entries over max_entries, and recency reflects each worker's last flush.
+    Every database call goes through _run (see run_blocking), so under gevent a busy
+    database file stalls the caller rather than the whole worker.
+    """
+
+    def __init__(self, path=RESULT_CACHE_PATH, max_entries=RESULT_CACHE_MAX_ENTRIES, ttl=RESULT_CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._hits = {}
+        self._maintained_at = time.monotonic()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._run(self._create)
+
+    def _run(self, func, *args):
+        # The lock is taken on the calling thread or greenlet; only the database work
+        # runs through run_blocking, one call per store at a time.
+        with self._lock:
+            return run_blocking(func, *args)
+
+    def _create(self):
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+
+    def get(self, key):
+        value = self._run(self._get, key, time.time())
+        return None if value is None else json.loads(value)
+
+    def _get(self, key, now):
+        row = self._conn.execute(
+            "SELECT value, created_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        value, created_at = row
+        if self.ttl and now - created_at > self.ttl:
+            # Deleted by the next maintenance pass.
+            return None
+
+        self._hits[key] = now
+        self._maybe_maintain()
+        return value
+
+    def set(self, key, value):
+        self._run(self._set, key, json.dumps(value), time.time())
+
+    def _set(self, key, value, now):
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+        self._hits.pop(key, None)
+        self._maybe_maintain()
+
+    def add(self, key, value):
+        """Stores value only if key is absent. Returns True if it was stored."""
+        return self._run(self._add, key, json.dumps(value), time.time())
+
+    def _add(self, key, value, now):
+        with self._conn:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+        return cursor.rowcount == 1
+
+    def delete(self, key):
+        self._run(self._delete, key)
+
+    def _delete(self, key):
+        with self._conn:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        self._hits.pop(key, None)
+
+    def _maybe_maintain(self):
+        if time.monotonic() - self._maintained_at < CACHE_MAINTENANCE_INTERVAL and len(self._hits) < CACHE_MAX_PENDING_HITS:
+            return
+        self._maintained_at = time.monotonic()
+        self._maintain()
+
+    def maintain(self):
+        """
+        Writes the access times of pending hits, then deletes expired entries and the
+        least recently used ones beyond max_entries.
+        """
+        self._run(self._maintain)
+
+    def _maintain(self):
+        now = time.time()
+        hits, self._hits = self._hits, {}
+        try:
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE cache SET accessed_at = ? WHERE key = ? AND accessed_at < ?",
+                    [(accessed_at, key, accessed_at) for key, accessed_at in hits.items()]
+                )
+                if self.ttl:
+                    self._conn.execute("DELETE FROM cache WHERE created_at < ?", (now - self.ttl,))
+                excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+                if excess > 0:
+                    self._conn.execute(
+                        "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)", (excess,)
+                    )
+        except sqlite3.Error as e:
+            logger.warning("Cache maintenance failed", extra={"path": self.path, "error": str(e)})
+
+    def clear(self):
+        self._run(self._clear)
+
+    def _clear(self):
+        with self._conn:
+            self._conn.execute("DELETE FROM cache")
+        self._hits.clear()
+
+    def __len__(self):
+        return self._run(lambda: self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0])
+
+
+class ResultCache:
+    """
+    Caches the two expensive halves of the process-and-simplify pipeline separately:
+    the extracted text (keyed by content hash, auto_detect and the OCR language prior,
+    which can change the routed OCR language) and the simplified /
+    translated output (keyed by content hash, target language and auto_detect).
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._counters = {
+            "extracted": {"hits": 0, "misses": 0},
+            "result": {"hits": 0, "misses": 0},
+        }
+
+    def _get(self, kind, key):
+        try:
+            value = self.backend.get(f"{kind}:{key}")
+        except Exception as e:
+            logger.warning("Cache read failed", extra={"kind": kind, "error": str(e)})
+            value = None
+
+        hit = value is not None
+        prom.CACHE_REQUESTS.inc(kind=kind, result="hit" if hit else "miss")
+        with self._lock:
+            self._counters[kind]["hits" if hit else "misses"] += 1
+        return value
+
+    def _set(self, kind, key, value):
+        try:
+            self.backend.set(f"{kind}:{key}", value)
+        except Exception as e:
+            logger.warning("Cache write failed", extra={"kind": kind, "error": str(e)})
+
+    def get_extracted(self, content_hash, auto_detect, ocr_prior="eng"):
+        return self._get("extracted", f"{content_hash}:{int(bool(auto_detect))}:{ocr_prior}")
+
+    def set_extracted(self, content_hash, auto_detect, text, ocr_prior="eng"):
+        self._set("extracted", f"{content_hash}:{int(bool(auto_detect))}:{ocr_prior}", text)
+
+    def get_result(self, content_hash, language, auto_detect):
+        return self._get("result", f"{content_hash}:{language}:{int(bool(auto_detect))}")
+
+    def set_result(self, content_hash, language, auto_detect, text):
+        self._set("result", f"{content_hash}:{language}:{int(bool(auto_detect))}", text)
+
+    def stats(self):
+        with self._lock:
+            counters = {kind: dict(values) for kind, values in self._counters.items()}
+        try:
+            entries = len(self.backend)
+        except Exception:
+            entries = None
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": entries,
+            **counters,
+        }
+
+
+class NullCache:
+    """Backend used when caching is disabled."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+CACHE_BACKENDS = {
+    "memory": MemoryCache,
+    "sqlite": SQLiteCache,
+    "none": NullCache,
+}
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                backend_cls = CACHE_BACKENDS.get(RESULT_CACHE_BACKEND)
+                if backend_cls is None:
+                    logger.warning("Unknown RESULT_CACHE_BACKEND '%s', falling back to memory", RESULT_CACHE_BACKEND)
+                    backend_cls = MemoryCache
+                _result_cache = ResultCache(backend_cls())
+    return _result_cache
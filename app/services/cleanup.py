@@ -0,0 +1,282 @@
+"""
+Post-extraction cleanup, run before extracted text is cached and sent to Gemini.
+
+Pages (extract_from_pdf separates them with PAGE_BREAK; other formats are a single
+page) flow one at a time through a chain of generator stages: character
+normalization, whitespace collapsing, removal of headers, footers and page numbers
+repeated across pages, and joining of lines broken by OCR or hyphenation. Only the
+boilerplate stage holds pages back, and only the first CLEANUP_BOILERPLATE_WINDOW.
+iter_clean_pages pulls pages as they are extracted, so later stages can start on the
+first pages of a document before its last pages have been OCR'd.
+"""
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from app.services.metrics import CLEANUP_SAVED, record_stage
+from app.utils.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+PAGE_BREAK = "\f"
+
+CLEANUP_ENABLED = os.getenv("CLEANUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# Repeated headers and footers are learned from this many leading pages, then stripped
+# from every page. Only the first/last CLEANUP_EDGE_LINES lines of a page are candidates,
+# fewer on short pages so that at least one line in the middle is always kept as body.
+CLEANUP_BOILERPLATE_WINDOW = int(os.getenv("CLEANUP_BOILERPLATE_WINDOW", "8"))
+CLEANUP_EDGE_LINES = int(os.getenv("CLEANUP_EDGE_LINES", "2"))
+# An edge line is boilerplate when it appears on at least this share of the window's pages (and on two or more).
+CLEANUP_REPEAT_RATIO = float(os.getenv("CLEANUP_REPEAT_RATIO", "0.5"))
+# Text scoring below this (0-1, see text_quality) is treated as failed OCR and not sent to the model.
+TEXT_MIN_QUALITY = float(os.getenv("TEXT_MIN_QUALITY", "0.5"))
+
+# Zero-width space, BOM and soft hyphen. ZWJ/ZWNJ are kept: they matter in Indic scripts.
+INVISIBLE_CHARS = re.compile("[\u200b\ufeff\u00ad]")
+CONTROL_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]")
+HORIZONTAL_SPACE = re.compile(r"[ \t\u00a0\u2000-\u200a\u3000]+")
+# "3", "- 3 -", "Page 3 of 10", "p. iv", "पृष्ठ ३" on a line of its own.
+PAGE_NUMBER = re.compile(
+    r"^[\s\-\u2013\u2014|\[(]*"
+    r"(?:(?:page|p\.|pg\.?|\u092a\u0943\u0937\u094d\u0920)\s*[ivxlc]{1,6}"
+    r"|(?:(?:page|p\.|pg\.?|\u092a\u0943\u0937\u094d\u0920)\s*)?[\d\u0966-\u096f]{1,4}(?:\s*(?:of|/)\s*[\d\u0966-\u096f]{1,4})?)"
+    r"[\s\-\u2013\u2014|\])]*$",
+    re.IGNORECASE
+)
+# Table borders and column separators ("|", "+----+", "===") are layout, not OCR noise.
+TABLE_RULE = re.compile(r"[|+=_:\-\u2013\u2014\u2500-\u257f]+")
+# Characters allowed inside a word-like token besides letters, marks and digits:
+# "e-mail", "don't", "cu.ft", "1,250.50", "12/03/2024", "12:30", "18%".
+WORD_JOINERS = "-'\u2019.,/:%"
+CURRENCY_SIGNS = "\u20b9$\u20ac\u00a3"
+HYPHENATED_BREAK = re.compile(r"(\w)-\n(?=[a-z])")
+# A line that doesn't end a sentence, followed by one that starts in lower case (or in a
+# caseless script such as Devanagari), is the same paragraph broken by the page width.
+BROKEN_LINE = re.compile(r"(?<=[^\s.!?:;\u0964\u0965\"'\u201d\u2019)\]])\n(?=[a-z\u0900-\u097f])")
+
+
+def _normalize_chars(pages, stats):
+    for page in pages:
+        page = unicodedata.normalize("NFC", page.replace("\r\n", "\n").replace("\r", "\n"))
+        yield CONTROL_CHARS.sub("", INVISIBLE_CHARS.sub("", page))
+
+
+def _collapse_whitespace(pages, stats):
+    for page in pages:
+        lines = [HORIZONTAL_SPACE.sub(" ", line).strip() for line in page.split("\n")]
+        yield re.sub(r"\n{3,}", "\n\n", "\n".join(lines)).strip()
+
+
+def _edge_key(line):
+    """Comparison key for header/footer lines: case-folded, with numbers (dates, page numbers) masked."""
+    return re.sub(r"\d+", "#", line.casefold())
+
+
+def _edge_window(line_count):
+    """How many lines at each end of a page of line_count non-empty lines may be header or footer."""
+    return max(0, min(CLEANUP_EDGE_LINES, (line_count - 1) // 2))
+
+
+def _edge_lines(page):
+    lines = [line for line in page.split("\n") if line]
+    edge = _edge_window(len(lines))
+    return lines[:edge] + lines[len(lines) - edge:]
+
+
+def _repeated_edge_lines(pages):
+    counts = {}
+    for page in pages:
+        for key in {_edge_key(line) for line in _edge_lines(page)}:
+            counts[key] = counts.get(key, 0) + 1
+    needed = max(2, math.ceil(len(pages) * CLEANUP_REPEAT_RATIO))
+    return {key for key, count in counts.items() if count >= needed}
+
+
+def _strip_edges(page, repeated, stats):
+    """
+    Removes page numbers and repeated lines from the header and footer windows of a
+    page, working inwards from each end. A page is never emptied.
+    """
+    lines = page.split("\n")
+    content = [index for index, line in enumerate(lines) if line]
+    edge = _edge_window(len(content))
+    removed = set()
+    found = {"page_numbers": 0, "boilerplate_lines": 0}
+    for window in (content[:edge], content[len(content) - edge:][::-1]):
+        for index in window:
+            if PAGE_NUMBER.match(lines[index]):
+                found["page_numbers"] += 1
+            elif _edge_key(lines[index]) in repeated:
+                found["boilerplate_lines"] += 1
+            else:
+                break
+            removed.add(index)
+
+    stripped = "\n".join(line for index, line in enumerate(lines) if index not in removed).strip()
+    if not stripped:
+        return page
+    for key, count in found.items():
+        stats[key] += count
+    return stripped
+
+
+def _strip_boilerplate(pages, stats):
+    window = []
+    repeated = None
+    for page in pages:
+        if repeated is not None:
+            yield _strip_edges(page, repeated, stats)
+            continue
+        window.append(page)
+        if len(window) >= CLEANUP_BOILERPLATE_WINDOW:
+            repeated = _repeated_edge_lines(window)
+            for held in window:
+                yield _strip_edges(held, repeated, stats)
+            window = []
+
+    if repeated is None:
+        # A single page (DOCX, images) has no running headers or page numbers to learn.
+        if len(window) == 1:
+            yield window[0]
+            return
+        repeated = _repeated_edge_lines(window)
+        for held in window:
+            yield _strip_edges(held, repeated, stats)
+
+
+def _join_broken_lines(pages, stats):
+    for page in pages:
+        page, hyphenated = HYPHENATED_BREAK.subn(r"\1", page)
+        page, broken = BROKEN_LINE.subn(" ", page)
+        stats["joined_lines"] += hyphenated + broken
+        yield page
+
+
+STAGES = (_normalize_chars, _collapse_whitespace, _strip_boilerplate, _join_broken_lines)
+
+
+def _is_word_char(char):
+    return unicodedata.category(char)[0] in "LMN"
+
+
+def _plausible_word(core):
+    """True for a word or number token (surrounding punctuation already stripped)."""
+    if not core or len(core) > 30 or not any(_is_word_char(char) for char in core):
+        return False
+    if not all(_is_word_char(char) or char in WORD_JOINERS for char in core):
+        return False
+    # A lone Latin letter other than a/I is usually noise; lone Devanagari letters are real words.
+    return len(core) > 1 or not core.isascii() or core in ("a", "A", "I") or core.isdigit()
+
+
+def text_quality(text):
+    """
+    Cheap local score (0-1) of how much text looks like language rather than OCR noise:
+    the mean of the share of word characters among non-space characters and the share
+    of tokens that are plausible words or numbers. Table rules and separators are
+    skipped, so tables and invoices score like the text in their cells.
+    """
+    tokens = [token for token in text.split() if not TABLE_RULE.fullmatch(token)]
+    if not tokens:
+        return 0.0
+
+    chars = 0
+    word_chars = 0
+    words = 0
+    for token in tokens:
+        chars += len(token)
+        word_chars += sum(1 for char in token if _is_word_char(char))
+        core = token.strip(".,;:!?\"'“”‘’()[]{}-–—।॥").lstrip(CURRENCY_SIGNS)
+        if _plausible_word(core):
+            words += 1
+
+    return round((word_chars / chars + words / len(tokens)) / 2, 3)
+
+
+def iter_clean_pages(pages, stats=None):
+    """
+    Runs the cleanup stages lazily over an iterable of page texts, yielding one cleaned
+    text (possibly empty) per page, in order. Pages are pulled from the iterable only as
+    the stages need them. Once it is exhausted, stats (if given) is filled in as
+    described in clean_pages.
+    """
+    stats = {} if stats is None else stats
+    stats.update({"pages": 0, "boilerplate_lines": 0, "page_numbers": 0, "joined_lines": 0})
+    totals = {"chars": 0, "tokens": 0, "waiting": 0.0}
+
+    def source():
+        iterator = iter(pages)
+        while True:
+            started = time.perf_counter()
+            try:
+                page = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                totals["waiting"] += time.perf_counter() - started
+            stats["pages"] += 1
+            totals["chars"] += len(page)
+            totals["tokens"] += estimate_tokens(page)
+            yield page
+
+    if CLEANUP_ENABLED:
+        cleaned = source()
+        for stage in STAGES:
+            cleaned = stage(cleaned, stats)
+    else:
+        cleaned = (page.strip() for page in source())
+
+    # Time spent in the stages themselves, without waiting for pages or for the consumer.
+    busy = 0.0
+    cleaned_pages = []
+    while True:
+        started = time.perf_counter()
+        waited = totals["waiting"]
+        try:
+            page = next(cleaned)
+        except StopIteration:
+            break
+        finally:
+            busy += time.perf_counter() - started - (totals["waiting"] - waited)
+        cleaned_pages.append(page)
+        yield page
+
+    if CLEANUP_ENABLED:
+        record_stage("cleanup", busy)
+    _finish_stats(stats, totals, cleaned_pages)
+
+
+def _finish_stats(stats, totals, cleaned_pages):
+    before = totals["chars"]
+    after = sum(len(page) for page in cleaned_pages)
+    chars_saved = before - after
+    tokens_saved = totals["tokens"] - sum(estimate_tokens(page) for page in cleaned_pages)
+    stats.update({
+        "chars_before": before,
+        "chars_after": after,
+        "chars_saved": chars_saved,
+        "tokens_saved": tokens_saved,
+        "quality": text_quality("\n\n".join(cleaned_pages)),
+    })
+    CLEANUP_SAVED.inc(max(chars_saved, 0), unit="chars")
+    CLEANUP_SAVED.inc(max(tokens_saved, 0), unit="tokens")
+    logger.info("Extracted text cleaned", extra=stats)
+
+
+def clean_pages(pages):
+    """
+    Runs the cleanup stages over a list of page texts. Returns (cleaned_pages, stats)
+    with one cleaned text per page (possibly empty), where stats reports the characters
+    and estimated tokens saved and the quality score of the joined result.
+    """
+    stats = {}
+    cleaned_pages = list(iter_clean_pages(pages, stats))
+    return cleaned_pages, stats
+
+
+def clean_text(text):
+    """Cleans text whose pages are separated by PAGE_BREAK. Returns (cleaned_text, stats)."""
+    cleaned_pages, stats = clean_pages(text.split(PAGE_BREAK))
+    return "\n\n".join(page for page in cleaned_pages if page), stats
@@ -0,0 +1,354 @@
+"""
+Word-meaning lookups backed by a persistent store keyed by normalized word and
+language. Misses are read through to Gemini and stored as structured entries
+(definition, part_of_speech, example).
+
+The store can be pre-warmed from a word list, one word per line:
+
+    python -m app.services.dictionary words.txt --language English
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from app.services import llm
+from app.services.llm import types
+from app.services.admission import Overloaded
+from app.services.cache import SQLiteCache
+from app.services.metrics import CACHE_REQUESTS, timed
+from app.services.singleflight import coalesce, flight_key
+
+logger = logging.getLogger(__name__)
+
+WORD_CACHE_PATH = os.getenv(
+    "WORD_CACHE_PATH",
+    os.path.join(tempfile.gettempdir(), "simplifai_words.sqlite3")
+)
+WORD_CACHE_MAX_ENTRIES = int(os.getenv("WORD_CACHE_MAX_ENTRIES", "200000"))
+# Dictionary entries don't go stale quickly; 0 keeps them until evicted by size.
+WORD_CACHE_TTL = float(os.getenv("WORD_CACHE_TTL", "0"))
+# Misses in a bulk lookup are resolved this many words per model call.
+WORD_BATCH_SIZE = int(os.getenv("WORD_BATCH_SIZE", "50"))
+WORD_BULK_MAX_WORDS = int(os.getenv("WORD_BULK_MAX_WORDS", "200"))
+# Optional word list loaded into the store in the background at startup.
+WORD_CACHE_PREWARM_FILE = os.getenv("WORD_CACHE_PREWARM_FILE")
+
+MEANING_FIELDS = ("definition", "part_of_speech", "example")
+
+MEANING_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {field: {"type": "STRING"} for field in MEANING_FIELDS},
+    "required": list(MEANING_FIELDS),
+}
+
+BULK_MEANING_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "results": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {"word": {"type": "STRING"}, **MEANING_SCHEMA["properties"]},
+                "required": ["word", *MEANING_FIELDS],
+            },
+        },
+    },
+    "required": ["results"],
+}
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_word_store():
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SQLiteCache(path=WORD_CACHE_PATH, max_entries=WORD_CACHE_MAX_ENTRIES, ttl=WORD_CACHE_TTL)
+    return _store
+
+
+def normalize_word(word):
+    """Case-folded, NFC-normalized word with surrounding whitespace and punctuation removed."""
+    word = unicodedata.normalize("NFC", str(word)).strip()
+    word = word.strip("\"'“”‘’.,;:!?()[]{}<>«»।")
+    return re.sub(r"\s+", " ", word).casefold()
+
+
+def _store_key(word, language):
+    return f"{language.casefold()}:{word}"
+
+
+def parse_meaning(text):
+    """
+    Parses a model reply into {"definition", "part_of_speech", "example"}. Accepts JSON
+    (optionally inside a ``` fence) or "Field: value" lines; anything else becomes the
+    definition. Returns None for an empty reply.
+    """
+    text = (text or "").strip()
+    if not text:
+        return None
+
+    fenced = re.search(r"```(?:json)?\s*(.*?)```", text, re.DOTALL)
+    candidate = fenced.group(1) if fenced else text
+    try:
+        data = json.loads(candidate)
+    except ValueError:
+        data = None
+    if isinstance(data, list) and data and isinstance(data[0], dict):
+        data = data[0]
+
+    if isinstance(data, dict):
+        meaning = {field: str(data.get(field) or "").strip() for field in MEANING_FIELDS}
+    else:
+        meaning = {field: "" for field in MEANING_FIELDS}
+        for line in text.splitlines():
+            match = re.match(r"\s*[*-]*\s*\**(definition|meaning|part[ _]of[ _]speech|example(?: sentence)?)\**\s*[:\-]\s*(.+)", line, re.IGNORECASE)
+            if match:
+                label = match.group(1).lower().replace(" ", "_")
+                field = "definition" if label == "meaning" else "example" if label.startswith("example") else label
+                meaning[field] = match.group(2).strip().strip("*").strip()
+        if not any(meaning.values()):
+            meaning["definition"] = text
+
+    return meaning if meaning["definition"] else None
+
+
+def _meaning_prompt(word, language):
+    return f"""Please provide the meaning/definition of the following word.
+    Also include part of speech, and a simple example sentence.
+    Write the definition and example in {language}.
+
+    Word: "{word}"
+
+    Format the response as a JSON structure with fields: definition, part_of_speech, example"""
+
+
+def _bulk_meaning_prompt(words, language):
+    listed = "\n".join(f'    - "{word}"' for word in words)
+    return f"""Please provide the meaning/definition of each of the following words,
+    with its part of speech and a simple example sentence.
+    Write the definitions and examples in {language}.
+
+    Words:
+{listed}
+
+    Respond with JSON containing "results": one entry per word with fields word (exactly as given), definition, part_of_speech, example."""
+
+
+def _get_cached(word, language):
+    try:
+        meaning = get_word_store().get(_store_key(word, language))
+    except Exception as e:
+        logger.warning("Word cache read failed", extra={"word": word, "error": str(e)})
+        meaning = None
+    CACHE_REQUESTS.inc(kind="word", result="hit" if meaning is not None else "miss")
+    return meaning
+
+
+def _set_cached(word, language, meaning):
+    try:
+        get_word_store().set(_store_key(word, language), meaning)
+    except Exception as e:
+        logger.warning("Word cache write failed", extra={"word": word, "error": str(e)})
+
+
+def lookup_word(word, language="English"):
+    """
+    Read-through lookup of one word. Returns (meaning, cached) where meaning is the
+    structured entry, or (None, False) if the model gave no usable answer.
+    Concurrent misses for the same word share one model call. Raises on model errors.
+    """
+    normalized = normalize_word(word)
+    if not normalized:
+        return None, False
+
+    meaning = _get_cached(normalized, language)
+    if meaning is not None:
+        return meaning, True
+
+    def fetch():
+        with timed("word_meaning"):
+            response = llm.generate(
+                _meaning_prompt(normalized, language),
+                endpoint="tools.word_meaning",
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=MEANING_SCHEMA,
+                )
+            )
+        fetched = parse_meaning(response.text)
+        if fetched is not None:
+            _set_cached(normalized, language, fetched)
+        return fetched
+
+    meaning = coalesce(
+        "word", flight_key(_store_key(normalized, language)), fetch, share=lambda fetched: fetched is not None
+    )
+    return meaning, False
+
+
+def stream_lookup_word(word, language="English"):
+    """
+    Streaming counterpart of lookup_word. Yields ("token", {"text"}) events with the
+    model's reply as it is generated, then ("done", {"meaning", "cached"}); a stored
+    word yields only the done event. The reply is parsed and stored like lookup_word's;
+    meaning is None if the model gave no usable answer. Raises on model errors.
+    """
+    normalized = normalize_word(word)
+    if not normalized:
+        yield "done", {"meaning": None, "cached": False}
+        return
+
+    meaning = _get_cached(normalized, language)
+    if meaning is not None:
+        yield "done", {"meaning": meaning, "cached": True}
+        return
+
+    pieces = []
+    for piece in llm.stream(_meaning_prompt(normalized, language), endpoint="tools.word_meaning"):
+        pieces.append(piece)
+        yield "token", {"text": piece}
+
+    meaning = parse_meaning("".join(pieces))
+    if meaning is not None:
+        _set_cached(normalized, language, meaning)
+    yield "done", {"meaning": meaning, "cached": False}
+
+
+def _fetch_meanings(words, language):
+    """One structured call for a list of normalized words. Returns {word: meaning}."""
+    with timed("word_meaning"):
+        response = llm.generate(
+            _bulk_meaning_prompt(words, language),
+            endpoint="tools.word_meaning.bulk",
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=BULK_MEANING_SCHEMA,
+            )
+        )
+    if not response.text:
+        return {}
+
+    wanted = set(words)
+    meanings = {}
+    for entry in json.loads(response.text).get("results", []):
+        word = normalize_word(entry.get("word", ""))
+        meaning = parse_meaning(json.dumps(entry))
+        if word in wanted and meaning is not None:
+            meanings[word] = meaning
+    return meanings
+
+
+def lookup_words(words, language="English"):
+    """
+    Resolves many words at once: store hits are served locally and misses are sent to
+    the model WORD_BATCH_SIZE words per call. Returns (results, calls) with one result
+    per input word, in order: {"word", "meaning", "cached"} or {"word", "error"}.
+    """
+    normalized = [normalize_word(word) for word in words]
+    meanings = {}
+    cached = set()
+    misses = []
+    for word in dict.fromkeys(word for word in normalized if word):
+        meaning = _get_cached(word, language)
+        if meaning is None:
+            misses.append(word)
+        else:
+            meanings[word] = meaning
+            cached.add(word)
+
+    calls = 0
+    for start in range(0, len(misses), max(1, WORD_BATCH_SIZE)):
+        batch = misses[start:start + max(1, WORD_BATCH_SIZE)]
+        calls += 1
+        try:
+            fetched = _fetch_meanings(batch, language)
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error("Bulk word lookup failed", extra={"words": len(batch), "error": str(e)})
+            continue
+        for word, meaning in fetched.items():
+            _set_cached(word, language, meaning)
+            meanings[word] = meaning
+
+    results = []
+    for original, word in zip(words, normalized):
+        if word in meanings:
+            results.append({"word": original, "meaning": meanings[word], "cached": word in cached})
+        else:
+            results.append({"word": original, "error": f"Sorry, I couldn't find the meaning of '{original}'."})
+    return results, calls
+
+
+def prewarm_word_cache(path, language="English"):
+    """Looks up every word in a word list file (one per line) so later requests hit the store."""
+    with open(path, encoding="utf-8") as f:
+        words = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+    results, calls = lookup_words(words, language)
+    failed = sum(1 for result in results if "error" in result)
+    logger.info(
+        "Word cache pre-warmed",
+        extra={"file": path, "language": language, "words": len(words), "calls": calls, "failed": failed}
+    )
+    return results
+
+
+def prewarm_once(path, language="English"):
+    """
+    Runs prewarm_word_cache unless a worker sharing the store has already run, or is
+    running, it for a word list with the same content. A marker entry in the store
+    records the claim; it is removed if the pre-warm fails, so a later start retries.
+    Returns True if the pre-warm ran here.
+    """
+    with open(path, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    marker = f"#prewarm:{language.casefold()}:{digest}"
+
+    store = get_word_store()
+    if not store.add(marker, {"file": path, "pid": os.getpid()}):
+        logger.info("Word cache pre-warm already done by another worker", extra={"file": path, "language": language})
+        return False
+
+    try:
+        prewarm_word_cache(path, language)
+    except BaseException:
+        store.delete(marker)
+        raise
+    return True
+
+
+def start_prewarm():
+    """
+    Pre-warms the store from WORD_CACHE_PREWARM_FILE on a background thread, if
+    configured. Only the first worker to start runs it (see prewarm_once).
+    """
+    if not WORD_CACHE_PREWARM_FILE:
+        return
+
+    def run():
+        try:
+            prewarm_once(WORD_CACHE_PREWARM_FILE)
+        except Exception as e:
+            logger.error("Word cache pre-warm failed", extra={"file": WORD_CACHE_PREWARM_FILE, "error": str(e)})
+
+    threading.Thread(target=run, name="word-prewarm", daemon=True).start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Pre-warm the word-meaning store from a word list")
+    parser.add_argument("path", help="file with one word per line")
+    parser.add_argument("--language", default="English")
+    args = parser.parse_args()
+
+    from app.utils.log import configure_logging
+    configure_logging()
+    prewarm_word_cache(args.path, args.language)
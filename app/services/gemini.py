@@ -1,56 +1,247 @@
-from google import genai
+import json
+import logging
 import os
-import sys
-from pathlib import Path
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.services import llm
+from app.services.admission import Overloaded
+from app.services.llm import types
+from app.services.cleanup import text_quality, TEXT_MIN_QUALITY
+from app.services.metrics import propagate_context, timed
+from app.utils.chunking import estimate_tokens, split_text_into_chunks
 
-def load_api_key():
-    api_key = os.getenv("GEMINI_API_KEY")
-    
-    if not api_key:
-        try:
-            current_dir = Path(__file__).resolve().parent.parent.parent
-            env_path = current_dir / '.env'
-            
-            if env_path.exists():
-                with open(env_path, 'r') as f:
-                    for line in f:
-                        if line.strip() and '=' in line:
-                            key, value = line.strip().split('=', 1)
-                            if key == "GEMINI_API_KEY":
-                                api_key = value
-                                break
-        except Exception as e:
-            print(f"Error reading .env file: {e}")
-    
-    return api_key
-
-API_KEY = load_api_key()
-
-try:
-    if not API_KEY:
-        raise ValueError("API Key not found. Please set the GEMINI_API_KEY environment variable or add it to the .env file.")
-
-    client = genai.Client(api_key=API_KEY)
-    
-except ValueError as e:
-    print(f"Error: {e}")
-    print("Please make sure you have set the GEMINI_API_KEY environment variable or added it to the .env file.")
-    sys.exit(1)
-except Exception as e:
-    print(f"Error initializing Google GenAI client: {e}")
-    sys.exit(1)
-
-def simplify_and_translate(text_to_process: str, target_language: str):
+logger = logging.getLogger(__name__)
+
+# two_step: simplify, then translate the simplified text in a second call.
+# single_call: one call returning both as structured JSON.
+# ab: pick one of the two at random per request, to compare latency and token use.
+SIMPLIFY_MODE = os.getenv("SIMPLIFY_MODE", "two_step").lower()
+
+SIMPLIFY_TRANSLATE_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "simplified_text": {"type": "STRING"},
+        "translated_text": {"type": "STRING"},
+    },
+    "required": ["simplified_text", "translated_text"],
+}
+
+SIMPLIFY_ONLY_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "simplified_text": {"type": "STRING"},
+    },
+    "required": ["simplified_text"],
+}
+
+# Texts above this many (estimated) tokens are split into chunks that are simplified
+# concurrently and joined back in order. SIMPLIFY_REDUCE adds a final coherence pass.
+SIMPLIFY_CHUNK_TOKENS = int(os.getenv("SIMPLIFY_CHUNK_TOKENS", "6000"))
+SIMPLIFY_CHUNK_CONCURRENCY = int(os.getenv("SIMPLIFY_CHUNK_CONCURRENCY", "4"))
+SIMPLIFY_REDUCE = os.getenv("SIMPLIFY_REDUCE", "false").lower() in ("1", "true", "yes")
+
+OCR_FAILURE_MESSAGE = "Sorry, the OCR couldn't properly recognize the text in your image. This often happens with non-English text like Hindi or Marathi. Try a clearer image or different file format."
+
+def _record_usage(usage, response):
+    metadata = getattr(response, "usage_metadata", None)
+    if metadata is None:
+        return
+    usage["calls"] += 1
+    usage["input_tokens"] += getattr(metadata, "prompt_token_count", None) or 0
+    usage["output_tokens"] += getattr(metadata, "candidates_token_count", None) or 0
+
+def is_refusal(text):
+    """True if the model said the text can't be simplified instead of simplifying it."""
+    text = text.lower()
+    return "unintelligible" in text or "gibberish" in text or "simplification is impossible" in text
+
+def choose_simplify_mode(mode=None):
+    mode = (mode or SIMPLIFY_MODE).lower()
+    if mode == "ab":
+        return random.choice(("two_step", "single_call"))
+    if mode not in ("two_step", "single_call"):
+        return "two_step"
+    return mode
+
+def simplify_and_translate(text_to_process: str, target_language: str, progress=None, mode=None):
     if not text_to_process:
-        print("Input text is empty. Cannot process.")
+        logger.warning("Input text is empty. Cannot process.")
         return "Sorry, I couldn't process your request because the extracted text is empty."
 
-    if "unintelligible" in text_to_process.lower() or "gibberish" in text_to_process.lower():
-        return "Sorry, the OCR couldn't properly recognize the text in your image. This often happens with non-English text like Hindi or Marathi. Try a clearer image or different file format."
-        
-    if "unintelligible" in text_to_process.lower() or "simplification is impossible" in text_to_process.lower():
-        return "Sorry, the OCR couldn't properly recognize the text in your image. This often happens with non-English text like Hindi or Marathi. Try a clearer image or different file format."
+    if text_quality(text_to_process) < TEXT_MIN_QUALITY:
+        return OCR_FAILURE_MESSAGE
+
+    mode = choose_simplify_mode(mode)
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    start = time.perf_counter()
+
+    chunked = estimate_tokens(text_to_process) > SIMPLIFY_CHUNK_TOKENS
+    if chunked:
+        result = _simplify_and_translate_chunked(text_to_process, target_language, mode, progress, usage)
+    elif mode == "single_call":
+        result = _simplify_and_translate_single_call(text_to_process, target_language, progress, usage)
+    else:
+        result = _simplify_then_translate(text_to_process, target_language, progress, usage)
+
+    elapsed = time.perf_counter() - start
+    logger.info(
+        "simplify_and_translate finished",
+        extra={
+            "mode": mode,
+            "chunked": chunked,
+            "language": target_language,
+            "latency_s": round(elapsed, 3),
+            **usage,
+        }
+    )
+    return result
+
+def _simplify_and_translate_chunked(text_to_process, target_language, mode, progress, usage):
+    """
+    Map-reduce simplification for long texts: chunks are simplified (and translated)
+    concurrently, joined in their original order and optionally smoothed by one
+    reduce call, so latency tracks the slowest chunk rather than the total length.
+    """
+    chunks = split_text_into_chunks(text_to_process, SIMPLIFY_CHUNK_TOKENS)
+    process_chunk = _simplify_and_translate_single_call if mode == "single_call" else _simplify_then_translate
+    logger.info("Simplifying chunks concurrently", extra={"chunks": len(chunks)})
+
+    if progress:
+        progress("simplify", 0, len(chunks))
+
+    chunk_usages = [{"calls": 0, "input_tokens": 0, "output_tokens": 0} for _ in chunks]
+    done_lock = threading.Lock()
+    done = [0]
+
+    def run(index):
+        result = process_chunk(chunks[index], target_language, None, chunk_usages[index])
+        with done_lock:
+            done[0] += 1
+            chunks_done = done[0]
+        if progress:
+            progress("simplify", chunks_done, len(chunks))
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(SIMPLIFY_CHUNK_CONCURRENCY, len(chunks)))) as executor:
+        results = list(executor.map(propagate_context(run), range(len(chunks))))
+
+    for chunk_usage in chunk_usages:
+        for key in usage:
+            usage[key] += chunk_usage[key]
+
+    for result in results:
+        if result.startswith("Sorry,"):
+            return result
+
+    combined = "\n\n".join(results)
+    if not SIMPLIFY_REDUCE:
+        return combined
+
+    reduce_prompt = f"""The following text was simplified in separate sections and joined together.
+    Smooth it into one coherent text in {target_language}: remove repetition between sections and fix broken transitions,
+    but keep every piece of information and keep the language simple. Return only the final text.
+
+    Text:
+    "{combined}"
+
+    Final Text:"""
+
+    logger.debug("Requesting reduce pass")
+    try:
+        with timed("simplify_reduce"):
+            response_reduce = llm.generate(
+                reduce_prompt,
+                endpoint="simplify.reduce"
+            )
+        _record_usage(usage, response_reduce)
+
+        if response_reduce.text:
+            logger.debug("Reduce pass successful")
+            return response_reduce.text.strip()
+        logger.warning("Received an empty or blocked response during the reduce pass. Returning joined chunks.")
+    except Exception as e:
+        logger.error("An error occurred during the reduce pass. Returning joined chunks.", extra={"error": str(e)})
+
+    return combined
+
+def _simplify_and_translate_single_call(text_to_process, target_language, progress, usage):
+    translate = target_language != "English"
+
+    if translate:
+        prompt = f"""Simplify the following text and translate the simplified version into {target_language}.
+    The text might be in {target_language} or English, so handle both appropriately.
+    Make it easier to understand, using simpler words and shorter sentences if possible.
+    If the simplified text is already in {target_language}, use it as is for the translation.
+    If the text is unintelligible or gibberish, set both fields to "simplification is impossible".
+
+    Respond with JSON containing "simplified_text" and "translated_text" ({target_language}).
 
+    Original Text:
+    "{text_to_process}"
+
+    JSON:"""
+        schema = SIMPLIFY_TRANSLATE_SCHEMA
+    else:
+        prompt = f"""Simplify the following text in English.
+    Make it easier to understand, using simpler words and shorter sentences if possible.
+    If the text is unintelligible or gibberish, set the field to "simplification is impossible".
+
+    Respond with JSON containing "simplified_text".
+
+    Original Text:
+    "{text_to_process}"
+
+    JSON:"""
+        schema = SIMPLIFY_ONLY_SCHEMA
+
+    if progress:
+        progress("simplify")
+
+    logger.debug("Requesting simplification and translation (single call)", extra={"language": target_language})
+    try:
+        with timed("simplify_translate"):
+            response = llm.generate(
+                prompt,
+                endpoint="simplify.single_call",
+                config=types.GenerateContentConfig(
+                    response_mime_type="application/json",
+                    response_schema=schema,
+                )
+            )
+        _record_usage(usage, response)
+
+        if not response.text:
+            logger.warning("Received an empty or blocked response during simplification.", extra={"response": str(response)})
+            return "Sorry, I couldn't process your request. The text may be gibberish or unrecognizable."
+
+        data = json.loads(response.text)
+    except Overloaded:
+        raise
+    except Exception as e:
+        logger.error("An error occurred during simplification", extra={"error": str(e)})
+        return "Sorry, I couldn't process your request due to an error during simplification."
+
+    simplified_text = (data.get("simplified_text") or "").strip()
+    if is_refusal(simplified_text):
+        return OCR_FAILURE_MESSAGE
+
+    if not translate:
+        if not simplified_text:
+            return "Sorry, I couldn't process your request because the simplification step failed."
+        logger.debug("Simplification successful")
+        return simplified_text
+
+    translated_text = (data.get("translated_text") or "").strip()
+    if not translated_text:
+        logger.warning("Received an empty translation", extra={"language": target_language})
+        return "Sorry, I couldn't translate the text to the requested language."
+
+    logger.debug("Simplification and translation successful", extra={"language": target_language})
+    return translated_text
+
+def _simplify_then_translate(text_to_process, target_language, progress, usage):
     simplify_prompt = f"""Simplify the following text. The text might be in {target_language} or English, so handle both appropriately. 
     If you detect the text is already in {target_language}, just pass it through without trying to translate it yet.
     Make it easier to understand, using simpler words and shorter sentences if possible.
@@ -60,31 +251,36 @@ def simplify_and_translate(text_to_process: str, target_language: str):
 
     Simplified Text:"""
 
-    print(f"--- Requesting Simplification (for translation to {target_language}) ---")
+    if progress:
+        progress("simplify")
+
+    logger.debug("Requesting simplification", extra={"language": target_language})
     simplified_text = None
     try:
-        response_simplify = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=simplify_prompt
-        )
+        with timed("simplify"):
+            response_simplify = llm.generate(
+                simplify_prompt,
+                endpoint="simplify"
+            )
+        _record_usage(usage, response_simplify)
         
         if response_simplify.text:
             simplified_text = response_simplify.text.strip()
-            print("--- Simplification Successful ---")
-            print(f"Simplified intermediate text: {simplified_text}")
+            logger.debug("Simplification successful", extra={"simplified_chars": len(simplified_text)})
             
-            if "unintelligible" in simplified_text.lower() or "gibberish" in simplified_text.lower() or "simplification is impossible" in simplified_text.lower():
-                return "Sorry, the OCR couldn't properly recognize the text in your image. This often happens with non-English text like Hindi or Marathi. Try a clearer image or different file format."
+            if is_refusal(simplified_text):
+                return OCR_FAILURE_MESSAGE
         else:
-            print("Warning: Received an empty or blocked response during simplification.")
-            print(f"Simplification Response: {response_simplify}")
+            logger.warning("Received an empty or blocked response during simplification.", extra={"response": str(response_simplify)})
             return "Sorry, I couldn't process your request. The text may be gibberish or unrecognizable."
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"An error occurred during simplification: {e}")
+        logger.error("An error occurred during simplification", extra={"error": str(e)})
         return "Sorry, I couldn't process your request due to an error during simplification."
 
     if not simplified_text:
-         print("Skipping translation because simplification failed or produced empty text.")
+         logger.warning("Skipping translation because simplification failed or produced empty text.")
          return "Sorry, I couldn't process your request because the simplification step failed."
 
     translate_prompt = f"""Translate the following text into {target_language}:
@@ -95,25 +291,74 @@ def simplify_and_translate(text_to_process: str, target_language: str):
 
     {target_language} Translation:"""
 
-    print(f"--- Requesting Translation to {target_language} ---")
+    if progress:
+        progress("translate")
+
+    logger.debug("Requesting translation", extra={"language": target_language})
     translated_text = None
     try:
-        response_translate = client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=translate_prompt
-        )
+        with timed("translate"):
+            response_translate = llm.generate(
+                translate_prompt,
+                endpoint="translate"
+            )
+        _record_usage(usage, response_translate)
         
         if response_translate.text:
             translated_text = response_translate.text.strip()
-            print(f"--- Translation to {target_language} Successful ---")
+            logger.debug("Translation successful", extra={"language": target_language})
             return translated_text
         else:
-            print(f"Warning: Received an empty or blocked translation response for {target_language}.")
-            print(f"Translation Response: {response_translate}")
+            logger.warning("Received an empty or blocked translation response.", extra={"language": target_language, "response": str(response_translate)})
             return "Sorry, I couldn't translate the text to the requested language."
+    except Overloaded:
+        raise
     except Exception as e:
-        print(f"An error occurred during translation to {target_language}: {e}")
+        logger.error("An error occurred during translation", extra={"language": target_language, "error": str(e)})
         return "Sorry, an error occurred while translating your text."
 
+def stream_text(prompt, endpoint="stream"):
+    """Yields the text of a Gemini completion piece by piece as it is generated."""
+    yield from llm.stream(prompt, endpoint=endpoint)
+
+def stream_simplify_and_translate(text_to_process: str, target_language: str, check_quality=True):
+    """
+    Streaming counterpart of simplify_and_translate. Simplifies and writes the result in
+    target_language with one streamed call per chunk, yielding text as it arrives.
+    check_quality=False skips the quality gate, for the tail of a document whose text
+    already passed it. Raises ValueError with a user-facing "Sorry, ..." message when
+    the text can't be processed.
+    """
+    if not text_to_process:
+        raise ValueError("Sorry, I couldn't process your request because the extracted text is empty.")
+
+    if check_quality and text_quality(text_to_process) < TEXT_MIN_QUALITY:
+        raise ValueError(OCR_FAILURE_MESSAGE)
 
+    if estimate_tokens(text_to_process) > SIMPLIFY_CHUNK_TOKENS:
+        chunks = split_text_into_chunks(text_to_process, SIMPLIFY_CHUNK_TOKENS)
+    else:
+        chunks = [text_to_process]
 
+    logger.info("Streaming simplification", extra={"language": target_language, "chunks": len(chunks)})
+    for index, chunk in enumerate(chunks):
+        if index:
+            yield "\n\n"
+
+        prompt = f"""Simplify the following text and write the simplified version in {target_language}.
+    The text might be in {target_language} or English, so handle both appropriately.
+    Make it easier to understand, using simpler words and shorter sentences if possible.
+    Return only the simplified {target_language} text.
+
+    Original Text:
+    "{chunk}"
+
+    Simplified {target_language} Text:"""
+
+        try:
+            yield from stream_text(prompt, endpoint="simplify.stream")
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error("An error occurred during streamed simplification", extra={"error": str(e)})
+            raise ValueError("Sorry, I couldn't process your request due to an error during simplification.") from e
@@ -0,0 +1,40 @@
+import shutil
+from app.config import get_config
+from app.utils.lazy import module_available
+
+
+def check_backends():
+    """
+    Reports which backends this process can use, without importing heavy libraries or
+    calling external APIs. Returns (ready, backends); ready means documents and tools
+    can be served with the configured default OCR engine.
+    """
+    config = get_config()
+    tesseract = module_available("pytesseract") and shutil.which("tesseract") is not None
+
+    backends = {
+        "gemini": {
+            "available": bool(config.gemini_api_key) and module_available("google.genai"),
+            "api_key_configured": bool(config.gemini_api_key),
+            "model": config.gemini_model,
+        },
+        "ocr_space": {
+            "available": True,
+            "demo_key": config.ocr_space_api_key == "helloworld",
+        },
+        "tesseract": {"available": tesseract},
+        "pdf": {"available": module_available("fitz")},
+        "docx": {"available": module_available("docx")},
+        "opencv": {"available": module_available("cv2")},
+        "result_cache": {"available": True, "backend": config.result_cache_backend},
+    }
+
+    if config.ocr_engine == "remote":
+        ocr_ready = backends["ocr_space"]["available"]
+    elif config.ocr_engine == "local":
+        ocr_ready = tesseract
+    else:
+        ocr_ready = tesseract or backends["ocr_space"]["available"]
+
+    ready = backends["gemini"]["available"] and ocr_ready and backends["pdf"]["available"]
+    return ready, backends
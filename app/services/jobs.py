@@ -0,0 +1,376 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from app.services.admission import Overloaded
+from app.services.pipeline import process_file_url
+from app.utils.concurrency import run_blocking
+from app.utils.downloader import get_http_session
+
+logger = logging.getLogger(__name__)
+
+JOB_STORE_PATH = os.getenv(
+    'JOB_STORE_PATH',
+    os.path.join(tempfile.gettempdir(), 'simplifai_jobs.sqlite3')
+)
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+# Every worker refreshes the heartbeat of the jobs it owns this often, and takes over
+# jobs whose owner has exited or whose heartbeat is older than JOB_STALE_SECONDS.
+JOB_HEARTBEAT_SECONDS = float(os.getenv('JOB_HEARTBEAT_SECONDS', '30'))
+JOB_STALE_SECONDS = float(os.getenv('JOB_STALE_SECONDS', '120'))
+JOB_CALLBACK_TIMEOUT = float(os.getenv('JOB_CALLBACK_TIMEOUT', '10'))
+# Succeeded and failed jobs, result included, are deleted by the sweep this long after
+# they finished. 0 keeps them forever.
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', str(7 * 24 * 3600)))
+
+STAGES = ("download", "ocr", "simplify", "translate")
+
+_owner = (None, None)
+
+
+def process_owner():
+    """Owner id of this worker process: host, pid and a random part, since pids are reused."""
+    global _owner
+    pid = os.getpid()
+    if _owner[0] != pid:
+        _owner = (pid, f"{socket.gethostname()}:{pid}:{uuid.uuid4().hex[:12]}")
+    return _owner[1]
+
+
+def owner_alive(owner):
+    """
+    False if owner is a process on this host that has exited. Owners on other hosts
+    (a shared volume) are only judged by their heartbeat.
+    """
+    host, _, rest = owner.partition(":")
+    pid = rest.partition(":")[0]
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Exists, but belongs to another user.
+        return True
+    return True
+
+
+class JobStore:
+    """
+    SQLite-backed job table shared by all workers on the host. Database calls go through
+    _run, as in SQLiteCache.
+    """
+
+    def __init__(self, path=JOB_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._run(self._create)
+
+    def _run(self, func, *args):
+        with self._lock:
+            return run_blocking(func, *args)
+
+    def _execute(self, sql, params):
+        with self._conn:
+            return self._conn.execute(sql, params).rowcount
+
+    def _create(self):
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT, progress TEXT, "
+                "request TEXT NOT NULL, result TEXT, status_code INTEGER, callback_url TEXT, "
+                "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_finished ON jobs (status, updated_at)")
+            # Stores created before jobs had owners get the columns added.
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL")):
+                if column not in columns:
+                    try:
+                        self._conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+                    except sqlite3.OperationalError:
+                        # Another worker added it first.
+                        pass
+
+    def create(self, request_data, callback_url=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._run(
+            self._execute,
+            "INSERT INTO jobs (id, status, request, callback_url, created_at, updated_at, owner, heartbeat_at) "
+            "VALUES (?, 'queued', ?, ?, ?, ?, ?, ?)",
+            (job_id, json.dumps(request_data), callback_url, now, now, process_owner(), now)
+        )
+        return job_id
+
+    def claim(self, job_id):
+        """Marks a queued job as running in this process. Returns False if another worker already has it."""
+        now = time.time()
+        return self._run(
+            self._execute,
+            "UPDATE jobs SET status = 'running', owner = ?, heartbeat_at = ?, updated_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (process_owner(), now, now, job_id)
+        ) == 1
+
+    def heartbeat(self):
+        """Marks the unfinished jobs owned by this process as still alive."""
+        self._run(
+            self._execute,
+            "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN ('queued', 'running')",
+            (time.time(), process_owner())
+        )
+
+    def update_progress(self, job_id, stage, progress):
+        self._run(
+            self._execute,
+            "UPDATE jobs SET stage = ?, progress = ?, updated_at = ? WHERE id = ?",
+            (stage, json.dumps(progress), time.time(), job_id)
+        )
+
+    def requeue(self, job_id):
+        """Puts a running job of this process back in the queue, to be claimed again."""
+        self._run(
+            self._execute,
+            "UPDATE jobs SET status = 'queued', updated_at = ? WHERE id = ? AND status = 'running'",
+            (time.time(), job_id)
+        )
+
+    def finish(self, job_id, result, status_code):
+        status = "succeeded" if status_code < 400 else "failed"
+        self._run(
+            self._execute,
+            "UPDATE jobs SET status = ?, result = ?, status_code = ?, updated_at = ? WHERE id = ?",
+            (status, json.dumps(result), status_code, time.time(), job_id)
+        )
+
+    def purge_finished(self, max_age=JOB_RETENTION_SECONDS):
+        """Deletes succeeded and failed jobs that finished more than max_age seconds ago. Returns how many."""
+        if max_age <= 0:
+            return 0
+        return self._run(
+            self._execute,
+            "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at < ?",
+            (time.time() - max_age,)
+        )
+
+    def adopt_orphans(self):
+        """
+        Takes over unfinished jobs whose owner has exited, whose heartbeat is older than
+        JOB_STALE_SECONDS or that have no owner, and queues them again in this process.
+        Returns their ids, oldest first.
+        """
+        return self._run(self._adopt_orphans, process_owner(), time.time())
+
+    def _adopt_orphans(self, owner, now):
+        adopted = []
+        with self._conn:
+            rows = self._conn.execute(
+                "SELECT id, owner, heartbeat_at FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+            for row in rows:
+                if row["owner"] == owner:
+                    continue
+                orphaned = (
+                    row["owner"] is None or row["heartbeat_at"] is None
+                    or row["heartbeat_at"] < now - JOB_STALE_SECONDS or not owner_alive(row["owner"])
+                )
+                if not orphaned:
+                    continue
+                # Only if no other worker adopted it since it was read.
+                cursor = self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = ?, heartbeat_at = ? "
+                    "WHERE id = ? AND owner IS ? AND heartbeat_at IS ? AND status IN ('queued', 'running')",
+                    (owner, now, row["id"], row["owner"], row["heartbeat_at"])
+                )
+                if cursor.rowcount == 1:
+                    adopted.append(row["id"])
+        return adopted
+
+    def get(self, job_id):
+        row = self._run(lambda: self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+        if row is None:
+            return None
+        return self._to_dict(row)
+
+    @staticmethod
+    def _to_dict(row):
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "stage": row["stage"],
+            "progress": json.loads(row["progress"]) if row["progress"] else {},
+            "request": json.loads(row["request"]),
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "status_code": row["status_code"],
+            "callback_url": row["callback_url"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+
+_store = None
+_executor = None
+_init_lock = threading.Lock()
+_sweeper_pid = None
+
+
+def get_job_store():
+    global _store
+    if _store is None:
+        with _init_lock:
+            if _store is None:
+                _store = JobStore()
+    return _store
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _init_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+    return _executor
+
+
+def _send_callback(job):
+    try:
+        payload = {key: job[key] for key in ("job_id", "status", "status_code", "result")}
+        get_http_session().post(job["callback_url"], json=payload, timeout=JOB_CALLBACK_TIMEOUT)
+    except Exception as e:
+        logger.warning("Job callback failed", extra={"job_id": job["job_id"], "error": str(e)})
+
+
+def run_job(job_id):
+    store = get_job_store()
+    if not store.claim(job_id):
+        return
+
+    job = store.get(job_id)
+    request_data = job["request"]
+    stages = {stage: "pending" for stage in STAGES}
+
+    def progress(stage, current=None, total=None):
+        for name in STAGES:
+            if name == stage:
+                break
+            if stages[name] != "skipped":
+                stages[name] = "done"
+        if total:
+            stages[stage] = f"{current}/{total}"
+        else:
+            stages[stage] = "running"
+        store.update_progress(job_id, stage, stages)
+
+    try:
+        result, status_code = process_file_url(
+            request_data["file_url"],
+            request_data["language"],
+            request_data["auto_detect"],
+            progress=progress,
+            ocr_engine=request_data.get("ocr_engine"),
+            page_ranges=request_data.get("pages"),
+            max_pages=request_data.get("max_pages"),
+            per_page=request_data.get("per_page", False)
+        )
+    except Overloaded as e:
+        # Background jobs have no deadline: try again once the host has room.
+        logger.info("Job deferred, host overloaded", extra={"job_id": job_id, "reason": e.reason, "retry_after": e.retry_after})
+        store.requeue(job_id)
+        _retry_later(job_id, e.retry_after)
+        return
+    except Exception as e:
+        result, status_code = {"error": str(e)}, 500
+
+    store.finish(job_id, result, status_code)
+
+    job = store.get(job_id)
+    if job["callback_url"]:
+        _send_callback(job)
+
+
+def _retry_later(job_id, delay):
+    timer = threading.Timer(max(1.0, delay), lambda: _get_executor().submit(run_job, job_id))
+    timer.daemon = True
+    timer.start()
+
+
+def submit_job(file_url, language, auto_detect=False, callback_url=None, ocr_engine=None, page_ranges=None, max_pages=None, per_page=False):
+    job_id = get_job_store().create(
+        {
+            "file_url": file_url,
+            "language": language,
+            "auto_detect": auto_detect,
+            "ocr_engine": ocr_engine,
+            "pages": page_ranges,
+            "max_pages": max_pages,
+            "per_page": per_page,
+        },
+        callback_url=callback_url
+    )
+    _get_executor().submit(run_job, job_id)
+    _ensure_sweeper()
+    return job_id
+
+
+def sweep_jobs():
+    """
+    Refreshes the heartbeat of this process's jobs, deletes jobs that finished more than
+    JOB_RETENTION_SECONDS ago and re-submits the jobs it adopted from workers that exited
+    or stopped sending heartbeats. Returns the adopted ids.
+    """
+    store = get_job_store()
+    store.heartbeat()
+    purged = store.purge_finished()
+    if purged:
+        logger.info("Deleted expired jobs", extra={"jobs": purged})
+    job_ids = store.adopt_orphans()
+    for job_id in job_ids:
+        _get_executor().submit(run_job, job_id)
+    if job_ids:
+        logger.info("Resumed jobs of a stopped worker", extra={"jobs": len(job_ids)})
+    return job_ids
+
+
+def _sweep_forever():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        try:
+            sweep_jobs()
+        except Exception as e:
+            logger.error("Job sweep failed", extra={"error": str(e)})
+
+
+def _ensure_sweeper():
+    """Starts the heartbeat and sweep thread once per process (threads don't survive a fork)."""
+    global _sweeper_pid
+    if _sweeper_pid == os.getpid():
+        return
+    with _init_lock:
+        if _sweeper_pid != os.getpid():
+            _sweeper_pid = os.getpid()
+            threading.Thread(target=_sweep_forever, name="job-sweeper", daemon=True).start()
+
+
+def resume_pending_jobs():
+    """
+    Re-submits jobs left unfinished by workers that are gone, and starts the periodic
+    sweep that keeps doing so while this worker runs.
+    """
+    try:
+        sweep_jobs()
+    except Exception as e:
+        logger.error("Could not resume pending jobs", extra={"error": str(e)})
+    _ensure_sweeper()
@@ -0,0 +1,237 @@
+import logging
+import os
+import random
+import threading
+import time
+from app.config import get_config
+from app.services import metrics as prom
+from app.services.admission import admit
+from app.utils.lazy import lazy_import
+
+httpx = lazy_import("httpx")
+genai = lazy_import("google.genai")
+errors = lazy_import("google.genai.errors")
+types = lazy_import("google.genai.types")
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL = get_config().gemini_model
+# Overrides the Gemini API endpoint, e.g. to point at the benchmark's fake server.
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL")
+# Per-request timeout in seconds, applied to every HTTP call the client makes.
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+LLM_RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# Client-side token bucket: sustained requests per second and burst size, per process.
+LLM_RATE_LIMIT = float(os.getenv("LLM_RATE_LIMIT", "5"))
+LLM_RATE_BURST = int(os.getenv("LLM_RATE_BURST", "10"))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+RETRYABLE_STATUS_CODES = (408, 429, 500, 502, 503, 504)
+
+
+def load_api_key():
+    return get_config().gemini_api_key
+
+
+class TokenBucket:
+    """Blocking token bucket shared by all threads in the process."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(1, capacity)
+        self._tokens = float(self.capacity)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class LLMMetrics:
+    """Per-endpoint call, error, retry, latency and token counters."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _entry(self, endpoint):
+        entry = self._endpoints.get(endpoint)
+        if entry is None:
+            entry = {
+                "calls": 0,
+                "errors": 0,
+                "retries": 0,
+                "latency_total": 0.0,
+                "latency_max": 0.0,
+                "input_tokens": 0,
+                "output_tokens": 0,
+            }
+            self._endpoints[endpoint] = entry
+        return entry
+
+    def record_call(self, endpoint, latency, response=None, error=False):
+        metadata = getattr(response, "usage_metadata", None)
+        input_tokens = (getattr(metadata, "prompt_token_count", None) or 0) if metadata is not None else 0
+        output_tokens = (getattr(metadata, "candidates_token_count", None) or 0) if metadata is not None else 0
+        prom.GEMINI_CALLS.inc(endpoint=endpoint, outcome="error" if error else "ok")
+        prom.GEMINI_SECONDS.observe(latency, endpoint=endpoint)
+        if input_tokens:
+            prom.GEMINI_TOKENS.inc(input_tokens, endpoint=endpoint, direction="input")
+        if output_tokens:
+            prom.GEMINI_TOKENS.inc(output_tokens, endpoint=endpoint, direction="output")
+        with self._lock:
+            entry = self._entry(endpoint)
+            entry["calls"] += 1
+            entry["latency_total"] += latency
+            entry["latency_max"] = max(entry["latency_max"], latency)
+            if error:
+                entry["errors"] += 1
+            entry["input_tokens"] += input_tokens
+            entry["output_tokens"] += output_tokens
+
+    def record_retry(self, endpoint):
+        prom.GEMINI_RETRIES.inc(endpoint=endpoint)
+        with self._lock:
+            self._entry(endpoint)["retries"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            snapshot = {}
+            for endpoint, entry in self._endpoints.items():
+                snapshot[endpoint] = {
+                    **entry,
+                    "latency_avg": entry["latency_total"] / entry["calls"] if entry["calls"] else 0.0,
+                }
+            return snapshot
+
+
+_client = None
+_client_lock = threading.Lock()
+_rate_limiter = TokenBucket(LLM_RATE_LIMIT, LLM_RATE_BURST)
+_concurrency = threading.BoundedSemaphore(max(1, LLM_MAX_CONCURRENCY))
+metrics = LLMMetrics()
+
+
+def get_client():
+    """Returns the process-wide Gemini client, creating it on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                api_key = load_api_key()
+                if not api_key:
+                    raise ValueError("API Key not found. Please set the GEMINI_API_KEY environment variable or add it to the .env file.")
+                _client = genai.Client(
+                    api_key=api_key,
+                    http_options=types.HttpOptions(
+                        timeout=int(LLM_TIMEOUT * 1000),
+                        base_url=GEMINI_BASE_URL
+                    )
+                )
+    return _client
+
+
+def is_retryable(error):
+    if isinstance(error, errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+def _backoff(attempt):
+    # Full jitter: spreads retries from concurrent callers instead of synchronising them.
+    return random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+def generate(prompt, endpoint, config=None, model=None):
+    """
+    Calls generate_content through the shared client with rate limiting, a concurrency
+    cap and jittered retries on 429/5xx and transport errors. Records latency, token
+    and error metrics under endpoint. Returns the response; raises the last error.
+    """
+    attempt = 0
+    while True:
+        _rate_limiter.acquire()
+        start = time.perf_counter()
+        try:
+            with admit("llm"), _concurrency, prom.timed("gemini"):
+                response = get_client().models.generate_content(
+                    model=model or GEMINI_MODEL,
+                    contents=prompt,
+                    config=config
+                )
+        except Exception as e:
+            metrics.record_call(endpoint, time.perf_counter() - start, error=True)
+            if attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            metrics.record_retry(endpoint)
+            delay = _backoff(attempt)
+            logger.warning(
+                "Retrying Gemini call after error",
+                extra={"endpoint": endpoint, "error": str(e), "attempt": attempt + 1, "max_retries": LLM_MAX_RETRIES, "delay_s": round(delay, 2)}
+            )
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        metrics.record_call(endpoint, time.perf_counter() - start, response=response)
+        return response
+
+
+def stream(prompt, endpoint, config=None, model=None):
+    """
+    Streams generate_content text pieces through the shared client. Retries only
+    apply before the first piece has been yielded, so output is never duplicated.
+    """
+    attempt = 0
+    while True:
+        _rate_limiter.acquire()
+        start = time.perf_counter()
+        started = False
+        last_chunk = None
+        try:
+            with admit("llm"), _concurrency:
+                for chunk in get_client().models.generate_content_stream(
+                    model=model or GEMINI_MODEL,
+                    contents=prompt,
+                    config=config
+                ):
+                    last_chunk = chunk
+                    if chunk.text:
+                        started = True
+                        yield chunk.text
+        except Exception as e:
+            metrics.record_call(endpoint, time.perf_counter() - start, error=True)
+            if started or attempt >= LLM_MAX_RETRIES or not is_retryable(e):
+                raise
+            metrics.record_retry(endpoint)
+            delay = _backoff(attempt)
+            logger.warning(
+                "Retrying Gemini stream after error",
+                extra={"endpoint": endpoint, "error": str(e), "attempt": attempt + 1, "max_retries": LLM_MAX_RETRIES, "delay_s": round(delay, 2)}
+            )
+            time.sleep(delay)
+            attempt += 1
+            continue
+
+        metrics.record_call(endpoint, time.perf_counter() - start, response=last_chunk)
+        return
+
+
+def get_llm_metrics():
+    return {
+        "model": GEMINI_MODEL,
+        "endpoints": metrics.snapshot(),
+    }
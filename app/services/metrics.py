@@ -0,0 +1,277 @@
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds, covering fast cache hits through multi-minute PDF runs.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        f'{name}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34)).replace(chr(10), chr(92) + "n")}"'
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_sample(key, value))
+        return lines
+
+    def _render_sample(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._values[key] = entry
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry["counts"][index] += 1
+                    break
+            entry["sum"] += value
+            entry["count"] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, {"counts": list(v["counts"]), "sum": v["sum"], "count": v["count"]}) for key, v in self._values.items())
+        for key, entry in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, entry["counts"]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry['sum'])}")
+            lines.append(f"{self.name}_count{labels} {entry['count']}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+HTTP_REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "simplifai_http_request_seconds", "HTTP request duration by endpoint and status.", ("endpoint", "method", "status")
+))
+HTTP_IN_FLIGHT = REGISTRY.register(Gauge(
+    "simplifai_http_requests_in_flight", "HTTP requests currently being handled.", ("endpoint",)
+))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "simplifai_stage_seconds", "Duration of pipeline stages (download, extract, ocr_page, script_detect, simplify, translate, ...).", ("stage",)
+))
+STAGE_IN_FLIGHT = REGISTRY.register(Gauge(
+    "simplifai_stage_in_flight", "Pipeline stages currently running.", ("stage",)
+))
+OCR_PAGES = REGISTRY.register(Counter(
+    "simplifai_ocr_pages_total", "Pages and images sent to an OCR engine.", ("engine", "outcome")
+))
+PDF_PAGES = REGISTRY.register(Counter(
+    "simplifai_pdf_pages_total", "PDF pages by how their text was obtained.", ("source",)
+))
+GEMINI_CALLS = REGISTRY.register(Counter(
+    "simplifai_gemini_calls_total", "Gemini API calls.", ("endpoint", "outcome")
+))
+GEMINI_RETRIES = REGISTRY.register(Counter(
+    "simplifai_gemini_retries_total", "Gemini API calls retried after a retryable error.", ("endpoint",)
+))
+GEMINI_SECONDS = REGISTRY.register(Histogram(
+    "simplifai_gemini_call_seconds", "Gemini API call latency.", ("endpoint",)
+))
+GEMINI_TOKENS = REGISTRY.register(Counter(
+    "simplifai_gemini_tokens_total", "Gemini tokens used.", ("endpoint", "direction")
+))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    "simplifai_cache_requests_total", "Result cache lookups.", ("kind", "result")
+))
+SINGLEFLIGHT_CALLS = REGISTRY.register(Counter(
+    "simplifai_singleflight_calls_total", "Coalesced computations by how each caller got its result.", ("kind", "role")
+))
+CLEANUP_SAVED = REGISTRY.register(Counter(
+    "simplifai_cleanup_saved_total", "Characters and estimated tokens removed from extracted text before it reaches Gemini.", ("unit",)
+))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "simplifai_admission_queue_depth", "Callers waiting for a request lane (this worker) or a stage budget (host).", ("queue",)
+))
+ADMISSION_ACTIVE = REGISTRY.register(Gauge(
+    "simplifai_admission_active", "Requests running in a lane and stage slots held, in this worker.", ("queue",)
+))
+ADMISSION_WAIT_SECONDS = REGISTRY.register(Histogram(
+    "simplifai_admission_wait_seconds", "Time spent waiting for a request lane or a stage budget.", ("queue", "lane")
+))
+ADMISSION_REJECTED = REGISTRY.register(Counter(
+    "simplifai_admission_rejected_total", "Requests rejected with 429 by admission control.", ("lane", "reason")
+))
+
+
+class RequestTimings:
+    """Per-request stage timing breakdown, shared with the worker threads the request fans out to."""
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stages = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            entry = self._stages.setdefault(stage, {"count": 0, "total_ms": 0.0})
+            entry["count"] += 1
+            entry["total_ms"] += seconds * 1000
+
+    def as_dict(self):
+        with self._lock:
+            stages = {
+                stage: {"count": entry["count"], "total_ms": round(entry["total_ms"], 1)}
+                for stage, entry in self._stages.items()
+            }
+        return {
+            "total_ms": round((time.perf_counter() - self.started_at) * 1000, 1),
+            "stages": stages,
+        }
+
+
+_current_timings = contextvars.ContextVar("simplifai_request_timings", default=None)
+
+
+def start_request_timings():
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def current_request_timings():
+    return _current_timings.get()
+
+
+def propagate_context(func):
+    """
+    Wraps func to run in a copy of the caller's context, so work submitted to a thread
+    pool still records into the submitting request's timing breakdown.
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+
+    return run
+
+
+def record_stage(stage, seconds):
+    """Records time spent in a stage that wasn't timed as one block (work interleaved with a generator's consumer)."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, seconds)
+
+
+@contextmanager
+def timed(stage):
+    """Times a block into the stage histogram and the current request's breakdown."""
+    start = time.perf_counter()
+    STAGE_IN_FLIGHT.inc(stage=stage)
+    try:
+        yield
+    finally:
+        STAGE_IN_FLIGHT.dec(stage=stage)
+        record_stage(stage, time.perf_counter() - start)
+
+
+def render_metrics():
+    return REGISTRY.render()
@@ -0,0 +1,179 @@
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from app.services import llm
+from app.services.llm import types
+from app.services.admission import Overloaded
+from app.services.metrics import propagate_context, timed
+from app.utils.chunking import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+TOOLS_BATCH_MAX_TEXTS = int(os.getenv("TOOLS_BATCH_MAX_TEXTS", "50"))
+TOOLS_BATCH_MAX_OPERATIONS = int(os.getenv("TOOLS_BATCH_MAX_OPERATIONS", "5"))
+# Texts are packed into one structured call until this many (estimated) input tokens or
+# TOOLS_BATCH_TEXTS_PER_CALL texts; the calls for one request run concurrently.
+TOOLS_BATCH_CALL_TOKENS = int(os.getenv("TOOLS_BATCH_CALL_TOKENS", "6000"))
+TOOLS_BATCH_TEXTS_PER_CALL = int(os.getenv("TOOLS_BATCH_TEXTS_PER_CALL", "10"))
+TOOLS_BATCH_CONCURRENCY = int(os.getenv("TOOLS_BATCH_CONCURRENCY", "4"))
+
+# operation -> (result key, prompt instruction). The key matches the single-tool routes.
+OPERATIONS = {
+    "correct": ("corrected_text", "Correct any grammar, spelling, or punctuation errors. Change nothing else."),
+    "summarize": ("summary", "Summarize it concisely while preserving the key points."),
+    "simplify": ("simplified_text", "Simplify it: use simpler words and shorter sentences, keeping every piece of information."),
+    "translate": ("translated_text", "Translate it into {language}. If it is already in {language}, keep it as is."),
+}
+
+
+def parse_operations(raw_operations):
+    """
+    Normalizes the operations list: each entry is an operation name or an object
+    {"op": name, "language": ...}. Returns (operations, error) where operations is a
+    list of {"op", "language"} dicts and error is None when valid.
+    """
+    if not isinstance(raw_operations, list) or not raw_operations:
+        return None, f"operations must be a non-empty list of: {', '.join(OPERATIONS)}"
+    if len(raw_operations) > TOOLS_BATCH_MAX_OPERATIONS:
+        return None, f"At most {TOOLS_BATCH_MAX_OPERATIONS} operations can be chained"
+
+    operations = []
+    for raw in raw_operations:
+        if isinstance(raw, str):
+            raw = {"op": raw}
+        if not isinstance(raw, dict) or raw.get("op") not in OPERATIONS:
+            return None, f"Unsupported operation: {raw}. Supported operations are: {', '.join(OPERATIONS)}"
+        if raw["op"] == "translate" and not raw.get("language"):
+            return None, "translate operations need a language"
+        operations.append({"op": raw["op"], "language": raw.get("language")})
+    return operations, None
+
+
+def _step_key(step):
+    return f"step_{step + 1}"
+
+
+def _build_prompt(operations, texts):
+    steps = "\n".join(
+        f"    {step + 1}. {OPERATIONS[operation['op']][1].format(language=operation['language'])}"
+        for step, operation in enumerate(operations)
+    )
+    numbered = "\n\n".join(f"    [{index}]\n    \"{text}\"" for index, text in texts)
+    return f"""Apply the following steps to each text below, in order. Each step works on the result of the previous step.
+
+    Steps:
+{steps}
+
+    Texts:
+{numbered}
+
+    Respond with JSON containing "results": one entry per text with its "index" and the result of every step
+    ({", ".join(f'"{_step_key(step)}"' for step in range(len(operations)))})."""
+
+
+def _response_schema(operations):
+    properties = {"index": {"type": "INTEGER"}}
+    for step in range(len(operations)):
+        properties[_step_key(step)] = {"type": "STRING"}
+    return {
+        "type": "OBJECT",
+        "properties": {
+            "results": {
+                "type": "ARRAY",
+                "items": {
+                    "type": "OBJECT",
+                    "properties": properties,
+                    "required": list(properties),
+                },
+            },
+        },
+        "required": ["results"],
+    }
+
+
+def _pack_texts(texts):
+    """Groups (index, text) pairs into calls bounded by TOOLS_BATCH_CALL_TOKENS and TOOLS_BATCH_TEXTS_PER_CALL."""
+    groups = []
+    current = []
+    current_tokens = 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and (
+            current_tokens + tokens > TOOLS_BATCH_CALL_TOKENS or len(current) >= TOOLS_BATCH_TEXTS_PER_CALL
+        ):
+            groups.append(current)
+            current = []
+            current_tokens = 0
+        current.append((index, text))
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def _run_group(operations, group):
+    """Runs one structured call for a group of texts. Returns {index: [step results]} or raises."""
+    with timed("tools_batch"):
+        response = llm.generate(
+            _build_prompt(operations, group),
+            endpoint="tools.batch",
+            config=types.GenerateContentConfig(
+                response_mime_type="application/json",
+                response_schema=_response_schema(operations),
+            )
+        )
+    if not response.text:
+        raise ValueError("empty or blocked response")
+
+    results = {}
+    for entry in json.loads(response.text).get("results", []):
+        steps = [(entry.get(_step_key(step)) or "").strip() for step in range(len(operations))]
+        if isinstance(entry.get("index"), int) and all(steps):
+            results[entry["index"]] = steps
+    return results
+
+
+def run_tool_operations(operations, texts):
+    """
+    Applies a chain of operations to every text with as few model calls as possible:
+    all steps for a group of texts are done in one structured call.
+    Returns (results, calls) where results has one entry per text, in order, holding
+    either "operations" (one {"operation", <result key>} dict per step) or "error".
+    """
+    groups = _pack_texts(texts)
+    outputs = {}
+
+    def run(group):
+        try:
+            return group, _run_group(operations, group)
+        except Overloaded:
+            raise
+        except Exception as e:
+            logger.error("Batched tools call failed", extra={"texts": len(group), "error": str(e)})
+            return group, {}
+
+    with ThreadPoolExecutor(max_workers=max(1, min(TOOLS_BATCH_CONCURRENCY, len(groups)))) as executor:
+        for group, group_results in executor.map(propagate_context(run), groups):
+            for index, _ in group:
+                outputs[index] = group_results.get(index)
+
+    results = []
+    for index, text in enumerate(texts):
+        steps = outputs.get(index)
+        if steps is None:
+            results.append({"index": index, "error": "Sorry, I couldn't process this text."})
+            continue
+
+        results.append({
+            "index": index,
+            "operations": [
+                {
+                    "operation": operation["op"],
+                    **({"language": operation["language"]} if operation["language"] else {}),
+                    OPERATIONS[operation["op"]][0]: step_result,
+                }
+                for operation, step_result in zip(operations, steps)
+            ],
+        })
+    return results, len(groups)
@@ -1,18 +1,43 @@
-import requests
-import json
+import hashlib
+import io
+import logging
 import os
-import fitz  
-import docx 
 import re
-import tempfile
-from PIL import Image
-import string
-import pytesseract # type: ignore
-from dotenv import load_dotenv
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from app.services.admission import Overloaded, admit
+from app.services.cache import MemoryCache, hash_file
+from app.services.cleanup import PAGE_BREAK
+from app.services.metrics import OCR_PAGES, PDF_PAGES, propagate_context, timed
+from app.services.ocr_engines import get_ocr_engine
+from app.services.preprocess import render_page_for_ocr, prepare_image_bytes
+from app.utils.concurrency import run_blocking
+from app.utils.lazy import lazy_import
 
-load_dotenv()
+fitz = lazy_import("fitz")
+docx = lazy_import("docx")
+docx_ns = lazy_import("docx.oxml.ns")
+docx_paragraph = lazy_import("docx.text.paragraph")
+Image = lazy_import("PIL.Image")
+pytesseract = lazy_import("pytesseract")
 
-OCR_SPACE_API_KEY = os.getenv('OCR_SPACE_API_KEY', 'helloworld')
+logger = logging.getLogger(__name__)
+
+OCR_PAGE_CONCURRENCY = int(os.getenv('OCR_PAGE_CONCURRENCY', '4'))
+
+# A PDF page is read from its text layer when it has at least PDF_PAGE_MIN_TEXT_CHARS
+# characters, unless images cover PDF_PAGE_SCAN_COVERAGE of it and the text is shorter
+# than PDF_PAGE_SCAN_MAX_TEXT_CHARS (a scan with a stamped header or page number).
+PDF_PAGE_MIN_TEXT_CHARS = int(os.getenv('PDF_PAGE_MIN_TEXT_CHARS', '50'))
+PDF_PAGE_SCAN_COVERAGE = float(os.getenv('PDF_PAGE_SCAN_COVERAGE', '0.6'))
+PDF_PAGE_SCAN_MAX_TEXT_CHARS = int(os.getenv('PDF_PAGE_SCAN_MAX_TEXT_CHARS', '300'))
+
+# Upper bound on PDF pages read per request, on top of any max_pages asked for (0 = no limit).
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', '0'))
+
+# Embedded DOCX images smaller than this on either side (logos, icons) are not OCR'd.
+DOCX_IMAGE_MIN_SIDE = int(os.getenv('DOCX_IMAGE_MIN_SIDE', '200'))
 
 LANGUAGE_CODES = {
     "English": "eng", 
@@ -30,9 +55,104 @@ LANGUAGE_CODES = {
 
 DEFAULT_LANG = "eng"
 
+SCRIPT_DETECT_MODE = os.getenv('SCRIPT_DETECT_MODE', 'fast').lower()
+SCRIPT_DETECT_MAX_SIDE = int(os.getenv('SCRIPT_DETECT_MAX_SIDE', '1200'))
+# Detection is only a verdict when it recognised at least this many letters; fewer
+# (blank pages, photos, failed OCR) leave the requested language in place.
+SCRIPT_DETECT_MIN_LETTERS = int(os.getenv('SCRIPT_DETECT_MIN_LETTERS', '20'))
+
+# The OCR language is chosen once per document from the requested language and script
+# detection on at most this many sampled pages or images.
+OCR_DETECT_SAMPLE_PAGES = int(os.getenv('OCR_DETECT_SAMPLE_PAGES', '2'))
+# Native text (PDF text layer, DOCX body) at least this long decides the script on its
+# own, without running image detection.
+OCR_DETECT_MIN_TEXT_CHARS = int(os.getenv('OCR_DETECT_MIN_TEXT_CHARS', '200'))
+
+# Frequent function words that tell Marathi and Hindi apart in Devanagari text.
+MARATHI_MARKERS = ('आहे', 'आणि', 'च्या', 'ाचा', 'ाची', 'ाचे', 'नाही', 'होते', 'ळ')
+HINDI_MARKERS = ('है', 'हैं', 'और', 'के', 'का', 'की', 'नहीं', 'में', 'था')
+
+_script_cache = MemoryCache(max_entries=1024, ttl=None)
+
+def _open_image(image):
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(image))
+    return Image.open(image)
+
 def detect_script_in_image(image_path):
+    """
+    Returns 'english', 'hindi' or 'marathi' for the dominant script of an image,
+    given as a file path or encoded image bytes, or None when detection failed or was
+    inconclusive. Verdicts are cached per image content hash. SCRIPT_DETECT_MODE=thorough
+    switches back to the multi-pass Tesseract detector.
+    """
     try:
-        img = Image.open(image_path)
+        if isinstance(image_path, (bytes, bytearray, memoryview)):
+            image_hash = hashlib.sha256(image_path).hexdigest()
+        else:
+            image_hash = hash_file(image_path)
+    except Exception as e:
+        logger.warning("Error in script detection", extra={"error": str(e)})
+        return None
+
+    cache_key = f"{SCRIPT_DETECT_MODE}:{image_hash}"
+    cached = _script_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    with timed("script_detect"):
+        if SCRIPT_DETECT_MODE == 'thorough':
+            script = run_blocking(_detect_script_multi_pass, image_path)
+        else:
+            script = run_blocking(_detect_script_single_pass, image_path)
+    if script is None:
+        return None
+
+    _script_cache.set(cache_key, script)
+    return script
+
+def classify_script(text):
+    """
+    Classifies OCR output by counting Devanagari and Latin characters. Returns None
+    when the text has fewer than SCRIPT_DETECT_MIN_LETTERS letters to go on.
+    """
+    devanagari_count = 0
+    latin_count = 0
+    for char in text:
+        if '\u0900' <= char <= '\u097F':
+            devanagari_count += 1
+        elif char.isascii() and char.isalpha():
+            latin_count += 1
+
+    if devanagari_count + latin_count < SCRIPT_DETECT_MIN_LETTERS:
+        return None
+
+    devanagari_ratio = devanagari_count / max(devanagari_count + latin_count, 1)
+    if devanagari_count < 15 or devanagari_ratio <= 0.2:
+        return 'english'
+
+    words = text.split()
+    marathi_score = sum(1 for word in words for marker in MARATHI_MARKERS if marker in word)
+    hindi_score = sum(1 for word in words for marker in HINDI_MARKERS if word == marker)
+
+    if marathi_score > hindi_score:
+        return 'marathi'
+    return 'hindi'
+
+def _detect_script_single_pass(image_path):
+    try:
+        with _open_image(image_path) as img:
+            img = img.convert('L')
+            img.thumbnail((SCRIPT_DETECT_MAX_SIDE, SCRIPT_DETECT_MAX_SIDE))
+            text = pytesseract.image_to_string(img, lang='hin+mar+eng')
+        return classify_script(text)
+    except Exception as e:
+        logger.warning("Error in script detection", extra={"error": str(e)})
+        return None
+
+def _detect_script_multi_pass(image_path):
+    try:
+        img = _open_image(image_path)
         
         eng_text = pytesseract.image_to_string(img, lang='eng')
         
@@ -83,189 +203,625 @@ def detect_script_in_image(image_path):
                 
             return 'marathi'
         
-        return 'english'
+        # Neither enough English words nor enough Devanagari: no verdict.
+        return None
     
     except Exception as e:
-        print(f"Error in script detection: {str(e)}")
-        return 'english'
+        logger.warning("Error in script detection", extra={"error": str(e)})
+        return None
 
-def extract_text_from_file(file_path, language="English", auto_detect=False):
+def extract_text_from_file(file_path, language="English", auto_detect=False, progress=None, ocr_engine=None):
     try:
+        engine = get_ocr_engine(ocr_engine)
+
         if file_path.lower().endswith(('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tiff', '.tif')):
-            language_code = "eng"
-            
-            if auto_detect:
-                detected_script = detect_script_in_image(file_path)
-                if detected_script == 'hindi':
-                    language_code = "hin"
-                elif detected_script == 'marathi':
-                    language_code = "mar"
-                
-            return ocr_space_file(file_path, language_code)
+            with open(file_path, 'rb') as f:
+                raw_bytes = f.read()
+
+            try:
+                image_bytes, extension = run_blocking(prepare_image_bytes, raw_bytes)
+            except Exception as e:
+                logger.warning("Image preprocessing failed, sending the original file", extra={"error": str(e)})
+                image_bytes, extension = raw_bytes, os.path.splitext(file_path)[1].lower()
+
+            language_code = route_ocr_language(language, auto_detect, sample_images=[image_bytes])
+            return ocr_image_page(image_bytes, ocr_engine=engine, filename=f"image{extension}", language_code=language_code)
         
         elif file_path.lower().endswith('.pdf'):
-            return extract_from_pdf(file_path, auto_detect)
+            return extract_from_pdf(file_path, auto_detect, progress=progress, ocr_engine=engine, language=language)
             
         elif file_path.lower().endswith('.docx'):
-            return extract_from_word(file_path, auto_detect)
+            return extract_from_word(file_path, auto_detect, ocr_engine=engine, language=language)
             
         else:
             return f"ERROR: Unsupported file format. Supported formats: PNG, JPG, PDF, DOCX"
+    except Overloaded:
+        raise
     except Exception as e:
         return f"ERROR: Failed to extract text: {str(e)}"
 
-def ocr_space_file(file_path, language_code="eng"):
+class ExtractionError(Exception):
+    """A document yielded no readable text. The message is the "ERROR: ..." string shown to users."""
+
+
+def iter_pages_from_file(file_path, language="English", auto_detect=False, progress=None, ocr_engine=None, page_ranges=None, max_pages=None):
+    """
+    Per-page counterpart of extract_text_from_file that yields pages as they are read:
+    {"page", "text"} dicts (an image or DOCX file is a single page 1), and for PDF pages
+    whose OCR failed {"page", "text": "", "error"}. A DOCX page some of whose embedded
+    images couldn't be OCR'd is marked "incomplete". Raises ExtractionError, after the
+    last page, if no page had text. page_ranges (see parse_page_ranges) and max_pages
+    select the PDF pages to read.
+    """
+    if file_path.lower().endswith('.docx'):
+        skipped_images = []
+        text = extract_from_word(
+            file_path, auto_detect, ocr_engine=get_ocr_engine(ocr_engine), language=language, skipped_images=skipped_images
+        )
+        if text.startswith("ERROR:"):
+            raise ExtractionError(text)
+        yield {"page": 1, "text": text, "incomplete": True} if skipped_images else {"page": 1, "text": text}
+        return
+
+    if not file_path.lower().endswith('.pdf'):
+        text = extract_text_from_file(file_path, language, auto_detect, progress=progress, ocr_engine=ocr_engine)
+        if text.startswith("ERROR:"):
+            raise ExtractionError(text)
+        yield {"page": 1, "text": text}
+        return
+
+    yield from _iter_pdf_text_pages(
+        file_path, auto_detect, progress=progress, ocr_engine=get_ocr_engine(ocr_engine), language=language,
+        page_ranges=page_ranges, max_pages=max_pages
+    )
+
+def extract_pages_from_file(file_path, language="English", auto_detect=False, progress=None, ocr_engine=None, page_ranges=None, max_pages=None):
+    """
+    Collects iter_pages_from_file into a list, failed pages included. Returns the list,
+    or an "ERROR: ..." string if no page had text.
+    """
     try:
-        url = 'https://api.ocr.space/parse/image'
-        payload = {
-            'apikey': OCR_SPACE_API_KEY,
-            'language': language_code,
-            'isOverlayRequired': False,
-            'scale': True,
-            'OCREngine': 2,
-        }
-        
-        with open(file_path, 'rb') as file:
-            files = {'file': file}
-            response = requests.post(url, files=files, data=payload)
-        
-        result = response.json()
-        
-        if result.get('IsErroredOnProcessing', False):
-            error_message = result.get('ErrorMessage', [])
-            error_details = result.get('ErrorDetails', [])
-            return f"ERROR: OCR processing failed: {error_message} {error_details}"
-        
-        parsed_results = result.get('ParsedResults', [])
-        if not parsed_results:
-            return "ERROR: No text found in the image."
-        
-        extracted_text = ""
-        for parsed_result in parsed_results:
-            text = parsed_result.get('ParsedText', '')
-            if text:
-                extracted_text += text + "\n"
-        
-        return extracted_text.strip()
+        return list(iter_pages_from_file(file_path, language, auto_detect, progress, ocr_engine, page_ranges, max_pages))
+    except ExtractionError as e:
+        return str(e)
+    except Overloaded:
+        raise
     except Exception as e:
-        return f"ERROR: OCR.space API error: {str(e)}"
+        return f"ERROR: Failed to extract text: {str(e)}"
+
+SCRIPT_LANGUAGE_CODES = {
+    'hindi': 'hin',
+    'marathi': 'mar',
+}
+
+# Requested languages script detection can confirm or overrule; for the other Indic
+# scripts the detector can't tell them from Latin, so the requested language is used.
+DETECTABLE_LANGUAGE_CODES = (DEFAULT_LANG, 'hin', 'mar')
+
+def ocr_language_prior(language):
+    return LANGUAGE_CODES.get(language, DEFAULT_LANG)
+
+def needs_script_detection(language, auto_detect=False):
+    prior = ocr_language_prior(language)
+    return prior in DETECTABLE_LANGUAGE_CODES and (auto_detect or prior != DEFAULT_LANG)
+
+def sample_pages(page_numbers, count=None):
+    """Up to count page numbers spread evenly over page_numbers, first and last included."""
+    page_numbers = list(page_numbers)
+    count = OCR_DETECT_SAMPLE_PAGES if count is None else count
+    if count <= 0 or not page_numbers:
+        return []
+    if len(page_numbers) <= count:
+        return page_numbers
+    if count == 1:
+        return [page_numbers[0]]
+    step = (len(page_numbers) - 1) / (count - 1)
+    return list(dict.fromkeys(page_numbers[round(i * step)] for i in range(count)))
+
+def route_ocr_language(language="English", auto_detect=False, text_hint=None, sample_images=()):
+    """
+    Picks one OCR language code for a whole document. The requested language is the
+    prior; for English, Hindi and Marathi (or with auto_detect) the script is confirmed
+    from text_hint when it is long enough, otherwise from the sample images. Failed or
+    inconclusive detections don't count: the requested language is only overruled when
+    every detection that gave a verdict disagrees with it.
+    Returns "eng" or an Indic code with English as a secondary language ("hin+eng");
+    engines that take a single language use the first part.
+    """
+    prior = ocr_language_prior(language)
+    source = "requested"
+    code = prior
+
+    if needs_script_detection(language, auto_detect):
+        if text_hint and len(text_hint.strip()) >= OCR_DETECT_MIN_TEXT_CHARS:
+            scripts = [classify_script(text_hint)]
+            source = "text"
+        else:
+            scripts = [detect_script_in_image(image) for image in sample_images]
+            source = "images"
+
+        scripts = [script for script in scripts if script is not None]
+        if not scripts:
+            source = "requested"
+        else:
+            devanagari = [script for script in scripts if script != 'english']
+            if not devanagari:
+                code = DEFAULT_LANG
+            elif prior in SCRIPT_LANGUAGE_CODES.values():
+                # Detection reliably separates Devanagari from Latin; the request breaks the Hindi/Marathi tie.
+                code = prior
+            else:
+                code = SCRIPT_LANGUAGE_CODES[max(set(devanagari), key=devanagari.count)]
+
+    logger.info(
+        "OCR language routed",
+        extra={"language": language, "auto_detect": bool(auto_detect), "ocr_language": code, "decided_by": source}
+    )
+    if code != DEFAULT_LANG:
+        return f"{code}+{DEFAULT_LANG}"
+    return code
+
+def ocr_image_page(image_bytes, auto_detect=False, ocr_engine=None, filename="page.jpg", language_code=None):
+    """
+    OCRs one encoded page image exactly once. language_code is normally decided per
+    document by route_ocr_language; without it, auto_detect detects this image's script.
+    """
+    engine = get_ocr_engine(ocr_engine)
+    if language_code is None:
+        language_code = DEFAULT_LANG
+        if auto_detect:
+            language_code = SCRIPT_LANGUAGE_CODES.get(detect_script_in_image(image_bytes), DEFAULT_LANG)
+    with admit("ocr"), timed("ocr_page"):
+        text = engine.ocr_image(image_bytes, language_code, filename)
+    OCR_PAGES.inc(engine=engine.name, outcome="error" if text.startswith("ERROR:") else "ok")
+    return text
+
+def ocr_pdf_pages(doc, auto_detect=False, max_workers=None, progress=None, ocr_engine=None, page_numbers=None, language="English", text_hint=None):
+    """
+    Renders the pages of an open PDF in memory and OCRs them on a bounded thread pool.
+    Pages are rendered, preprocessed and compressed on the calling thread (PyMuPDF
+    documents are not thread safe) while earlier pages are being OCR'd. At most
+    2 * max_workers encoded pages are held in memory at any time.
+    The OCR language is routed once for the document (see route_ocr_language), from
+    text_hint or a few sampled pages that are rendered first and reused for OCR.
+    page_numbers limits OCR to those (0-based) pages; by default every page is OCR'd.
+    If given, progress("ocr", pages_done, total_pages) is called as pages finish.
+    Yields (page_num, text, error) tuples in page order, each as soon as it and the
+    pages before it are done, so callers can start on the first pages early.
+    """
+    if page_numbers is None:
+        page_numbers = range(len(doc))
+    page_numbers = list(page_numbers)
+
+    max_workers = max(1, max_workers or OCR_PAGE_CONCURRENCY)
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    total_pages = len(page_numbers)
+    results = {}
+    pending = deque()
+    done_lock = threading.Lock()
+    done = [0]
+
+    def render(page_num):
+        with timed("render"):
+            return run_blocking(render_page_for_ocr, doc.load_page(page_num))
+
+    rendered = {}
+    sample_images = []
+    if needs_script_detection(language, auto_detect) and not (
+        text_hint and len(text_hint.strip()) >= OCR_DETECT_MIN_TEXT_CHARS
+    ):
+        for page_num in sample_pages(page_numbers):
+            try:
+                rendered[page_num] = render(page_num)
+                sample_images.append(rendered[page_num][0])
+            except Exception as e:
+                results[page_num] = (page_num, "", f"render failed: {str(e)}")
+    language_code = route_ocr_language(language, auto_detect, text_hint=text_hint, sample_images=sample_images)
+
+    def run(image_bytes, filename):
+        try:
+            return ocr_image_page(image_bytes, ocr_engine=ocr_engine, filename=filename, language_code=language_code)
+        finally:
+            slots.release()
+            if progress:
+                with done_lock:
+                    done[0] += 1
+                    pages_done = done[0]
+                progress("ocr", pages_done, total_pages)
+
+    def result(page_num, future):
+        if future is None:
+            return results.pop(page_num)
+        try:
+            page_text = future.result()
+        except Overloaded:
+            raise
+        except Exception as e:
+            return (page_num, "", str(e))
+
+        if page_text.startswith("ERROR:"):
+            return (page_num, "", page_text[len("ERROR:"):].strip())
+        return (page_num, page_text, None)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for page_num in page_numbers:
+            if page_num in results:
+                pending.append((page_num, None))
+                continue
+            slots.acquire()
+            try:
+                if page_num in rendered:
+                    image_bytes, extension = rendered.pop(page_num)
+                else:
+                    image_bytes, extension = render(page_num)
+            except Exception as e:
+                slots.release()
+                results[page_num] = (page_num, "", f"render failed: {str(e)}")
+                pending.append((page_num, None))
+                continue
+
+            pending.append((page_num, executor.submit(propagate_context(run), image_bytes, f"page_{page_num}{extension}")))
+            while pending and (pending[0][1] is None or pending[0][1].done()):
+                yield result(*pending.popleft())
+
+        while pending:
+            yield result(*pending.popleft())
 
-def ocr_space_url(image_url, language_code="eng"):
+def image_coverage(page):
+    """Fraction of the page area covered by embedded images (overlaps counted once per image)."""
+    page_area = abs(page.rect)
+    if not page_area:
+        return 0.0
+
+    covered = 0.0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"]) & page.rect
+        if not bbox.is_empty:
+            covered += abs(bbox)
+    return min(1.0, covered / page_area)
+
+def classify_pdf_page(page):
+    """
+    Decides how to read one PDF page. Returns (source, text) where source is
+    "text" (use the text layer), "ocr" (scanned or image-only page) or "empty".
+    """
+    text = page.get_text()
+    text_chars = len(text.strip())
+    coverage = image_coverage(page)
+
+    if text_chars >= PDF_PAGE_MIN_TEXT_CHARS and not (
+        coverage >= PDF_PAGE_SCAN_COVERAGE and text_chars < PDF_PAGE_SCAN_MAX_TEXT_CHARS
+    ):
+        return "text", text
+
+    if coverage > 0:
+        return "ocr", text
+
+    if text_chars:
+        return "text", text
+
+    return "empty", ""
+
+def parse_page_ranges(value):
+    """
+    Normalizes a page selection: "3-5,8", "10-" (to the end) or a list such as
+    [3, "5-7"], with 1-based inclusive page numbers. Returns a canonical string like
+    "3-5,8", or None for an empty selection. Raises ValueError if it can't be parsed.
+    """
+    if value is None or value == "" or value == []:
+        return None
+    parts = value if isinstance(value, list) else str(value).split(",")
+
+    ranges = []
+    for part in parts:
+        if isinstance(part, bool) or not isinstance(part, (int, str)):
+            raise ValueError(f"Invalid page range: {part!r}")
+        match = re.fullmatch(r"\s*(\d+)\s*(?:(-)\s*(\d*)\s*)?", str(part))
+        if not match:
+            raise ValueError(f"Invalid page range: {part!r}")
+        start = int(match.group(1))
+        end = int(match.group(3)) if match.group(3) else (None if match.group(2) else start)
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"Invalid page range: {part!r}")
+        ranges.append((start, end))
+
+    ranges.sort(key=lambda item: item[0])
+    return ",".join(
+        str(start) if end == start else f"{start}-{end if end is not None else ''}"
+        for start, end in ranges
+    )
+
+def select_pages(page_ranges, page_count, max_pages=None):
+    """
+    0-based page numbers picked by a canonical page_ranges string (all pages if None),
+    in order and without duplicates, cut to max_pages and PDF_MAX_PAGES.
+    """
+    if page_ranges:
+        selected = {}
+        for part in page_ranges.split(","):
+            start, _, end = part.partition("-")
+            last = page_count if (_ and not end) else int(end or start)
+            for number in range(int(start), min(last, page_count) + 1):
+                selected[number - 1] = True
+        page_numbers = list(selected)
+    else:
+        page_numbers = list(range(page_count))
+
+    limits = [limit for limit in (max_pages, PDF_MAX_PAGES) if limit]
+    if limits:
+        page_numbers = page_numbers[:min(limits)]
+    return page_numbers
+
+def iter_pdf_pages(pdf_path, auto_detect=False, progress=None, ocr_engine=None, language="English", page_ranges=None, max_pages=None):
+    """
+    Reads the selected pages of a PDF lazily, in page order: pages with a usable text
+    layer are read directly and only scanned or image-only pages are OCR'd, in one
+    language chosen for the whole document (the text layer pages, if any, decide the
+    script). Classifying the selected pages up front only reads their text layers;
+    rendering and OCR happen as the pages are consumed.
+    Yields {"page", "source", "text", "error"} dicts, where page is 1-based and source
+    is "text", "ocr", "empty" or "failed".
+    """
+    doc = fitz.open(pdf_path)
     try:
-        url = 'https://api.ocr.space/parse/image'
-        payload = {
-            'apikey': OCR_SPACE_API_KEY,
-            'url': image_url,
-            'language': language_code,
-            'isOverlayRequired': False,
-            'scale': True,
-            'OCREngine': 2,
-        }
-        
-        response = requests.post(url, data=payload)
-        
-        result = response.json()
-        
-        if result.get('IsErroredOnProcessing', False):
-            error_message = result.get('ErrorMessage', [])
-            error_details = result.get('ErrorDetails', [])
-            return f"ERROR: OCR processing failed: {error_message} {error_details}"
-        
-        parsed_results = result.get('ParsedResults', [])
-        if not parsed_results:
-            return "ERROR: No text found in the image."
-        
-        extracted_text = ""
-        for parsed_result in parsed_results:
-            text = parsed_result.get('ParsedText', '')
-            if text:
-                extracted_text += text + "\n"
-        
-        return extracted_text.strip()
-    except Exception as e:
-        return f"ERROR: OCR.space API error: {str(e)}"
+        classified = []
+        for page_num in select_pages(page_ranges, len(doc), max_pages):
+            source, text = run_blocking(classify_pdf_page, doc.load_page(page_num))
+            classified.append((page_num, source, text))
+
+        ocr_page_numbers = [page_num for page_num, source, _ in classified if source == "ocr"]
+        ocr_results = iter(())
+        if ocr_page_numbers:
+            ocr_results = ocr_pdf_pages(
+                doc,
+                auto_detect,
+                progress=progress,
+                ocr_engine=ocr_engine,
+                page_numbers=ocr_page_numbers,
+                language=language,
+                text_hint="".join(text for _, source, text in classified if source == "text")
+            )
+
+        for page_num, source, text in classified:
+            page = {"page": page_num + 1, "source": source, "text": text, "error": None}
+            if source == "ocr":
+                _, text, error = next(ocr_results)
+                if error:
+                    page.update({"source": "failed", "text": "", "error": error})
+                else:
+                    page["text"] = text
+            yield page
+    finally:
+        doc.close()
 
-def extract_from_pdf(pdf_path, auto_detect=False):
+def _iter_pdf_text_pages(pdf_path, auto_detect=False, progress=None, ocr_engine=None, language="English", page_ranges=None, max_pages=None):
+    """
+    Yields the PDF pages that have text as {"page", "text"} and the pages whose OCR
+    failed as {"page", "text": "", "error"}; blank pages are skipped. Raises
+    ExtractionError if no page had text.
+    """
+    sources = {}
+    errors = []
+    has_text = False
     try:
-        doc = fitz.open(pdf_path)
-        extracted_text = ""
-        
-        direct_text = ""
-        for page in doc:
-            page_text = page.get_text()
-            if page_text.strip():
-                direct_text += page_text + "\n"
-        
-        if direct_text.strip() and len(direct_text.strip()) > 50:
-            return direct_text
-        
-        with tempfile.TemporaryDirectory() as temp_dir:
-            for page_num in range(len(doc)):
-                page = doc.load_page(page_num)
-                
-                zoom = 2.0
-                mat = fitz.Matrix(zoom, zoom)
-                pix = page.get_pixmap(matrix=mat, alpha=False)
-                
-                img_path = os.path.join(temp_dir, f"page_{page_num}.png")
-                pix.save(img_path)
-                
-                page_text = ocr_space_file(img_path, language_code="eng")
-                if auto_detect:
-                    detected_script = detect_script_in_image(img_path)
-                    if detected_script == 'hindi':
-                        page_text = ocr_space_file(img_path, language_code="hin")
-                    elif detected_script == 'marathi':
-                        page_text = ocr_space_file(img_path, language_code="mar")
-                
-                if not page_text.startswith("ERROR:"):
-                    extracted_text += page_text + "\n\n"
-            
-            if not extracted_text.strip():
-                return "ERROR: Could not extract readable text from this PDF."
-            
-            return extracted_text
+        for page in iter_pdf_pages(
+            pdf_path, auto_detect, progress=progress, ocr_engine=ocr_engine, language=language,
+            page_ranges=page_ranges, max_pages=max_pages
+        ):
+            sources[page["source"]] = sources.get(page["source"], 0) + 1
+            PDF_PAGES.inc(source=page["source"])
+            if page["error"]:
+                logger.warning("OCR failed for PDF page", extra={"page": page["page"], "error": page["error"]})
+                errors.append(f"page {page['page']}: {page['error']}")
+                yield {"page": page["page"], "text": "", "error": page["error"]}
+            elif page["text"].strip():
+                has_text = True
+                yield {"page": page["page"], "text": page["text"]}
+    except Overloaded:
+        raise
     except Exception as e:
-        return f"ERROR: Failed to extract text from PDF: {str(e)}"
+        raise ExtractionError(f"ERROR: Failed to extract text from PDF: {str(e)}") from e
+    logger.info("PDF pages by source", extra={"sources": sources, "pages": sum(sources.values())})
+
+    if not has_text:
+        if errors:
+            raise ExtractionError(f"ERROR: Could not extract readable text from this PDF. {'; '.join(errors)}")
+        raise ExtractionError("ERROR: Could not extract readable text from this PDF.")
 
-def extract_from_word(docx_path, auto_detect=False):
+def extract_from_pdf(pdf_path, auto_detect=False, progress=None, ocr_engine=None, language="English", page_ranges=None, max_pages=None, per_page=False):
+    """
+    Extracts the selected pages of a PDF. Returns the page texts joined by PAGE_BREAK
+    (kept so cleanup can recognise running headers and footers), or with per_page a
+    list of page dicts as yielded by _iter_pdf_text_pages, failed pages included.
+    Returns an "ERROR: ..." string if no page had text.
+    """
+    try:
+        pages = list(_iter_pdf_text_pages(
+            pdf_path, auto_detect, progress=progress, ocr_engine=ocr_engine, language=language,
+            page_ranges=page_ranges, max_pages=max_pages
+        ))
+    except ExtractionError as e:
+        return str(e)
+
+    if per_page:
+        return pages
+    return PAGE_BREAK.join(page["text"] for page in pages if not page.get("error"))
+
+MC_FALLBACK = '{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback'
+
+def _owned_by(element, paragraph):
+    """
+    True if element belongs directly to paragraph: not inside a nested text box
+    (handled when that text box is walked) or an mc:Fallback copy of the content.
+    """
+    for ancestor in element.iterancestors():
+        if ancestor is paragraph:
+            return True
+        if ancestor.tag in (docx_ns.qn('w:txbxContent'), MC_FALLBACK):
+            return False
+    return False
+
+def _iter_block_items(parent):
+    for child in parent.iterchildren():
+        if child.tag in (docx_ns.qn('w:p'), docx_ns.qn('w:tbl')):
+            yield child
+        elif child.tag == docx_ns.qn('w:sdt'):
+            content = child.find(docx_ns.qn('w:sdtContent'))
+            if content is not None:
+                yield from _iter_block_items(content)
+
+def _walk_docx_blocks(parent, segments, include_images=True):
+    """
+    Appends the text of paragraphs, tables and text boxes under parent to segments in
+    document order. Embedded images are appended as ("image", relationship_id) markers.
+    """
+    for block in _iter_block_items(parent):
+        if block.tag == docx_ns.qn('w:tbl'):
+            _walk_docx_table(block, segments, include_images)
+            continue
+
+        text = docx_paragraph.Paragraph(block, None).text
+        if text.strip():
+            segments.append(text)
+
+        for textbox in block.iter(docx_ns.qn('w:txbxContent')):
+            if _owned_by(textbox, block):
+                _walk_docx_blocks(textbox, segments, include_images)
+
+        if include_images:
+            for blip in block.iter(docx_ns.qn('a:blip')):
+                relationship_id = blip.get(docx_ns.qn('r:embed'))
+                if relationship_id and _owned_by(blip, block):
+                    segments.append(("image", relationship_id))
+
+def _walk_docx_table(table, segments, include_images):
+    for row in table.iterchildren(docx_ns.qn('w:tr')):
+        cells = []
+        cell_images = []
+        for cell in row.iterchildren(docx_ns.qn('w:tc')):
+            cell_segments = []
+            _walk_docx_blocks(cell, cell_segments, include_images)
+            cells.append(" ".join(seg.strip() for seg in cell_segments if isinstance(seg, str)))
+            cell_images.extend(seg for seg in cell_segments if not isinstance(seg, str))
+
+        if any(cells):
+            segments.append(" | ".join(cells))
+        segments.extend(cell_images)
+
+def _docx_header_footer_texts(doc, kind):
+    texts = []
+    for section in doc.sections:
+        for attr in (f"first_page_{kind}", kind, f"even_page_{kind}"):
+            part = getattr(section, attr)
+            if part.is_linked_to_previous:
+                continue
+            segments = []
+            _walk_docx_blocks(part._element, segments, include_images=False)
+            for text in segments:
+                if text not in texts:
+                    texts.append(text)
+    return texts
+
+def _prepare_docx_image(blob, filename):
+    """Returns (image_bytes, filename) ready for OCR, or None for unreadable or too small images."""
+    try:
+        with Image.open(io.BytesIO(blob)) as img:
+            width, height = img.size
+    except Exception:
+        return None
+
+    if min(width, height) < DOCX_IMAGE_MIN_SIDE:
+        return None
+
+    try:
+        image_bytes, extension = run_blocking(prepare_image_bytes, blob)
+    except Exception:
+        image_bytes, extension = blob, os.path.splitext(filename)[1]
+    return image_bytes, f"{os.path.splitext(filename)[0]}{extension}"
+
+def _ocr_docx_image(image_bytes, ocr_engine, filename, language_code):
+    text = ocr_image_page(image_bytes, ocr_engine=ocr_engine, filename=filename, language_code=language_code)
+    if text.startswith("ERROR:"):
+        logger.warning("OCR failed for embedded image", extra={"file": filename, "error": text})
+        return None
+    return text
+
+def extract_from_word(docx_path, auto_detect=False, ocr_engine=None, language="English", skipped_images=None):
+    """
+    Extracts DOCX text natively: headers, then body paragraphs, tables and text boxes in
+    document order, then footers. Embedded body images at least DOCX_IMAGE_MIN_SIDE
+    pixels on each side are read from the package and OCR'd concurrently, and their
+    text is placed where the image appears. The OCR language is routed once, from the
+    body text when there is enough of it, otherwise from a sample of the images.
+    Images whose OCR failed are left out; their relationship ids are appended to
+    skipped_images, if given.
+    """
     try:
         doc = docx.Document(docx_path)
-        text = ""
-        
-        for paragraph in doc.paragraphs:
-            para_text = paragraph.text
-            if para_text.strip():
-                text += para_text + "\n"
-        
-        if text.strip() and len(text.strip()) > 20:
-            return text
-        
-        try:
-            import win32com.client
-            import pythoncom
-            
-            pythoncom.CoInitialize()
-            
-            word = win32com.client.Dispatch("Word.Application")
-            word.Visible = False
-            
-            pdf_path = docx_path.replace(".docx", ".pdf")
-            doc = word.Documents.Open(docx_path)
-            doc.SaveAs(pdf_path, FileFormat=17)
-            doc.Close()
-            word.Quit()
-            
-            if os.path.exists(pdf_path):
-                pdf_text = extract_from_pdf(pdf_path, auto_detect)
-                
-                os.remove(pdf_path)
-                
-                if pdf_text.strip():
-                    return pdf_text
-        except Exception as pdf_convert_err:
-            print(f"Failed to convert Word to PDF: {pdf_convert_err}")
-        
+
+        segments = []
+        _walk_docx_blocks(doc.element.body, segments)
+
+        image_texts = {}
+        relationship_ids = list(dict.fromkeys(seg[1] for seg in segments if not isinstance(seg, str)))
+        if relationship_ids:
+            related_parts = doc.part.related_parts
+            with ThreadPoolExecutor(max_workers=max(1, OCR_PAGE_CONCURRENCY)) as executor:
+                prepared = {}
+                for relationship_id in relationship_ids:
+                    image_part = related_parts.get(relationship_id)
+                    if image_part is None or not image_part.content_type.startswith("image/"):
+                        continue
+                    filename = os.path.basename(str(image_part.partname))
+                    prepared[relationship_id] = executor.submit(
+                        propagate_context(_prepare_docx_image), image_part.blob, filename
+                    )
+                prepared = {
+                    relationship_id: future.result()
+                    for relationship_id, future in prepared.items()
+                    if future.result() is not None
+                }
+
+                language_code = None
+                if prepared:
+                    sample_ids = sample_pages(list(prepared))
+                    language_code = route_ocr_language(
+                        language,
+                        auto_detect,
+                        text_hint="".join(seg for seg in segments if isinstance(seg, str)),
+                        sample_images=[prepared[relationship_id][0] for relationship_id in sample_ids]
+                    )
+
+                futures = {}
+                for relationship_id, (image_bytes, filename) in prepared.items():
+                    futures[relationship_id] = executor.submit(
+                        propagate_context(_ocr_docx_image), image_bytes, ocr_engine, filename, language_code
+                    )
+
+                for relationship_id, future in futures.items():
+                    try:
+                        image_texts[relationship_id] = future.result()
+                    except Overloaded:
+                        raise
+                    except Exception as e:
+                        logger.warning("OCR failed for embedded image", extra={"relationship_id": relationship_id, "error": str(e)})
+                    if image_texts.get(relationship_id) is None and skipped_images is not None:
+                        skipped_images.append(relationship_id)
+
+        lines = _docx_header_footer_texts(doc, "header")
+        for seg in segments:
+            if isinstance(seg, str):
+                lines.append(seg)
+            elif image_texts.get(seg[1]):
+                lines.append(image_texts[seg[1]])
+        lines.extend(_docx_header_footer_texts(doc, "footer"))
+
+        text = "".join(line + "\n" for line in lines if line.strip())
+        if not text.strip():
+            return "ERROR: Could not extract readable text from this Word document."
+
         return text
+    except Overloaded:
+        raise
     except Exception as e:
         return f"ERROR: Failed to extract text from Word document: {str(e)}"
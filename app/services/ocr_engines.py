@@ -0,0 +1,272 @@
+import io
+import logging
+import mimetypes
+import multiprocessing
+import os
+import threading
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from app.config import get_config
+from app.utils.concurrency import green_mode, run_blocking
+from app.utils.downloader import get_http_session
+from app.utils.lazy import lazy_import
+
+Image = lazy_import("PIL.Image")
+pytesseract = lazy_import("pytesseract")
+
+logger = logging.getLogger(__name__)
+
+OCR_SPACE_API_KEY = get_config().ocr_space_api_key
+OCR_SPACE_URL = os.getenv('OCR_SPACE_URL', 'https://api.ocr.space/parse/image')
+OCR_SPACE_TIMEOUT = float(os.getenv('OCR_SPACE_TIMEOUT', '60'))
+
+# Default engine when a request doesn't name one: remote (OCR.space), local (Tesseract)
+# or local_first (Tesseract, falling back to OCR.space when it finds too little text).
+OCR_ENGINE = get_config().ocr_engine
+OCR_LOCAL_WORKERS = int(os.getenv('OCR_LOCAL_WORKERS', str(os.cpu_count() or 1)))
+OCR_LOCAL_MIN_CHARS = int(os.getenv('OCR_LOCAL_MIN_CHARS', '10'))
+# Start method for the Tesseract process pool. Forking a multithreaded gunicorn worker
+# can copy held locks into the child, so the pool is started with forkserver (or spawn).
+OCR_LOCAL_START_METHOD = os.getenv('OCR_LOCAL_START_METHOD', 'forkserver')
+
+def _parse_ocr_space_response(result):
+    if result.get('IsErroredOnProcessing', False):
+        error_message = result.get('ErrorMessage', [])
+        error_details = result.get('ErrorDetails', [])
+        return f"ERROR: OCR processing failed: {error_message} {error_details}"
+    
+    parsed_results = result.get('ParsedResults', [])
+    if not parsed_results:
+        return "ERROR: No text found in the image."
+    
+    extracted_text = ""
+    for parsed_result in parsed_results:
+        text = parsed_result.get('ParsedText', '')
+        if text:
+            extracted_text += text + "\n"
+    
+    return extracted_text.strip()
+
+def _ocr_space_payload(language_code):
+    return {
+        'apikey': OCR_SPACE_API_KEY,
+        # OCR.space takes a single language; "hin+eng" style codes use the primary one.
+        'language': language_code.split('+')[0],
+        'isOverlayRequired': False,
+        'scale': True,
+        'OCREngine': 2,
+    }
+
+def ocr_space_file(file_path, language_code="eng"):
+    try:
+        with open(file_path, 'rb') as file:
+            files = {'file': file}
+            response = get_http_session().post(OCR_SPACE_URL, files=files, data=_ocr_space_payload(language_code), timeout=OCR_SPACE_TIMEOUT)
+        
+        return _parse_ocr_space_response(response.json())
+    except Exception as e:
+        return f"ERROR: OCR.space API error: {str(e)}"
+
+def ocr_space_bytes(image_bytes, language_code="eng", filename="page.jpg"):
+    try:
+        files = {'file': (filename, image_bytes, mimetypes.guess_type(filename)[0] or 'application/octet-stream')}
+        response = get_http_session().post(OCR_SPACE_URL, files=files, data=_ocr_space_payload(language_code), timeout=OCR_SPACE_TIMEOUT)
+        
+        return _parse_ocr_space_response(response.json())
+    except Exception as e:
+        return f"ERROR: OCR.space API error: {str(e)}"
+
+def ocr_space_url(image_url, language_code="eng"):
+    try:
+        payload = _ocr_space_payload(language_code)
+        payload['url'] = image_url
+        
+        response = get_http_session().post(OCR_SPACE_URL, data=payload, timeout=OCR_SPACE_TIMEOUT)
+        
+        return _parse_ocr_space_response(response.json())
+    except Exception as e:
+        return f"ERROR: OCR.space API error: {str(e)}"
+
+
+def _tesseract_ocr_file(file_path, language_code):
+    with Image.open(file_path) as img:
+        return pytesseract.image_to_string(img, lang=language_code)
+
+
+def _tesseract_ocr_bytes(image_bytes, language_code):
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        return pytesseract.image_to_string(img, lang=language_code)
+
+
+def _init_tesseract_worker():
+    # One Tesseract thread per process; parallelism comes from the pool itself.
+    os.environ['OMP_THREAD_LIMIT'] = '1'
+
+
+def _pool_context():
+    method = OCR_LOCAL_START_METHOD
+    if method not in multiprocessing.get_all_start_methods():
+        method = 'spawn'
+    return multiprocessing.get_context(method)
+
+
+class OCREngine(ABC):
+    """
+    Interface for OCR backends. ocr_file OCRs an image on disk and ocr_image OCRs
+    encoded image bytes; both return the text, or an "ERROR: ..." string.
+    language_code is a Tesseract-style code, possibly combined ("hin+eng").
+    """
+
+    name = None
+
+    @abstractmethod
+    def ocr_file(self, file_path, language_code="eng"):
+        ...
+
+    @abstractmethod
+    def ocr_image(self, image_bytes, language_code="eng", filename="page.jpg"):
+        ...
+
+
+class OCRSpaceEngine(OCREngine):
+    name = "remote"
+
+    def ocr_file(self, file_path, language_code="eng"):
+        return ocr_space_file(file_path, language_code)
+
+    def ocr_image(self, image_bytes, language_code="eng", filename="page.jpg"):
+        return ocr_space_bytes(image_bytes, language_code, filename)
+
+
+class TesseractEngine(OCREngine):
+    """
+    Local OCR with Tesseract. Pages are OCR'd in a process pool sized to the
+    machine's cores, shared by every request in the worker process. Under gevent,
+    where a process pool doesn't mix with the patched threading module, Tesseract
+    runs from the CPU thread pool instead, max_workers pages at a time.
+    Languages without installed traineddata are dropped from combined codes; when
+    the primary one is missing the page fails, so local_first falls back to OCR.space.
+    """
+
+    name = "local"
+
+    def __init__(self, max_workers=OCR_LOCAL_WORKERS):
+        self.max_workers = max(1, max_workers)
+        self._pool = None
+        self._lock = threading.Lock()
+        self._green_slots = None
+        self._languages = None
+
+    def installed_languages(self):
+        """The traineddata packs Tesseract can load, listed once per process."""
+        if self._languages is None:
+            with self._lock:
+                if self._languages is None:
+                    self._languages = frozenset(pytesseract.get_languages(config=''))
+        return self._languages
+
+    def _installed_code(self, language_code):
+        installed = self.installed_languages()
+        codes = language_code.split('+')
+        if codes[0] not in installed:
+            return None
+        return '+'.join(code for code in codes if code in installed)
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=_pool_context(),
+                        initializer=_init_tesseract_worker
+                    )
+        return self._pool
+
+    def _run_green(self, func, *args):
+        if self._green_slots is None:
+            with self._lock:
+                if self._green_slots is None:
+                    _init_tesseract_worker()
+                    self._green_slots = threading.BoundedSemaphore(self.max_workers)
+        with self._green_slots:
+            return run_blocking(func, *args)
+
+    def _run(self, func, source, language_code):
+        try:
+            code = self._installed_code(language_code)
+        except Exception as e:
+            return f"ERROR: Tesseract OCR error: {str(e)}"
+        if code is None:
+            return f"ERROR: Tesseract has no language data for {language_code.split('+')[0]}."
+
+        args = (source, code)
+        try:
+            if green_mode():
+                text = self._run_green(func, *args)
+            else:
+                text = self._get_pool().submit(func, *args).result()
+        except Exception as e:
+            return f"ERROR: Tesseract OCR error: {str(e)}"
+
+        text = text.strip()
+        if not text:
+            return "ERROR: No text found in the image."
+        return text
+
+    def ocr_file(self, file_path, language_code="eng"):
+        return self._run(_tesseract_ocr_file, file_path, language_code)
+
+    def ocr_image(self, image_bytes, language_code="eng", filename="page.jpg"):
+        return self._run(_tesseract_ocr_bytes, image_bytes, language_code)
+
+
+class LocalFirstEngine(OCREngine):
+    """Tries local Tesseract first and falls back to the remote engine on errors or near-empty output."""
+
+    name = "local_first"
+
+    def __init__(self, local, remote):
+        self.local = local
+        self.remote = remote
+
+    def _good_enough(self, text):
+        return not text.startswith("ERROR:") and len(text.strip()) >= OCR_LOCAL_MIN_CHARS
+
+    def ocr_file(self, file_path, language_code="eng"):
+        text = self.local.ocr_file(file_path, language_code)
+        if self._good_enough(text):
+            return text
+
+        logger.info("Local OCR produced too little text, falling back to OCR.space", extra={"file": os.path.basename(file_path)})
+        return self.remote.ocr_file(file_path, language_code)
+
+    def ocr_image(self, image_bytes, language_code="eng", filename="page.jpg"):
+        text = self.local.ocr_image(image_bytes, language_code, filename)
+        if self._good_enough(text):
+            return text
+
+        logger.info("Local OCR produced too little text, falling back to OCR.space", extra={"file": filename})
+        return self.remote.ocr_image(image_bytes, language_code, filename)
+
+
+_remote_engine = OCRSpaceEngine()
+_local_engine = TesseractEngine()
+
+OCR_ENGINES = {
+    "remote": _remote_engine,
+    "local": _local_engine,
+    "local_first": LocalFirstEngine(_local_engine, _remote_engine),
+}
+
+
+def get_ocr_engine(name=None):
+    """Returns the engine registered under name, or the OCR_ENGINE default. Raises ValueError if unknown."""
+    if isinstance(name, OCREngine):
+        return name
+
+    name = (name or OCR_ENGINE).lower()
+    engine = OCR_ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unsupported OCR engine: {name}. Supported engines are: {', '.join(OCR_ENGINES.keys())}")
+    return engine
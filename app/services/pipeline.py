@@ -0,0 +1,522 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from app.services.admission import Overloaded, admit, overloaded_body
+from app.services.ocr import ExtractionError, iter_pages_from_file, ocr_language_prior, parse_page_ranges, LANGUAGE_CODES
+from app.services.gemini import (
+    is_refusal, simplify_and_translate, stream_simplify_and_translate, OCR_FAILURE_MESSAGE,
+    SIMPLIFY_CHUNK_CONCURRENCY, SIMPLIFY_CHUNK_TOKENS
+)
+from app.services.cleanup import iter_clean_pages, text_quality, TEXT_MIN_QUALITY
+from app.services.cache import get_result_cache, hash_file
+from app.services.metrics import propagate_context, timed
+from app.services.ocr_engines import OCR_ENGINES
+from app.services.singleflight import coalesce, flight_key
+from app.utils.chunking import estimate_tokens
+from app.utils.downloader import download_file_from_url, DownloadError
+
+
+def parse_process_request(data):
+    """
+    Reads file_url, language and auto_detect from a process-and-simplify payload.
+    Returns (file_url, language, auto_detect, error) where error is None when valid.
+    """
+    data = data or {}
+    file_url = data.get("file_url")
+
+    language = data.get("language")
+    if language is None:
+        language = data.get("langauge", "English")
+
+    auto_detect = data.get("auto_detect", False)
+
+    if language not in LANGUAGE_CODES and language != "English":
+        return file_url, language, auto_detect, f"Unsupported language: {language}. Supported languages are: {', '.join(LANGUAGE_CODES.keys())}"
+
+    if not file_url:
+        return file_url, language, auto_detect, "file_url is required"
+
+    ocr_engine = data.get("ocr_engine")
+    if ocr_engine is not None and str(ocr_engine).lower() not in OCR_ENGINES:
+        return file_url, language, auto_detect, f"Unsupported OCR engine: {ocr_engine}. Supported engines are: {', '.join(OCR_ENGINES.keys())}"
+
+    return file_url, language, auto_detect, None
+
+
+def parse_page_options(data):
+    """
+    Reads pages ("3-5,8", "10-" or a list), max_pages and per_page from a
+    process-and-simplify payload. Returns (page_ranges, max_pages, per_page, error)
+    where page_ranges is canonical (see parse_page_ranges) and error is None when valid.
+    """
+    data = data or {}
+    try:
+        page_ranges = parse_page_ranges(data.get("pages"))
+    except ValueError as e:
+        return None, None, False, str(e)
+
+    max_pages = data.get("max_pages")
+    if max_pages is not None and (isinstance(max_pages, bool) or not isinstance(max_pages, int) or max_pages < 1):
+        return page_ranges, None, False, "max_pages must be a positive integer"
+
+    return page_ranges, max_pages, bool(data.get("per_page", False)), None
+
+
+def document_key(content_hash, page_ranges=None, max_pages=None):
+    """Cache and coalescing key for the selected pages of a document."""
+    if not page_ranges and not max_pages:
+        return content_hash
+    return f"{content_hash}:{page_ranges or ''}:{max_pages or ''}"
+
+
+def join_pages(pages):
+    """
+    The text of a list of {"page", "text"} dicts, leaving out pages whose OCR failed;
+    an "ERROR: ..." string is returned as is.
+    """
+    if isinstance(pages, str):
+        return pages
+    return "\n\n".join(page["text"] for page in pages if not page.get("error"))
+
+
+def add_failed_pages(body, pages):
+    """
+    Adds "failed_pages" ({"page", "error"} for every page whose OCR failed) to a
+    response body when there are any. Returns the body.
+    """
+    failed = [{"page": page["page"], "error": page["error"]} for page in pages if page.get("error")]
+    if failed:
+        body["failed_pages"] = failed
+    return body
+
+
+@contextmanager
+def downloaded_document(file_url, progress=None, page_ranges=None, max_pages=None):
+    """
+    Downloads a document for the duration of the block and yields (file_path,
+    document_key). Raises DownloadError if the download fails.
+    """
+    file_path = None
+    try:
+        if progress:
+            progress("download")
+        with admit("download"), timed("download"):
+            file_path = download_file_from_url(file_url)
+        yield file_path, document_key(hash_file(file_path), page_ranges, max_pages)
+    finally:
+        if file_path and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def extract_document(file_url, auto_detect=False, progress=None, ocr_engine=None, language="English", page_ranges=None, max_pages=None):
+    """
+    Downloads a document and extracts the text of the selected pages, using the
+    extracted-text cache. The requested language is the prior for the document's OCR
+    language. Returns (document_key, extracted_text, pages) where pages is a list of
+    page dicts as returned by extract_downloaded (empty if extraction failed).
+    Raises DownloadError if the download fails.
+    """
+    with downloaded_document(file_url, progress, page_ranges, max_pages) as (file_path, key):
+        pages = extract_downloaded(
+            file_path, key, language=language, auto_detect=auto_detect, progress=progress, ocr_engine=ocr_engine,
+            page_ranges=page_ranges, max_pages=max_pages
+        )
+        return key, join_pages(pages), pages if isinstance(pages, list) else []
+
+
+def _cached_pages(cache, key, auto_detect, ocr_prior):
+    cached = cache.get_extracted(key, auto_detect, ocr_prior)
+    # Entries written before extraction was per page hold the joined text.
+    return [{"page": 1, "text": cached}] if isinstance(cached, str) else cached
+
+
+def _cache_pages(cache, key, auto_detect, ocr_prior, pages):
+    # Pages whose OCR failed, or DOCX pages with images left out, may be read in full on
+    # the next attempt, so those extractions aren't cached.
+    if any(page.get("error") or page.get("incomplete") for page in pages):
+        return
+    if check_extracted_text(join_pages(pages)) is None:
+        cache.set_extracted(key, auto_detect, pages, ocr_prior)
+
+
+def extract_downloaded(file_path, key, language="English", auto_detect=False, progress=None, ocr_engine=None, slots=None, page_ranges=None, max_pages=None):
+    """
+    Returns the cleaned pages of a downloaded document (see iter_clean_extracted_pages,
+    or an "ERROR: ..." string) from the extracted-text cache, or extracts them. key is
+    the document_key of the selection. Concurrent extractions of the same content in
+    any worker are coalesced into one; slots, if given, bounds the extractions actually run.
+    """
+    cache = get_result_cache()
+    ocr_prior = ocr_language_prior(language)
+    cached = _cached_pages(cache, key, auto_detect, ocr_prior)
+    if cached is not None:
+        return cached
+
+    def extract():
+        if progress:
+            progress("ocr")
+        with slots or nullcontext(), timed("extract"):
+            pages = extract_clean_pages(
+                file_path, language=language, auto_detect=auto_detect, progress=progress, ocr_engine=ocr_engine,
+                page_ranges=page_ranges, max_pages=max_pages
+            )
+        if isinstance(pages, list):
+            _cache_pages(cache, key, auto_detect, ocr_prior, pages)
+        return pages
+
+    return coalesce("extract", flight_key(key, bool(auto_detect), ocr_prior), extract)
+
+
+def iter_downloaded_pages(file_path, key, language="English", auto_detect=False, progress=None, ocr_engine=None, page_ranges=None, max_pages=None):
+    """
+    Yields the cleaned pages of a downloaded document as they are extracted (or from
+    the extracted-text cache), so simplification can start before the last page is
+    OCR'd. The pages are cached once all of them are read. Unlike extract_downloaded
+    this isn't coalesced with other requests, whose pages would only arrive at the end.
+    Raises ExtractionError if the document has no readable text.
+    """
+    cache = get_result_cache()
+    ocr_prior = ocr_language_prior(language)
+    cached = _cached_pages(cache, key, auto_detect, ocr_prior)
+    if cached is not None:
+        yield from cached
+        return
+
+    if progress:
+        progress("ocr")
+    pages = []
+    for page in iter_clean_extracted_pages(
+        file_path, language=language, auto_detect=auto_detect, progress=progress, ocr_engine=ocr_engine,
+        page_ranges=page_ranges, max_pages=max_pages
+    ):
+        pages.append(page)
+        yield page
+    _cache_pages(cache, key, auto_detect, ocr_prior, pages)
+
+
+def simplify_document(content_hash, extracted_text, language, auto_detect=False, progress=None, mode=None, slots=None):
+    """
+    Returns the simplified text for an extracted document from the result cache, or
+    from one simplify_and_translate run shared by every concurrent request for the same
+    content and language. "Sorry, ..." replies are returned but neither cached nor
+    shared with other workers.
+    """
+    cache = get_result_cache()
+    result = cache.get_result(content_hash, language, auto_detect)
+    if result is not None:
+        return result
+
+    def simplify():
+        with slots or nullcontext():
+            text = simplify_and_translate(extracted_text, language, progress=progress, mode=mode)
+        if text and not text.startswith("Sorry,"):
+            cache.set_result(content_hash, language, auto_detect, text)
+        return text
+
+    return coalesce(
+        "simplify", flight_key(content_hash, language, bool(auto_detect)), simplify,
+        share=lambda text: bool(text) and not text.startswith("Sorry,")
+    )
+
+
+def simplify_pages(key, pages, language, auto_detect=False, mode=None, progress=None):
+    """
+    Simplifies each page on its own, SIMPLIFY_CHUNK_CONCURRENCY pages at a time, with
+    the same caching and coalescing as whole documents. pages may be a generator that
+    is still extracting: each page is submitted as soon as it arrives. Returns one dict
+    per page, in order: {"page", "original_text", "simplified_text"} or
+    {"page", "original_text", "error"}, where pages whose OCR failed keep their error.
+    """
+    def run(page):
+        result = simplify_document(f"{key}:p{page['page']}", page["text"], language, auto_detect, mode=mode)
+        if not result or result.startswith("Sorry,"):
+            return {"page": page["page"], "original_text": page["text"], "error": result or OCR_FAILURE_MESSAGE}
+        return {"page": page["page"], "original_text": page["text"], "simplified_text": result}
+
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, SIMPLIFY_CHUNK_CONCURRENCY)) as executor:
+        for page in pages:
+            if page.get("error"):
+                results.append({"page": page["page"], "original_text": "", "error": page["error"]})
+            else:
+                results.append(executor.submit(propagate_context(run), page))
+        if progress:
+            progress("simplify")
+        return [result.result() if isinstance(result, Future) else result for result in results]
+
+
+def iter_clean_extracted_pages(file_path, language="English", auto_detect=False, progress=None, ocr_engine=None, page_ranges=None, max_pages=None):
+    """
+    Extracts the selected pages of a downloaded document and runs them through cleanup
+    (see app.services.cleanup) as they are read, so boilerplate and OCR line breaks
+    never reach the cache or the model. Yields, in page order, {"page", "text"} dicts
+    for the pages left with text and {"page", "text": "", "error"} for pages whose OCR
+    failed. Raises ExtractionError if the document has no readable text.
+    """
+    # Failed pages skip cleanup; pending holds every page read until its cleaned text
+    # comes out of the stages, which return one text per page in order.
+    pending = deque()
+
+    def texts():
+        for page in iter_pages_from_file(
+            file_path, language=language, auto_detect=auto_detect, progress=progress, ocr_engine=ocr_engine,
+            page_ranges=page_ranges, max_pages=max_pages
+        ):
+            pending.append(page)
+            if not page.get("error"):
+                yield page["text"]
+
+    for text in iter_clean_pages(texts()):
+        while pending[0].get("error"):
+            yield pending.popleft()
+        page = pending.popleft()
+        if text:
+            yield {**page, "text": text}
+    yield from pending
+
+
+def extract_clean_pages(file_path, language="English", auto_detect=False, progress=None, ocr_engine=None, page_ranges=None, max_pages=None):
+    """
+    Collects iter_clean_extracted_pages into a list. Returns the list, or the
+    extraction error ("ERROR: ...") if the document has no readable text.
+    """
+    try:
+        return list(iter_clean_extracted_pages(
+            file_path, language=language, auto_detect=auto_detect, progress=progress, ocr_engine=ocr_engine,
+            page_ranges=page_ranges, max_pages=max_pages
+        ))
+    except ExtractionError as e:
+        return str(e)
+    except Overloaded:
+        raise
+    except Exception as e:
+        return f"ERROR: Failed to extract text: {str(e)}"
+
+
+def check_extracted_text(extracted_text):
+    """Returns an error (body, status_code) if the extracted text is unusable, else None."""
+    if extracted_text.startswith("ERROR:"):
+        return {
+            "error": extracted_text,
+            "suggestion": "Make sure the document is properly formatted and contains actual text content."
+        }, 422
+
+    if len(extracted_text.strip()) < 10:
+        return {
+            "error": "The OCR process produced too little text. The document may be blank or illegible.",
+            "original_text": extracted_text,
+            "suggestion": "Try a clearer document or a different file format."
+        }, 422
+
+    quality = text_quality(extracted_text)
+    if quality < TEXT_MIN_QUALITY:
+        return {
+            "error": OCR_FAILURE_MESSAGE,
+            "original_text": extracted_text,
+            "quality": quality,
+            "suggestion": "Try a clearer document or a different file format."
+        }, 422
+
+    return None
+
+
+def process_file_url(file_url, language, auto_detect=False, progress=None, simplify_mode=None, ocr_engine=None, page_ranges=None, max_pages=None, per_page=False):
+    """
+    Runs the full download -> extract -> simplify/translate pipeline for one document.
+    progress, if given, is called as progress(stage, current=None, total=None).
+    page_ranges and max_pages select PDF pages; with per_page every page is simplified
+    separately, starting as soon as it is extracted, and the body holds a "pages" list
+    instead of one text. If some pages' OCR failed, the body lists them in "failed_pages".
+    Identical requests in flight at the same time, in any worker, share one run; the
+    download is coalesced by file_url, extraction and simplification by content hash.
+    Returns (response_body, status_code).
+    """
+    body, status_code = coalesce(
+        "process",
+        flight_key(file_url, language, bool(auto_detect), simplify_mode, ocr_engine, page_ranges, max_pages, bool(per_page)),
+        lambda: _process_file_url(
+            file_url, language, auto_detect, progress, simplify_mode, ocr_engine, page_ranges, max_pages, per_page
+        ),
+        share=lambda outcome: outcome[1] < 500
+    )
+    return body, status_code
+
+
+def _process_file_url(file_url, language, auto_detect, progress, simplify_mode, ocr_engine, page_ranges, max_pages, per_page):
+    try:
+        if per_page:
+            return _process_pages(file_url, language, auto_detect, progress, simplify_mode, ocr_engine, page_ranges, max_pages)
+
+        key, extracted_text, pages = extract_document(
+            file_url, auto_detect, progress=progress, ocr_engine=ocr_engine, language=language,
+            page_ranges=page_ranges, max_pages=max_pages
+        )
+
+        error = check_extracted_text(extracted_text)
+        if error:
+            return error
+
+        result = simplify_document(key, extracted_text, language, auto_detect, progress=progress, mode=simplify_mode)
+        if result and result.startswith("Sorry,"):
+            return add_failed_pages({
+                "error": result,
+                "original_text": extracted_text,
+                "language": language,
+            }, pages), 422
+
+        return add_failed_pages({
+            "original_text": extracted_text,
+            "simplified_text": result,
+            "language": language,
+        }, pages), 200
+
+    except DownloadError as e:
+        return {"error": str(e)}, 400
+    except Overloaded:
+        raise
+    except Exception as e:
+        return {"error": str(e)}, 500
+
+
+def _process_pages(file_url, language, auto_detect, progress, simplify_mode, ocr_engine, page_ranges, max_pages):
+    with downloaded_document(file_url, progress, page_ranges, max_pages) as (file_path, key):
+        pages = iter_downloaded_pages(
+            file_path, key, language=language, auto_detect=auto_detect, progress=progress, ocr_engine=ocr_engine,
+            page_ranges=page_ranges, max_pages=max_pages
+        )
+        try:
+            results = simplify_pages(key, pages, language, auto_detect, mode=simplify_mode, progress=progress)
+        except ExtractionError as e:
+            return check_extracted_text(str(e))
+
+    status_code = 200 if any("simplified_text" in page for page in results) else 422
+    # Pages whose OCR failed are the ones without text; the rest were simplified or refused.
+    failed = [page for page in results if not page["original_text"]]
+    return add_failed_pages({"pages": results, "language": language}, failed), status_code
+
+
+def stream_process_file_url(file_url, language, auto_detect=False, ocr_engine=None, page_ranges=None, max_pages=None):
+    """
+    Streaming variant of process_file_url (without per_page). Yields (event, data) tuples: "stage" events
+    while the document is downloaded and OCR'd, "token" events with simplified text as
+    Gemini generates it, and a final "done" event with the same body the synchronous
+    endpoint returns (or an "error" event with status_code).
+    Simplification starts while later pages are still being OCR'd: once the pages read
+    so far make up SIMPLIFY_CHUNK_TOKENS and pass the quality gate they are streamed,
+    and the rest of the document follows when extraction finishes. The streamed text
+    is cached as the document's result unless the model refused to simplify it.
+    """
+    events = queue.Queue()
+    outcome = {}
+
+    def progress(stage, current=None, total=None):
+        data = {"stage": stage}
+        if total:
+            data.update({"current": current, "total": total})
+        events.put(("stage", data))
+
+    def extract():
+        try:
+            with downloaded_document(file_url, progress, page_ranges, max_pages) as (file_path, key):
+                events.put(("_key", key))
+                for page in iter_downloaded_pages(
+                    file_path, key, language=language, auto_detect=auto_detect, progress=progress,
+                    ocr_engine=ocr_engine, page_ranges=page_ranges, max_pages=max_pages
+                ):
+                    events.put(("_page", page))
+        except Exception as e:
+            outcome["error"] = e
+        finally:
+            events.put(None)
+
+    cache = get_result_cache()
+    key = result = None
+    pages = []
+    pending = []
+    pieces = []
+
+    def simplify(text, check_quality=True):
+        if pieces:
+            pieces.append("\n\n")
+            yield "token", {"text": "\n\n"}
+        else:
+            yield "stage", {"stage": "simplify"}
+        for piece in stream_simplify_and_translate(text, language, check_quality=check_quality):
+            pieces.append(piece)
+            yield "token", {"text": piece}
+
+    threading.Thread(target=propagate_context(extract), daemon=True).start()
+    try:
+        while True:
+            event = events.get()
+            if event is None:
+                break
+            name, data = event
+            if name == "_key":
+                key = data
+                result = cache.get_result(key, language, auto_detect)
+            elif name == "_page":
+                pages.append(data)
+                if result is None and data["text"]:
+                    pending.append(data["text"])
+                    text = "\n\n".join(pending)
+                    if estimate_tokens(text) >= SIMPLIFY_CHUNK_TOKENS and check_extracted_text(text) is None:
+                        pending = []
+                        yield from simplify(text)
+            else:
+                yield event
+
+        if "error" in outcome:
+            if isinstance(outcome["error"], ExtractionError):
+                body, status_code = check_extracted_text(str(outcome["error"]))
+                yield "error", {**body, "status_code": status_code}
+            elif isinstance(outcome["error"], Overloaded):
+                yield "error", {**overloaded_body(outcome["error"]), "status_code": 429}
+            else:
+                status_code = 400 if isinstance(outcome["error"], DownloadError) else 500
+                yield "error", {"error": str(outcome["error"]), "status_code": status_code}
+            return
+
+        extracted_text = join_pages(pages)
+        if not pieces:
+            error = check_extracted_text(extracted_text)
+            if error:
+                body, status_code = error
+                yield "error", {**body, "status_code": status_code}
+                return
+
+        yield "stage", {"stage": "ocr_done", "characters": len(extracted_text)}
+
+        if result is None:
+            # Once part of the document is streamed, the rest is simplified even if it is
+            # too short to pass the quality gate on its own: no extracted text is dropped.
+            text = "\n\n".join(pending)
+            if text or not pieces:
+                yield from simplify(text, check_quality=not pieces)
+    except ValueError as e:
+        yield "error", {"error": str(e), "original_text": join_pages(pages), "language": language, "status_code": 422}
+        return
+    except Overloaded as e:
+        yield "error", {**overloaded_body(e), "status_code": 429}
+        return
+
+    if result is None:
+        result = "".join(pieces).strip()
+        if not result:
+            yield "error", {"error": "Sorry, I couldn't process your request. The text may be gibberish or unrecognizable.", "status_code": 422}
+            return
+        if is_refusal(result):
+            yield "error", {"error": OCR_FAILURE_MESSAGE, "original_text": extracted_text, "language": language, "status_code": 422}
+            return
+        cache.set_result(key, language, auto_detect, result)
+    else:
+        yield "token", {"text": result}
+
+    yield "done", add_failed_pages({
+        "original_text": extracted_text,
+        "simplified_text": result,
+        "language": language,
+    }, pages)
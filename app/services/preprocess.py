@@ -0,0 +1,154 @@
+import logging
+import os
+from app.utils.lazy import lazy_import
+
+cv2 = lazy_import("cv2")
+fitz = lazy_import("fitz")
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Pages are rendered so their long side is about this many pixels, clamped to the DPI range.
+PDF_RENDER_TARGET_PX = int(os.getenv('PDF_RENDER_TARGET_PX', '2400'))
+PDF_RENDER_MIN_DPI = int(os.getenv('PDF_RENDER_MIN_DPI', '110'))
+PDF_RENDER_MAX_DPI = int(os.getenv('PDF_RENDER_MAX_DPI', '300'))
+
+# Comma separated steps applied before OCR: grayscale, binarize, deskew.
+OCR_PREPROCESS = [
+    step.strip() for step in os.getenv('OCR_PREPROCESS', 'grayscale').lower().split(',') if step.strip()
+]
+
+# OCR.space rejects uploads over 1 MB on the free tier.
+OCR_UPLOAD_MAX_BYTES = int(os.getenv('OCR_UPLOAD_MAX_BYTES', str(1024 * 1024)))
+
+JPEG_QUALITIES = (85, 75, 60, 45)
+MIN_ENCODE_SIDE = 800
+
+
+def choose_dpi(page):
+    """Picks a render DPI from the page size so small and large pages end up with similar pixel counts."""
+    long_side_inches = max(page.rect.width, page.rect.height) / 72
+    if long_side_inches <= 0:
+        return PDF_RENDER_MIN_DPI
+    dpi = PDF_RENDER_TARGET_PX / long_side_inches
+    return int(min(PDF_RENDER_MAX_DPI, max(PDF_RENDER_MIN_DPI, dpi)))
+
+
+def grayscale(image):
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+
+def binarize(image):
+    gray = grayscale(image)
+    _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return binary
+
+
+def deskew(image, max_angle=15):
+    """Rotates the image so text lines are horizontal. Skews above max_angle degrees are left alone."""
+    gray = grayscale(image)
+    _, inverted = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    coords = cv2.findNonZero(inverted)
+    if coords is None or len(coords) < 100:
+        return image
+
+    angle = cv2.minAreaRect(coords)[-1]
+    # minAreaRect reports angles in [0, 90) on OpenCV >= 4.5 and [-90, 0) before.
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 0.1 or abs(angle) > max_angle:
+        return image
+
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(
+        image, matrix, (width, height),
+        flags=cv2.INTER_CUBIC,
+        borderMode=cv2.BORDER_REPLICATE
+    )
+
+
+PREPROCESS_STEPS = {
+    "grayscale": grayscale,
+    "binarize": binarize,
+    "deskew": deskew,
+}
+
+
+def preprocess_image(image, steps=None):
+    steps = OCR_PREPROCESS if steps is None else steps
+    for step in steps:
+        func = PREPROCESS_STEPS.get(step)
+        if func is None:
+            logger.warning("Unknown preprocessing step '%s', skipping", step)
+            continue
+        image = func(image)
+    return image
+
+
+def encode_for_upload(image, max_bytes=None):
+    """
+    Compresses an image array to at most max_bytes. Two-tone images are tried as PNG
+    first; otherwise JPEG quality is lowered step by step and the image is
+    downscaled if that is still not enough.
+    Returns (image_bytes, extension).
+    """
+    max_bytes = max_bytes or OCR_UPLOAD_MAX_BYTES
+    if image.ndim == 3 and image.shape[2] == 3:
+        image = cv2.cvtColor(image, cv2.COLOR_RGB2BGR)
+    elif image.ndim == 3 and image.shape[2] == 4:
+        image = cv2.cvtColor(image, cv2.COLOR_RGBA2BGR)
+
+    if image.ndim == 2 and len(np.unique(image[::8, ::8])) <= 2:
+        ok, encoded = cv2.imencode('.png', image, [cv2.IMWRITE_PNG_COMPRESSION, 9])
+        if ok and len(encoded) <= max_bytes:
+            return encoded.tobytes(), '.png'
+
+    while True:
+        for quality in JPEG_QUALITIES:
+            ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+            if ok and len(encoded) <= max_bytes:
+                return encoded.tobytes(), '.jpg'
+
+        height, width = image.shape[:2]
+        if max(height, width) <= MIN_ENCODE_SIDE:
+            return encoded.tobytes(), '.jpg'
+        image = cv2.resize(image, (int(width * 0.8), int(height * 0.8)), interpolation=cv2.INTER_AREA)
+
+
+def render_page_for_ocr(page, dpi=None, steps=None, max_bytes=None):
+    """
+    Renders a PDF page straight into memory and returns (image_bytes, extension) ready
+    for OCR. The pixmap samples are wrapped as a NumPy array without copying; the
+    pixmap is kept alive until the encoded bytes have been produced.
+    """
+    steps = OCR_PREPROCESS if steps is None else steps
+    colorspace = fitz.csGRAY if "grayscale" in steps or "binarize" in steps else fitz.csRGB
+    pix = page.get_pixmap(dpi=dpi or choose_dpi(page), colorspace=colorspace, alpha=False)
+
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    image = np.frombuffer(samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    if pix.n == 1:
+        image = image[:, :, 0]
+
+    image = preprocess_image(image, steps)
+    encoded = encode_for_upload(image, max_bytes)
+    del image, samples, pix
+    return encoded
+
+
+def prepare_image_bytes(image_bytes, steps=None, max_bytes=None):
+    """Decodes an uploaded image, applies preprocessing and re-encodes it to fit the upload limit."""
+    data = np.frombuffer(image_bytes, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_COLOR)
+    if image is None:
+        raise ValueError("Could not decode image")
+    image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    image = preprocess_image(image, steps)
+    return encode_for_upload(image, max_bytes)
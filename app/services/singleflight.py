@@ -0,0 +1,239 @@
+"""
+Single-flight coalescing: concurrent callers asking for the same computation share one
+run of it instead of each starting their own.
+
+Inside a worker, followers wait on the leader's result. Across workers on the host the
+leader holds a lease row in a SQLite file (SINGLEFLIGHT_PATH) and publishes its result
+there for SINGLEFLIGHT_RESULT_TTL seconds, and followers in other workers poll for it.
+If the leader fails or its lease expires, a waiting worker takes over. Results shared
+across workers must be JSON serializable. A leader that was not admitted (Overloaded)
+only ran out of its own wait budget, so its followers run the computation themselves.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from app.services.admission import Overloaded
+from app.services.metrics import SINGLEFLIGHT_CALLS
+from app.utils.concurrency import run_blocking
+
+logger = logging.getLogger(__name__)
+
+SINGLEFLIGHT_ENABLED = os.getenv("SINGLEFLIGHT_ENABLED", "true").lower() in ("1", "true", "yes")
+# Coalesce across gunicorn workers through SINGLEFLIGHT_PATH, not only across threads.
+SINGLEFLIGHT_SHARED = os.getenv("SINGLEFLIGHT_SHARED", "true").lower() in ("1", "true", "yes")
+SINGLEFLIGHT_PATH = os.getenv(
+    "SINGLEFLIGHT_PATH",
+    os.path.join(tempfile.gettempdir(), "simplifai_flights.sqlite3")
+)
+# A leader that hasn't finished after this long is presumed dead and another worker takes over.
+SINGLEFLIGHT_LEASE_SECONDS = float(os.getenv("SINGLEFLIGHT_LEASE_SECONDS", "300"))
+# How long a finished result stays readable by followers in other workers. This only
+# covers requests that were waiting; the result caches handle everything later.
+SINGLEFLIGHT_RESULT_TTL = float(os.getenv("SINGLEFLIGHT_RESULT_TTL", "10"))
+SINGLEFLIGHT_POLL_INTERVAL = float(os.getenv("SINGLEFLIGHT_POLL_INTERVAL", "0.2"))
+SINGLEFLIGHT_WAIT_TIMEOUT = float(os.getenv("SINGLEFLIGHT_WAIT_TIMEOUT", "300"))
+
+
+def flight_key(*parts):
+    """Stable key for a computation identified by parts (strings, numbers, lists of them)."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False, default=str).encode("utf-8")).hexdigest()
+
+
+class LocalFlights:
+    """Coalesces calls across the threads of one process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def run(self, key, compute):
+        """
+        Returns (value, leader). Followers get the leader's value or exception, including
+        BaseExceptions such as a killed greenlet's, so they are never left without either.
+        The exception is Overloaded, which reflects the leader's deadline rather than the
+        computation: its followers start over, one of them as the new leader.
+        """
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                leader = entry is None
+                if leader:
+                    entry = {"done": threading.Event()}
+                    self._entries[key] = entry
+
+            if leader:
+                try:
+                    entry["value"] = compute()
+                except BaseException as e:
+                    entry["error"] = e
+                finally:
+                    with self._lock:
+                        self._entries.pop(key, None)
+                    entry["done"].set()
+            else:
+                entry["done"].wait()
+                if isinstance(entry.get("error"), Overloaded):
+                    continue
+
+            if "error" in entry:
+                raise entry["error"]
+            return entry["value"], leader
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class SQLiteFlights:
+    """
+    Lease and result rows shared by every worker on the host. Database calls go through
+    _run, as in SQLiteCache.
+    """
+
+    def __init__(self, path=SINGLEFLIGHT_PATH):
+        self.path = path
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._run(self._create)
+
+    def _run(self, func, *args):
+        with self._lock:
+            return run_blocking(func, *args)
+
+    def _create(self):
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS flights ("
+                "key TEXT PRIMARY KEY, owner TEXT NOT NULL, state TEXT NOT NULL, "
+                "value TEXT, expires_at REAL NOT NULL)"
+            )
+
+    def acquire(self, key):
+        """
+        Returns ("leader", None) if this worker should compute, ("running", None) if
+        another worker is computing, or ("done", value) if its result is available.
+        """
+        return self._run(self._acquire, key, time.time())
+
+    def _acquire(self, key, now):
+        with self._conn:
+            self._conn.execute("DELETE FROM flights WHERE expires_at < ?", (now,))
+            row = self._conn.execute(
+                "SELECT state, value FROM flights WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute(
+                    "INSERT INTO flights (key, owner, state, value, expires_at) VALUES (?, ?, 'running', NULL, ?)",
+                    (key, self.owner, now + SINGLEFLIGHT_LEASE_SECONDS)
+                )
+                return "leader", None
+
+            state, value = row
+            if state == "done":
+                return "done", json.loads(value)
+            return "running", None
+
+    def publish(self, key, value):
+        self._run(
+            self._execute,
+            "UPDATE flights SET state = 'done', value = ?, expires_at = ? WHERE key = ? AND owner = ?",
+            (json.dumps(value), time.time() + SINGLEFLIGHT_RESULT_TTL, key, self.owner)
+        )
+
+    def release(self, key):
+        self._run(self._execute, "DELETE FROM flights WHERE key = ? AND owner = ? AND state = 'running'", (key, self.owner))
+
+    def _execute(self, sql, params):
+        with self._conn:
+            self._conn.execute(sql, params)
+
+
+_local = LocalFlights()
+_shared = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_flights():
+    """The cross-worker store, or None when disabled or unavailable."""
+    global _shared
+    if not SINGLEFLIGHT_SHARED:
+        return None
+    if _shared is None:
+        with _shared_lock:
+            if _shared is None:
+                try:
+                    _shared = SQLiteFlights()
+                except Exception as e:
+                    logger.warning("Shared single-flight store unavailable, coalescing within this worker only", extra={"error": str(e)})
+                    _shared = False
+    return _shared or None
+
+
+def _run_shared(key, compute, kind, share):
+    """Returns (value, role) where role says how this worker got the value."""
+    shared = get_shared_flights()
+    if shared is None:
+        return compute(), "leader"
+
+    deadline = time.monotonic() + SINGLEFLIGHT_WAIT_TIMEOUT
+    waited = False
+    while True:
+        try:
+            state, value = shared.acquire(key)
+        except Exception as e:
+            logger.warning("Shared single-flight store failed", extra={"kind": kind, "error": str(e)})
+            return compute(), "leader"
+
+        if state == "done":
+            return value, "follower_shared"
+        if state == "leader":
+            break
+        if time.monotonic() >= deadline:
+            logger.warning("Gave up waiting for another worker", extra={"kind": kind, "waited_s": SINGLEFLIGHT_WAIT_TIMEOUT})
+            return compute(), "timeout"
+        waited = True
+        time.sleep(SINGLEFLIGHT_POLL_INTERVAL)
+
+    if waited:
+        logger.info("Took over a computation from another worker", extra={"kind": kind})
+    try:
+        value = compute()
+    except BaseException:
+        _safely(shared.release, key)
+        raise
+    if share(value):
+        _safely(shared.publish, key, value)
+    else:
+        _safely(shared.release, key)
+    return value, "leader"
+
+
+def _safely(method, *args):
+    try:
+        method(*args)
+    except Exception as e:
+        logger.warning("Shared single-flight store failed", extra={"error": str(e)})
+
+
+def coalesce(kind, key, compute, share=None):
+    """
+    Runs compute() once for all concurrent callers with the same kind and key and
+    returns its value to each of them. share(value) decides whether a result is handed
+    to followers in other workers (default: always); followers in this worker always
+    get the leader's value, or its exception.
+    """
+    if not SINGLEFLIGHT_ENABLED:
+        return compute()
+
+    share = share or (lambda value: True)
+    (value, role), leader = _local.run(f"{kind}:{key}", lambda: _run_shared(f"{kind}:{key}", compute, kind, share))
+    SINGLEFLIGHT_CALLS.inc(kind=kind, role=role if leader else "follower_local")
+    return value
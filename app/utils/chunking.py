@@ -0,0 +1,63 @@
+import math
+import os
+
+# Rough characters-per-token ratio used to budget prompt sizes without a tokenizer.
+CHARS_PER_TOKEN = int(os.getenv('CHARS_PER_TOKEN', '4'))
+
+# Tried in order: page breaks, paragraphs, lines, sentences, words.
+SEPARATORS = ["\f", "\n\n", "\n", ". ", " "]
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def split_text_into_chunks(text, max_tokens):
+    """
+    Splits text into chunks of at most max_tokens (estimated), preferring page
+    and paragraph boundaries and only falling back to lines, sentences, words
+    and finally hard cuts when a single piece is too large.
+    Returns the chunks in their original order.
+    """
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    return [chunk for chunk in _split(text, max_chars, 0) if chunk.strip()]
+
+
+def _split(text, max_chars, level):
+    if len(text) <= max_chars:
+        return [text]
+
+    if level >= len(SEPARATORS):
+        return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+    separator = SEPARATORS[level]
+    parts = text.split(separator)
+    if len(parts) == 1:
+        return _split(text, max_chars, level + 1)
+
+    # Punctuation in a separator (the period of ". ") stays with the piece before it,
+    # so it isn't lost when a chunk ends there.
+    kept = separator.rstrip()
+    if kept:
+        parts = [part + kept for part in parts[:-1]] + parts[-1:]
+        separator = separator[len(kept):]
+
+    chunks = []
+    current = ""
+    for part in parts:
+        candidate = part if not current else current + separator + part
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+
+        if current:
+            chunks.append(current)
+        if len(part) > max_chars:
+            chunks.extend(_split(part, max_chars, level + 1))
+            current = ""
+        else:
+            current = part
+
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,40 @@
+import os
+import threading
+
+# Real OS threads available for CPU-bound work (page rendering, image preprocessing)
+# when serving with gevent workers.
+CPU_THREADPOOL_SIZE = int(os.getenv("CPU_THREADPOOL_SIZE", str(os.cpu_count() or 1)))
+
+_threadpool_lock = threading.Lock()
+_threadpool_configured = False
+
+
+def green_mode():
+    """True when running under gevent with the standard library monkey-patched (SERVER_MODE=async)."""
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def run_blocking(func, *args, **kwargs):
+    """
+    Runs func, which is CPU-bound or blocks in a way gevent can't make cooperative
+    (SQLite waiting on a database lock). Under gevent it runs on the hub's pool of real
+    OS threads so it doesn't stall every other request the worker is serving;
+    otherwise it is called directly on the current thread.
+    """
+    if not green_mode():
+        return func(*args, **kwargs)
+
+    import gevent
+
+    global _threadpool_configured
+    threadpool = gevent.get_hub().threadpool
+    if not _threadpool_configured:
+        with _threadpool_lock:
+            if not _threadpool_configured:
+                threadpool.maxsize = max(1, CPU_THREADPOOL_SIZE)
+                _threadpool_configured = True
+    return threadpool.apply(func, args, kwargs)
@@ -1,31 +1,161 @@
 import requests
 import os
 import tempfile
+import threading
+import time
 import uuid
+import zipfile
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import HTTPError as Urllib3HTTPError, ReadTimeoutError
 
+DOWNLOAD_MAX_BYTES = int(os.getenv('DOWNLOAD_MAX_BYTES', str(50 * 1024 * 1024)))
+DOWNLOAD_CONNECT_TIMEOUT = float(os.getenv('DOWNLOAD_CONNECT_TIMEOUT', '5'))
+DOWNLOAD_READ_TIMEOUT = float(os.getenv('DOWNLOAD_READ_TIMEOUT', '30'))
+DOWNLOAD_TOTAL_TIMEOUT = float(os.getenv('DOWNLOAD_TOTAL_TIMEOUT', '120'))
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))
 
-def download_file_from_url(url):
+# (magic prefix, extension) pairs checked in order against the first bytes of a file.
+MAGIC_SIGNATURES = [
+    (b'%PDF', '.pdf'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+    (b'BM', '.bmp'),
+    (b'II*\x00', '.tiff'),
+    (b'MM\x00*', '.tiff'),
+]
+
+_session = None
+_session_lock = threading.Lock()
+
+
+class DownloadError(Exception):
+    pass
+
+
+def get_http_session():
+    """
+    Returns a process-wide requests.Session so connections to the same host
+    are pooled and kept alive across calls.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=10, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                _session = session
+    return _session
+
+
+def sniff_file_extension(file_path):
+    """
+    Detects the file type from its leading bytes. Returns an extension such as
+    '.pdf' or '.docx', or None if the type is not recognised.
+    """
+    with open(file_path, 'rb') as f:
+        head = f.read(16)
+
+    for signature, extension in MAGIC_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+
+    if head.startswith(b'PK\x03\x04'):
+        try:
+            with zipfile.ZipFile(file_path) as archive:
+                if 'word/document.xml' in archive.namelist():
+                    return '.docx'
+        except zipfile.BadZipFile:
+            pass
+
+    return None
+
+
+def _iter_body(response, deadline):
     """
-    Downloads a file from URL to a temporary directory with a unique filename.
+    Yields the body of a streamed response as it arrives. Every socket read times out
+    at DOWNLOAD_READ_TIMEOUT or at deadline, whichever comes first, so an origin that
+    trickles or stalls can't keep the download going past the deadline.
+    """
+    raw = response.raw
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise DownloadError(f"Download took longer than {DOWNLOAD_TOTAL_TIMEOUT:g} seconds")
+        sock = getattr(raw.connection, "sock", None)
+        if sock is not None:
+            sock.settimeout(min(DOWNLOAD_READ_TIMEOUT, remaining))
+        try:
+            chunk = raw.read1(DOWNLOAD_CHUNK_SIZE, decode_content=True)
+        except ReadTimeoutError as e:
+            if time.monotonic() >= deadline:
+                raise DownloadError(f"Download took longer than {DOWNLOAD_TOTAL_TIMEOUT:g} seconds") from e
+            raise DownloadError(f"Failed to download file: {str(e)}") from e
+        except Urllib3HTTPError as e:
+            raise DownloadError(f"Failed to download file: {str(e)}") from e
+        if not chunk:
+            return
+        yield chunk
+
+
+def download_file_from_url(url, max_bytes=None):
+    """
+    Streams a file from URL to a temporary directory with a unique filename.
+    The body is written as it arrives and aborted once it exceeds max_bytes or the
+    overall download deadline (see _iter_body). The file extension is taken from the content's
+    magic bytes, falling back to the URL path.
     Returns the full path to the downloaded file.
     The caller is responsible for deleting the file after processing.
     """
-    # Create a unique filename to avoid collisions
-    original_filename = url.split("/")[-1]
-    file_extension = os.path.splitext(original_filename)[1]
-    unique_filename = f"{uuid.uuid4()}{file_extension}"
-    
+    max_bytes = max_bytes or DOWNLOAD_MAX_BYTES
+
     # Create temp directory if it doesn't exist
     temp_dir = os.path.join(tempfile.gettempdir(), 'simplifai_temp')
     os.makedirs(temp_dir, exist_ok=True)
-    
+
+    unique_name = str(uuid.uuid4())
+    partial_path = os.path.join(temp_dir, f"{unique_name}.part")
+
+    deadline = time.monotonic() + DOWNLOAD_TOTAL_TIMEOUT
+    try:
+        with get_http_session().get(
+            url,
+            stream=True,
+            timeout=(DOWNLOAD_CONNECT_TIMEOUT, min(DOWNLOAD_READ_TIMEOUT, DOWNLOAD_TOTAL_TIMEOUT))
+        ) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get('Content-Length')
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise DownloadError(f"File is too large ({int(content_length)} bytes, limit is {max_bytes} bytes)")
+
+            received = 0
+            with open(partial_path, 'wb') as f:
+                for chunk in _iter_body(response, deadline):
+                    received += len(chunk)
+                    if received > max_bytes:
+                        raise DownloadError(f"File is too large (limit is {max_bytes} bytes)")
+                    f.write(chunk)
+    except requests.RequestException as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise DownloadError(f"Failed to download file: {str(e)}") from e
+    except Exception:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        raise
+
+    file_extension = sniff_file_extension(partial_path)
+    if file_extension is None:
+        file_extension = os.path.splitext(urlparse(url).path)[1].lower()
+
     # Full path to save the file
-    temp_file_path = os.path.join(temp_dir, unique_filename)
-    
-    # Download the file
-    response = requests.get(url)
-    
-    with open(temp_file_path, 'wb') as f:
-        f.write(response.content)
-    
-    return temp_file_path
\ No newline at end of file
+    temp_file_path = os.path.join(temp_dir, f"{unique_name}{file_extension}")
+    os.replace(partial_path, temp_file_path)
+
+    return temp_file_path
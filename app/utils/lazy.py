@@ -0,0 +1,47 @@
+import importlib
+import importlib.util
+import threading
+
+
+class LazyModule:
+    """
+    Stands in for a module and imports it on first attribute access, so heavy
+    libraries (PyMuPDF, OpenCV, Tesseract bindings, the Gemini SDK) don't slow
+    down worker boot or break startup when they are missing.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        if attr.startswith("__") and attr.endswith("__"):
+            raise AttributeError(attr)
+        value = getattr(self._load(), attr)
+        # Cached on the proxy so later lookups skip __getattr__.
+        setattr(self, attr, value)
+        return value
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module '{self._name}' ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def module_available(name):
+    """True if name can be imported, checked without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
@@ -0,0 +1,70 @@
+import contextvars
+import json
+import logging
+import os
+import sys
+import time
+
+# "json" emits one object per line for log shippers; "text" is easier to read locally.
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+# Attributes every LogRecord has; anything else was passed through extra= and is logged as a field.
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+# Set per HTTP request; copied into worker threads along with the rest of the context.
+request_id_var = contextvars.ContextVar("simplifai_request_id", default=None)
+
+
+class _RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        request_id = request_id_var.get()
+        if request_id is not None and not hasattr(record, "request_id"):
+            record.request_id = request_id
+        return True
+
+
+def _extra_fields(record):
+    return {key: value for key, value in vars(record).items() if key not in _RESERVED_ATTRS}
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        entry.update(_extra_fields(record))
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+def configure_logging():
+    """Installs a single stdout handler on the app's root logger. Safe to call more than once."""
+    logger = logging.getLogger("app")
+    if getattr(logger, "_simplifai_configured", False):
+        return logger
+
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JSONFormatter() if LOG_FORMAT == "json" else TextFormatter())
+    handler.addFilter(_RequestIdFilter())
+    logger.addHandler(handler)
+    logger.setLevel(LOG_LEVEL)
+    logger.propagate = False
+    logger._simplifai_configured = True
+    return logger
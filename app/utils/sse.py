@@ -0,0 +1,34 @@
+import json
+from flask import Response, request, stream_with_context
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def wants_stream(data=None):
+    """
+    Streaming is opt-in: "stream": true in the JSON body, ?stream=1 in the query
+    string, or an Accept: text/event-stream header.
+    """
+    if data and data.get("stream"):
+        return True
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+
+def sse_response(events):
+    """Wraps a generator of (event, data) tuples in a Server-Sent Events response."""
+    def generate():
+        for event, data in events:
+            yield format_sse(event, data)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+        }
+    )
@@ -0,0 +1,117 @@
+"""
+Generates the benchmark's sample inputs: a PNG, a scanned (image-only) PDF, a text
+PDF and a DOCX with a table and an embedded image. Files are written to a
+directory and can be served to the downloader with serve_corpus().
+"""
+import functools
+import io
+import os
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+import docx
+import fitz
+from PIL import Image, ImageDraw
+
+PARAGRAPH = (
+    "The municipal corporation hereby notifies all residents that property tax for the "
+    "current financial year must be paid before the thirty-first of March. Late payments "
+    "will attract a penalty of two percent per month on the outstanding amount."
+)
+
+
+def _text_image(width=1654, height=2339, lines=40):
+    """Renders an A4-at-200-DPI page of text, the size a phone scan typically has."""
+    img = Image.new("RGB", (width, height), "white")
+    draw = ImageDraw.Draw(img)
+    words = (PARAGRAPH + " ") * 20
+    y = 80
+    for line in range(lines):
+        start = (line * 90) % (len(words) - 90)
+        draw.text((80, y), words[start:start + 90], fill="black")
+        y += 50
+    return img
+
+
+def _png_bytes(img):
+    buffer = io.BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def make_png(path):
+    _text_image().save(path, format="PNG")
+
+
+def make_scanned_pdf(path, pages=5):
+    image_bytes = _png_bytes(_text_image())
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_image(page.rect, stream=image_bytes)
+    doc.save(path)
+    doc.close()
+
+
+def make_text_pdf(path, pages=5):
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_textbox(
+            fitz.Rect(50, 50, 545, 792),
+            f"Page {page_num + 1}\n\n" + "\n\n".join([PARAGRAPH] * 6),
+            fontsize=11
+        )
+    doc.save(path)
+    doc.close()
+
+
+def make_docx(path):
+    document = docx.Document()
+    document.sections[0].header.paragraphs[0].text = "Municipal Corporation - Public Notice"
+    document.add_heading("Property Tax Notice", level=1)
+    for _ in range(3):
+        document.add_paragraph(PARAGRAPH)
+
+    table = document.add_table(rows=4, cols=3)
+    for row_index, row in enumerate(table.rows):
+        for col_index, cell in enumerate(row.cells):
+            cell.text = f"Ward {row_index + 1}" if col_index == 0 else f"Rs. {(row_index + 1) * (col_index + 1) * 1000}"
+
+    image = io.BytesIO(_png_bytes(_text_image(width=1200, height=800, lines=12)))
+    document.add_picture(image)
+    document.save(path)
+
+
+CORPUS = {
+    "sample.png": make_png,
+    "scanned.pdf": make_scanned_pdf,
+    "text.pdf": make_text_pdf,
+    "sample.docx": make_docx,
+}
+
+
+def build_corpus(directory):
+    """Writes every corpus file that does not exist yet. Returns {name: path}."""
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for name, make in CORPUS.items():
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            make(path)
+        paths[name] = path
+    return paths
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_corpus(directory, host="127.0.0.1", port=0):
+    """Serves the corpus directory over HTTP on a background thread. Returns (server, base_url)."""
+    handler = functools.partial(_QuietHandler, directory=directory)
+    httpd = ThreadingHTTPServer((host, port), handler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    host, port = httpd.server_address[:2]
+    return httpd, f"http://{host}:{port}"
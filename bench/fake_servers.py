@@ -0,0 +1,223 @@
+"""
+Local stand-ins for OCR.space and the Gemini API, used by the benchmark harness.
+
+Both servers support a fixed latency plus jitter, a random error rate and a
+server-side rate limit (requests per second), so the backend's retry, rate
+limiting and concurrency behaviour can be exercised without calling the real
+services.
+"""
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+SAMPLE_TEXT = (
+    "The municipal corporation hereby notifies all residents that property tax for the "
+    "current financial year must be paid before the thirty-first of March. Late payments "
+    "will attract a penalty of two percent per month on the outstanding amount."
+)
+
+
+class FakeServerConfig:
+    def __init__(self, latency=0.2, jitter=0.05, error_rate=0.0, rate_limit=0.0, token_delay=0.02):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        # Requests per second before answering 429; 0 disables the limit.
+        self.rate_limit = rate_limit
+        # Delay between streamed chunks (Gemini only).
+        self.token_delay = token_delay
+
+
+class _RateLimiter:
+    def __init__(self, rate):
+        self.rate = rate
+        self._tokens = max(1.0, rate)
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        if self.rate <= 0:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(max(1.0, self.rate), self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config = None
+    limiter = None
+    stats = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _simulate(self):
+        """Applies rate limit, latency and random errors. Returns False if an error was sent."""
+        with self.stats["lock"]:
+            self.stats["requests"] += 1
+
+        if not self.limiter.allow():
+            with self.stats["lock"]:
+                self.stats["rate_limited"] += 1
+            self._send_error(429, "Rate limit exceeded")
+            return False
+
+        time.sleep(max(0.0, self.config.latency + random.uniform(-self.config.jitter, self.config.jitter)))
+
+        if random.random() < self.config.error_rate:
+            with self.stats["lock"]:
+                self.stats["errors"] += 1
+            self._send_error(503, "Simulated server error")
+            return False
+        return True
+
+    def _send_error(self, status, message):
+        self._send_json(status, {"error": {"code": status, "message": message, "status": "UNAVAILABLE"}})
+
+
+class FakeOCRSpaceHandler(_FakeHandler):
+    def do_POST(self):
+        body = self._read_body()
+        if not self._simulate():
+            return
+
+        language = "eng"
+        match = re.search(rb'name="language"\r\n\r\n(\w+)', body)
+        if match:
+            language = match.group(1).decode()
+
+        self._send_json(200, {
+            "ParsedResults": [{"ParsedText": f"[{language}] {SAMPLE_TEXT}", "FileParseExitCode": 1}],
+            "OCRExitCode": 1,
+            "IsErroredOnProcessing": False,
+        })
+
+
+class FakeGeminiHandler(_FakeHandler):
+    def do_POST(self):
+        parsed = urlparse(self.path)
+        try:
+            request = json.loads(self._read_body() or b"{}")
+        except ValueError:
+            request = {}
+        if not self._simulate():
+            return
+
+        prompt = " ".join(
+            part.get("text", "")
+            for content in request.get("contents", [])
+            for part in content.get("parts", [])
+        )
+        text = self._completion_text(request)
+        usage = {
+            "promptTokenCount": max(1, len(prompt) // 4),
+            "candidatesTokenCount": max(1, len(text) // 4),
+            "totalTokenCount": max(1, len(prompt) // 4) + max(1, len(text) // 4),
+        }
+
+        if parsed.path.endswith(":streamGenerateContent"):
+            self._stream(text, usage, "sse" in parse_qs(parsed.query).get("alt", []))
+        else:
+            self._send_json(200, self._candidate(text, usage))
+
+    def _completion_text(self, request):
+        config = request.get("generationConfig") or {}
+        schema = config.get("responseSchema") or config.get("response_schema")
+        if schema and schema.get("properties"):
+            return json.dumps({name: SAMPLE_TEXT for name in schema["properties"]})
+        return SAMPLE_TEXT
+
+    @staticmethod
+    def _candidate(text, usage):
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": usage,
+        }
+
+    def _stream(self, text, usage, sse):
+        words = text.split(" ")
+        pieces = [" ".join(words[i:i + 8]) + " " for i in range(0, len(words), 8)]
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream" if sse else "application/json")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def write_chunk(data):
+            self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        for index, piece in enumerate(pieces):
+            payload = self._candidate(piece, usage if index == len(pieces) - 1 else None)
+            if payload["usageMetadata"] is None:
+                del payload["usageMetadata"]
+            write_chunk(f"data: {json.dumps(payload)}\r\n\r\n".encode())
+            time.sleep(self.config.token_delay)
+        write_chunk(b"")
+
+
+class FakeServer:
+    """Runs one fake API server on a background thread."""
+
+    def __init__(self, handler_cls, config=None, host="127.0.0.1", port=0):
+        self.config = config or FakeServerConfig()
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0, "lock": threading.Lock()}
+        handler = type(handler_cls.__name__, (handler_cls,), {
+            "config": self.config,
+            "limiter": _RateLimiter(self.config.rate_limit),
+            "stats": self.stats,
+        })
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def snapshot(self):
+        with self.stats["lock"]:
+            return {key: value for key, value in self.stats.items() if key != "lock"}
+
+
+def start_fake_ocr_space(config=None):
+    return FakeServer(FakeOCRSpaceHandler, config).start()
+
+
+def start_fake_gemini(config=None):
+    return FakeServer(FakeGeminiHandler, config).start()
@@ -0,0 +1,249 @@
+"""
+Benchmark and load-test harness.
+
+Starts fake OCR.space and Gemini servers, generates a sample corpus, points the
+backend at them through environment variables and drives each scenario at every
+requested concurrency level, reporting p50/p95/p99 latency, throughput, errors and
+peak RSS.
+
+    python -m bench.run --concurrency 1,4,16 --requests 40
+    python -m bench.run --scenarios process_scanned_pdf,tools_summarize --gemini-latency 1.5
+    python -m bench.run --error-rate 0.1 --gemini-rate-limit 5 --json results.json
+"""
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench.corpus import build_corpus, serve_corpus
+from bench.fake_servers import FakeServerConfig, start_fake_ocr_space, start_fake_gemini
+
+TOOL_TEXT = (
+    "Their going to the market tomorow to by vegetables. The shop open at nine and "
+    "close at five, so they has to hurry if they wants the freshest produce."
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SimplifAI backend benchmark")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=40, help="requests per scenario and level")
+    parser.add_argument("--scenarios", default="all", help="comma separated scenario names, or 'all'")
+    parser.add_argument("--ocr-latency", type=float, default=0.3)
+    parser.add_argument("--gemini-latency", type=float, default=0.5)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake API calls that fail with 503")
+    parser.add_argument("--ocr-rate-limit", type=float, default=0.0, help="fake OCR.space requests/second (0 = unlimited)")
+    parser.add_argument("--gemini-rate-limit", type=float, default=0.0, help="fake Gemini requests/second (0 = unlimited)")
+    parser.add_argument("--cache", default="none", help="RESULT_CACHE_BACKEND to benchmark with")
+    parser.add_argument("--json", dest="json_path", help="also write results to this JSON file")
+    parser.add_argument("--list", action="store_true", help="list scenarios and exit")
+    return parser.parse_args(argv)
+
+
+def current_rss_mb():
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and bytes on macOS.
+    return maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+
+
+class RSSSampler:
+    """Samples resident memory on a background thread and keeps the peak."""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_mb())
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def configure_environment(args, ocr_server, gemini_server, work_dir):
+    os.environ.update({
+        "OCR_SPACE_URL": f"{ocr_server.url}/parse/image",
+        "OCR_SPACE_API_KEY": "bench",
+        "GEMINI_BASE_URL": gemini_server.url,
+        "GEMINI_API_KEY": "bench",
+        "RESULT_CACHE_BACKEND": args.cache,
+        "RESULT_CACHE_PATH": os.path.join(work_dir, "cache.sqlite3"),
+        "JOB_STORE_PATH": os.path.join(work_dir, "jobs.sqlite3"),
+        "SINGLEFLIGHT_PATH": os.path.join(work_dir, "flights.sqlite3"),
+        "ADMISSION_PATH": os.path.join(work_dir, "admission.sqlite3"),
+        "WORD_CACHE_PATH": os.path.join(work_dir, "words.sqlite3"),
+        # The client-side limiter would otherwise cap what the benchmark can measure.
+        "LLM_RATE_LIMIT": os.environ.get("LLM_RATE_LIMIT", "0"),
+        "ADMISSION_ENABLED": os.environ.get("ADMISSION_ENABLED", "false"),
+        # Scenarios repeat the same payload; coalescing would turn most requests into
+        # waits on one run instead of measuring the pipeline.
+        "SINGLEFLIGHT_ENABLED": os.environ.get("SINGLEFLIGHT_ENABLED", "false"),
+    })
+
+
+def build_scenarios(app, corpus_paths, corpus_url):
+    from app.services.ocr import extract_text_from_file
+
+    def post(path, payload):
+        def run():
+            with app.test_client() as client:
+                response = client.post(path, json=payload)
+                return response.status_code < 400
+        return run
+
+    def extract(name):
+        def run():
+            return not extract_text_from_file(corpus_paths[name]).startswith("ERROR:")
+        return run
+
+    return {
+        "process_png": post("/process-and-simplify", {"file_url": f"{corpus_url}/sample.png", "language": "Hindi"}),
+        "process_scanned_pdf": post("/process-and-simplify", {"file_url": f"{corpus_url}/scanned.pdf", "language": "Hindi"}),
+        "process_text_pdf": post("/process-and-simplify", {"file_url": f"{corpus_url}/text.pdf", "language": "English"}),
+        "process_docx": post("/process-and-simplify", {"file_url": f"{corpus_url}/sample.docx", "language": "Marathi"}),
+        "tools_translate": post("/tools/translate", {"text": TOOL_TEXT, "language": "Hindi"}),
+        "tools_summarize": post("/tools/summarize", {"text": TOOL_TEXT}),
+        "tools_grammar": post("/tools/grammar-corrector", {"text": TOOL_TEXT}),
+        "tools_word_meaning": post("/tools/word-meaning", {"word": "penalty"}),
+        "extract_png": extract("sample.png"),
+        "extract_scanned_pdf": extract("scanned.pdf"),
+        "extract_text_pdf": extract("text.pdf"),
+        "extract_docx": extract("sample.docx"),
+    }
+
+
+def run_level(func, concurrency, total):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def one():
+        start = time.perf_counter()
+        try:
+            ok = func()
+        except Exception as e:
+            print(f"  request failed: {e}", file=sys.stderr)
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            if not ok:
+                errors[0] += 1
+
+    with RSSSampler() as sampler:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for _ in range(total):
+                executor.submit(one)
+        wall = time.perf_counter() - start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors[0],
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "throughput_rps": total / wall if wall else 0.0,
+        "peak_rss_mb": sampler.peak,
+    }
+
+
+def print_table(results):
+    header = f"{'scenario':<22}{'conc':>6}{'reqs':>6}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>9}{'RSS MB':>9}"
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(
+            f"{row['scenario']:<22}{row['concurrency']:>6}{row['requests']:>6}{row['errors']:>6}"
+            f"{row['p50_ms']:>10.0f}{row['p95_ms']:>10.0f}{row['p99_ms']:>10.0f}"
+            f"{row['throughput_rps']:>9.2f}{row['peak_rss_mb']:>9.0f}"
+        )
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    levels = [int(level) for level in args.concurrency.split(",") if level.strip()]
+
+    ocr_server = start_fake_ocr_space(FakeServerConfig(
+        latency=args.ocr_latency, error_rate=args.error_rate, rate_limit=args.ocr_rate_limit
+    ))
+    gemini_server = start_fake_gemini(FakeServerConfig(
+        latency=args.gemini_latency, error_rate=args.error_rate, rate_limit=args.gemini_rate_limit
+    ))
+
+    with tempfile.TemporaryDirectory(prefix="simplifai_bench_") as work_dir:
+        corpus_dir = os.path.join(work_dir, "corpus")
+        corpus_paths = build_corpus(corpus_dir)
+        corpus_server, corpus_url = serve_corpus(corpus_dir)
+        configure_environment(args, ocr_server, gemini_server, work_dir)
+
+        # Imported only after the environment points at the fake servers.
+        from app import create_app
+        app = create_app()
+
+        scenarios = build_scenarios(app, corpus_paths, corpus_url)
+        if args.list:
+            print("\n".join(scenarios))
+            return 0
+
+        selected = list(scenarios) if args.scenarios == "all" else [name.strip() for name in args.scenarios.split(",")]
+        unknown = [name for name in selected if name not in scenarios]
+        if unknown:
+            print(f"Unknown scenarios: {', '.join(unknown)}", file=sys.stderr)
+            return 2
+
+        results = []
+        for name in selected:
+            for level in levels:
+                print(f"Running {name} at concurrency {level}...", file=sys.stderr)
+                row = run_level(scenarios[name], level, args.requests)
+                row["scenario"] = name
+                results.append(row)
+
+        corpus_server.shutdown()
+
+    print_table(results)
+    print(f"\nFake OCR.space: {ocr_server.snapshot()}")
+    print(f"Fake Gemini:    {gemini_server.snapshot()}")
+    ocr_server.stop()
+    gemini_server.stop()
+
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,15 @@
+# Loaded automatically by gunicorn from the working directory.
+import os
+
+# sync: gunicorn's default, one request at a time per worker.
+# async: gevent workers. Downloads, OCR.space and Gemini calls become cooperative, so one
+# worker keeps up to GUNICORN_WORKER_CONNECTIONS requests in flight while they wait on the
+# network; CPU-bound work runs on CPU_THREADPOOL_SIZE real threads.
+SERVER_MODE = os.getenv("SERVER_MODE", "sync").lower()
+
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "30"))
+
+if SERVER_MODE == "async":
+    worker_class = "gevent"
+    worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
@@ -1,6 +1,4 @@
 
-from dotenv import load_dotenv
 from app import create_app
 
-load_dotenv()
 app = create_app()
@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# Services read their settings when they are imported: point the stores shared between
+# workers at a scratch directory so tests never touch the real ones.
+_scratch = tempfile.mkdtemp(prefix="simplifai-tests-")
+os.environ.setdefault("RESULT_CACHE_BACKEND", "none")
+os.environ.setdefault("SINGLEFLIGHT_PATH", os.path.join(_scratch, "flights.sqlite3"))
+os.environ.setdefault("ADMISSION_PATH", os.path.join(_scratch, "admission.sqlite3"))
+os.environ.setdefault("WORD_CACHE_PATH", os.path.join(_scratch, "words.sqlite3"))
+os.environ.setdefault("JOB_STORE_PATH", os.path.join(_scratch, "jobs.sqlite3"))
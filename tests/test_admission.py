@@ -0,0 +1,202 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, jsonify
+
+from app.routes.admission import register_admission
+from app.services import admission
+from app.services.admission import (
+    LANE_PRIORITY, Lane, Overloaded, StageBudgets, admit, lane_for_path, lane_var, max_wait_var
+)
+
+ONE_SLOT = {"concurrency": 1, "rate": 0.0, "burst": 1}
+
+
+def test_lane_for_path():
+    assert lane_for_path("/tools/translate") == "interactive"
+    assert lane_for_path("/process-and-simplify") == "documents"
+    assert lane_for_path("/process-and-simplify/batch") == "documents"
+    assert lane_for_path("/health") is None
+
+
+def test_lane_admits_up_to_max_active():
+    lane = Lane("documents", 2, 0)
+    lane.enter(1)
+    lane.enter(1)
+
+    with pytest.raises(Overloaded) as error:
+        lane.enter(1)
+    assert error.value.reason == "queue_full"
+
+    lane.leave(0.5)
+    lane.enter(1)
+    assert lane.status()["active"] == 2
+
+
+def test_lane_rejects_when_the_expected_wait_is_too_long():
+    lane = Lane("documents", 1, 10)
+    lane.enter(1)
+    lane.leave(20)
+    lane.enter(1)
+
+    with pytest.raises(Overloaded) as error:
+        lane.enter(5)
+    assert error.value.reason == "deadline"
+    assert error.value.retry_after == pytest.approx(20)
+
+
+def test_lane_queue_times_out():
+    lane = Lane("documents", 1, 10)
+    lane.enter(1)
+    lane.leave(0.01)
+    lane.enter(1)
+
+    started = time.monotonic()
+    with pytest.raises(Overloaded) as error:
+        lane.enter(0.1)
+    assert error.value.reason == "timeout"
+    assert time.monotonic() - started < 1
+    assert lane.status()["queued"] == 0
+
+
+def test_queued_request_runs_when_a_slot_frees():
+    lane = Lane("documents", 1, 10)
+    lane.enter(1)
+    entered = threading.Event()
+    waiter = threading.Thread(target=lambda: (lane.enter(5), entered.set()))
+    waiter.start()
+    time.sleep(0.05)
+    assert not entered.is_set()
+
+    lane.leave(0.1)
+    waiter.join(5)
+    assert entered.is_set()
+
+
+@pytest.fixture
+def busy_app(monkeypatch):
+    monkeypatch.setitem(admission.LANES, "interactive", Lane("interactive", 1, 0))
+    admission.LANES["interactive"].enter(1)
+    app = Flask(__name__)
+    register_admission(app)
+    seen = {}
+
+    @app.route("/tools/echo", methods=["POST"])
+    def echo():
+        return jsonify({"lane": lane_var.get()})
+
+    @app.route("/process-and-simplify", methods=["POST"])
+    def process():
+        seen["lane"], seen["max_wait"] = lane_var.get(), max_wait_var.get()
+        return jsonify({})
+
+    return app, seen
+
+
+def test_overloaded_lane_answers_429_with_retry_after(busy_app):
+    app, _ = busy_app
+
+    response = app.test_client().post("/tools/echo", json={})
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert response.get_json()["retry_after"] == int(response.headers["Retry-After"])
+
+
+def test_lane_and_max_wait_are_reset_after_the_request(busy_app):
+    app, seen = busy_app
+
+    response = app.test_client().post("/process-and-simplify", json={}, headers={"X-Request-Timeout": "2"})
+
+    assert response.status_code == 200
+    assert seen == {"lane": "documents", "max_wait": 2.0}
+    assert lane_var.get() == "background"
+    assert max_wait_var.get() is None
+
+
+@pytest.fixture
+def store(tmp_path):
+    return StageBudgets(str(tmp_path / "admission.sqlite3"))
+
+
+def test_higher_priority_lane_goes_first(store):
+    store.enqueue("ocr", "running", LANE_PRIORITY["documents"], time.time())
+    assert store.try_acquire("ocr", "running", ONE_SLOT)[0]
+
+    store.enqueue("ocr", "background", LANE_PRIORITY["background"], time.time())
+    store.enqueue("ocr", "interactive", LANE_PRIORITY["interactive"], time.time())
+    assert store.check("ocr", "interactive", ONE_SLOT) == (False, 0.0, 2)
+
+    store.release("running")
+    assert not store.check("ocr", "background", ONE_SLOT)[0]
+    assert store.try_acquire("ocr", "interactive", ONE_SLOT)[0]
+
+    store.release("interactive")
+    assert store.try_acquire("ocr", "background", ONE_SLOT)[0]
+
+
+def test_waiting_only_reads_the_store(store):
+    store.enqueue("ocr", "running", 0, time.time())
+    store.try_acquire("ocr", "running", ONE_SLOT)
+    store.enqueue("ocr", "waiting", 1, time.time())
+
+    changes = store._conn.total_changes
+    for _ in range(5):
+        assert not store.check("ocr", "waiting", ONE_SLOT)[0]
+    assert store._conn.total_changes == changes
+
+
+def test_rate_limit_reports_the_delay_until_the_next_token(store):
+    budget = {"concurrency": 0, "rate": 2.0, "burst": 1}
+    store.enqueue("llm", "first", 0, time.time())
+    assert store.try_acquire("llm", "first", budget)[0]
+
+    store.enqueue("llm", "second", 0, time.time())
+    ready, delay, _ = store.check("llm", "second", budget)
+    assert not ready
+    assert 0 < delay <= 0.5
+
+
+def test_stage_wait_is_bounded_by_the_requests_max_wait(store, monkeypatch):
+    monkeypatch.setitem(admission.STAGE_BUDGETS, "ocr", ONE_SLOT)
+    monkeypatch.setattr(admission, "_budgets", store)
+    store.enqueue("ocr", "running", 0, time.time())
+    store.try_acquire("ocr", "running", ONE_SLOT)
+
+    token = max_wait_var.set(0.2)
+    try:
+        started = time.monotonic()
+        with pytest.raises(Overloaded) as error:
+            with admit("ocr"):
+                pass
+    finally:
+        max_wait_var.reset(token)
+
+    assert error.value.reason == "timeout"
+    assert time.monotonic() - started < 2
+    assert store.status()["ocr"] == {"active": 1, "waiting": 0}
+
+
+def test_released_slot_wakes_a_waiter(store, monkeypatch):
+    monkeypatch.setitem(admission.STAGE_BUDGETS, "ocr", ONE_SLOT)
+    monkeypatch.setattr(admission, "_budgets", store)
+    monkeypatch.setattr(admission, "ADMISSION_POLL_MAX_INTERVAL", 5.0)
+    store.enqueue("ocr", "running", 0, time.time())
+    store.try_acquire("ocr", "running", ONE_SLOT)
+    admitted = threading.Event()
+
+    def wait():
+        with admit("ocr"):
+            admitted.set()
+
+    waiter = threading.Thread(target=wait)
+    waiter.start()
+    time.sleep(0.5)
+    assert not admitted.is_set()
+
+    started = time.monotonic()
+    store.release("running")
+    waiter.join(5)
+    assert admitted.is_set()
+    assert time.monotonic() - started < 1
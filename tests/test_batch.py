@@ -0,0 +1,53 @@
+from app.services import batch
+
+
+def test_each_ocr_prior_gets_its_own_extraction(monkeypatch, tmp_path):
+    downloads, extractions, simplified = [], [], {}
+
+    def download(file_url):
+        downloads.append(file_url)
+        path = tmp_path / f"doc-{len(downloads)}.png"
+        path.write_bytes(b"image")
+        return str(path)
+
+    def extract_downloaded(file_path, key, language="English", **kwargs):
+        extractions.append(language)
+        return [{"page": 1, "text": f"Text read with the {language} prior. " * 3}]
+
+    def simplify_document(key, extracted_text, language, auto_detect=False, **kwargs):
+        simplified[language] = extracted_text
+        return f"Simple {language}"
+
+    monkeypatch.setattr(batch, "_download", download)
+    monkeypatch.setattr(batch, "extract_downloaded", extract_downloaded)
+    monkeypatch.setattr(batch, "simplify_document", simplify_document)
+
+    items = [
+        {"file_url": "https://example.com/a.png", "language": "Hindi"},
+        {"file_url": "https://example.com/a.png", "language": "Tamil"},
+        {"file_url": "https://example.com/a.png", "language": "English"},
+        {"file_url": "https://example.com/a.png", "language": "Hindi"},
+    ]
+    results = {index: (body, status) for index, body, status in batch.run_batch(items)}
+
+    assert downloads == ["https://example.com/a.png"]
+    assert sorted(extractions) == ["English", "Hindi", "Tamil"]
+    assert all(status == 200 for _, status in results.values())
+    for language in ("Hindi", "Tamil", "English"):
+        assert simplified[language].startswith(f"Text read with the {language} prior.")
+    assert results[0][0]["simplified_text"] == results[3][0]["simplified_text"] == "Simple Hindi"
+
+
+def test_download_failure_fails_every_language(monkeypatch):
+    def download(file_url):
+        raise batch.DownloadError("File not found")
+
+    monkeypatch.setattr(batch, "_download", download)
+
+    items = [
+        {"file_url": "https://example.com/missing.pdf", "language": "Hindi"},
+        {"file_url": "https://example.com/missing.pdf", "language": "English"},
+    ]
+    results = sorted(batch.run_batch(items), key=lambda result: result[0])
+
+    assert [(index, status) for index, _, status in results] == [(0, 400), (1, 400)]
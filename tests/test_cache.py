@@ -0,0 +1,130 @@
+import time
+
+import pytest
+
+from app.services import cache, pipeline
+from app.services.cache import MemoryCache, ResultCache, SQLiteCache
+
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=3, ttl=0)
+
+
+def _accessed_at(store, key):
+    return store._conn.execute("SELECT accessed_at FROM cache WHERE key = ?", (key,)).fetchone()[0]
+
+
+def test_hits_only_read_until_maintenance(store):
+    store.set("a", {"text": "value"})
+    changes = store._conn.total_changes
+
+    for _ in range(10):
+        assert store.get("a") == {"text": "value"}
+    assert store._conn.total_changes == changes
+
+    before = _accessed_at(store, "a")
+    store.maintain()
+    assert _accessed_at(store, "a") > before
+
+
+def test_pending_hits_trigger_maintenance(store, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_MAX_PENDING_HITS", 2)
+    store.set("a", 1)
+    store.set("b", 2)
+    before = _accessed_at(store, "a")
+
+    store.get("a")
+    store.get("b")
+
+    assert _accessed_at(store, "a") > before
+
+
+def test_eviction_keeps_recently_used_entries(store):
+    for key in "abcd":
+        store.set(key, key)
+        time.sleep(0.01)
+    store.get("a")
+    store.maintain()
+
+    assert len(store) == 3
+    assert store.get("a") == "a"
+    assert store.get("b") is None
+
+
+def test_expired_entries_are_not_returned(tmp_path):
+    store = SQLiteCache(str(tmp_path / "cache.sqlite3"), max_entries=10, ttl=0.05)
+    store.set("a", 1)
+    time.sleep(0.1)
+
+    assert store.get("a") is None
+    store.maintain()
+    assert len(store) == 0
+
+
+def test_add_only_stores_absent_keys(store):
+    assert store.add("a", 1)
+    assert not store.add("a", 2)
+    assert store.get("a") == 1
+
+    store.delete("a")
+    assert store.add("a", 3)
+
+
+def test_memory_cache_evicts_the_least_recently_used_entry():
+    store = MemoryCache(max_entries=2, ttl=0)
+    store.set("a", 1)
+    store.set("b", 2)
+    store.get("a")
+    store.set("c", 3)
+
+    assert len(store) == 2
+    assert store.get("a") == 1
+    assert store.get("b") is None
+
+
+def test_memory_cache_entries_expire():
+    store = MemoryCache(max_entries=10, ttl=0.05)
+    store.set("a", 1)
+    time.sleep(0.1)
+
+    assert store.get("a") is None
+    assert len(store) == 0
+
+
+def test_result_cache_keeps_extractions_and_results_apart():
+    results = ResultCache(MemoryCache())
+    results.set_extracted("hash", False, "extracted")
+    results.set_result("hash", "Hindi", False, "simplified")
+
+    assert results.get_extracted("hash", False) == "extracted"
+    assert results.get_extracted("hash", True) is None
+    assert results.get_extracted("hash", False, "hin") is None
+    assert results.get_result("hash", "Hindi", False) == "simplified"
+    assert results.get_result("hash", "Marathi", False) is None
+    assert results.get_result("hash", "Hindi", True) is None
+    assert results.stats()["extracted"] == {"hits": 1, "misses": 2}
+
+
+def test_result_cache_survives_a_failing_backend():
+    class Broken:
+        def get(self, key):
+            raise OSError("disk full")
+
+        def set(self, key, value):
+            raise OSError("disk full")
+
+    results = ResultCache(Broken())
+    results.set_result("hash", "Hindi", False, "simplified")
+    assert results.get_result("hash", "Hindi", False) is None
+
+
+def test_simplified_output_is_cached_but_apologies_are_not(monkeypatch):
+    results = ResultCache(MemoryCache())
+    replies = iter(["Sorry, the service is unavailable.", "Simple text", "not called"])
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: results)
+    monkeypatch.setattr(pipeline, "simplify_and_translate", lambda *args, **kwargs: next(replies))
+
+    assert pipeline.simplify_document("hash", "text", "Hindi").startswith("Sorry,")
+    assert pipeline.simplify_document("hash", "text", "Hindi") == "Simple text"
+    assert pipeline.simplify_document("hash", "text", "Hindi") == "Simple text"
@@ -0,0 +1,111 @@
+import time
+
+from app.services import gemini
+from app.utils.chunking import CHARS_PER_TOKEN, split_text_into_chunks
+
+PARAGRAPH = "This sentence is about the new water tax. " * 5
+
+
+def test_short_text_is_one_chunk():
+    assert split_text_into_chunks("A short notice.", 100) == ["A short notice."]
+    assert split_text_into_chunks("  \n\n ", 100) == []
+
+
+def test_chunks_break_at_paragraphs_and_stay_in_order():
+    paragraphs = [f"{index}: {PARAGRAPH}".strip() for index in range(6)]
+    max_tokens = (len(paragraphs[0]) * 2 + 2) // CHARS_PER_TOKEN + 1
+
+    chunks = split_text_into_chunks("\n\n".join(paragraphs), max_tokens)
+
+    assert chunks == ["\n\n".join(paragraphs[i:i + 2]) for i in range(0, 6, 2)]
+
+
+def test_page_breaks_are_preferred_over_paragraphs():
+    text = f"{PARAGRAPH}\n\n{PARAGRAPH}\f{PARAGRAPH}"
+
+    chunks = split_text_into_chunks(text, (len(PARAGRAPH) * 2 + 2) // CHARS_PER_TOKEN + 1)
+
+    assert chunks == [f"{PARAGRAPH}\n\n{PARAGRAPH}", PARAGRAPH]
+
+
+def test_oversized_pieces_fall_back_to_smaller_boundaries():
+    text = PARAGRAPH + "x" * 100
+    max_chars = 10 * CHARS_PER_TOKEN
+
+    chunks = split_text_into_chunks(text, 10)
+
+    assert all(len(chunk) <= max_chars for chunk in chunks)
+    # Only the spaces chunks were split at are dropped.
+    assert "".join(chunk.replace(" ", "") for chunk in chunks) == text.replace(" ", "")
+    assert chunks[-1] == "x" * (100 % max_chars or max_chars)
+
+
+def _fake_chunk_calls(monkeypatch, replies=None):
+    calls = []
+
+    def process(chunk, target_language, progress, usage):
+        calls.append(chunk)
+        usage["calls"] += 1
+        # Earlier chunks finish last.
+        time.sleep(0.02 * (3 - int(chunk[0])))
+        return (replies or {}).get(chunk, f"simple {chunk[:2]}")
+
+    monkeypatch.setattr(gemini, "_simplify_then_translate", process)
+    monkeypatch.setattr(gemini, "SIMPLIFY_CHUNK_TOKENS", (len(PARAGRAPH) + 4) // CHARS_PER_TOKEN + 1)
+    return calls
+
+
+def _document():
+    return "\n\n".join(f"{index}: {PARAGRAPH}" for index in range(3))
+
+
+def test_chunk_results_are_joined_in_order(monkeypatch):
+    calls = _fake_chunk_calls(monkeypatch)
+    monkeypatch.setattr(gemini, "SIMPLIFY_REDUCE", False)
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+    progress = []
+
+    result = gemini._simplify_and_translate_chunked(
+        _document(), "Hindi", "two_step", lambda *args: progress.append(args), usage
+    )
+
+    assert len(calls) == 3
+    assert result == "simple 0:\n\nsimple 1:\n\nsimple 2:"
+    assert usage["calls"] == 3
+    assert progress[0] == ("simplify", 0, 3) and sorted(progress[1:]) == [("simplify", n, 3) for n in (1, 2, 3)]
+
+
+def test_a_failed_chunk_fails_the_document(monkeypatch):
+    _fake_chunk_calls(monkeypatch, {f"1: {PARAGRAPH}": "Sorry, the service is unavailable."})
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    result = gemini._simplify_and_translate_chunked(_document(), "Hindi", "two_step", None, usage)
+
+    assert result == "Sorry, the service is unavailable."
+
+
+def test_reduce_pass_smooths_the_joined_chunks(monkeypatch):
+    _fake_chunk_calls(monkeypatch)
+    monkeypatch.setattr(gemini, "SIMPLIFY_REDUCE", True)
+    prompts = []
+
+    class Response:
+        text = " One smooth text. "
+        usage_metadata = None
+
+    class Gateway:
+        def generate(self, prompt, endpoint=None):
+            prompts.append(prompt)
+            if len(prompts) > 1:
+                raise RuntimeError("quota exceeded")
+            return Response()
+
+    monkeypatch.setattr(gemini, "llm", Gateway())
+    usage = {"calls": 0, "input_tokens": 0, "output_tokens": 0}
+
+    assert gemini._simplify_and_translate_chunked(_document(), "Hindi", "two_step", None, usage) == "One smooth text."
+    assert "simple 0:\n\nsimple 1:\n\nsimple 2:" in prompts[0]
+    # A failed reduce call falls back to the joined chunks.
+    assert gemini._simplify_and_translate_chunked(_document(), "Hindi", "two_step", None, usage) == (
+        "simple 0:\n\nsimple 1:\n\nsimple 2:"
+    )
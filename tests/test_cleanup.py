@@ -0,0 +1,111 @@
+from app.services import cleanup
+from app.services.cleanup import PAGE_BREAK, clean_pages, clean_text
+
+
+def _page(number, body):
+    return f"MUNICIPAL CORPORATION OF PUNE\nWard Office Notice\n{body}\nPublished 12 March 2024\nPage {number} of 5"
+
+
+BODIES = [
+    "Property tax for the year must be paid by the end of the month.",
+    "Late payments carry a penalty of two percent for every month.",
+    "Payments can be made online or at any ward office counter.",
+    "Receipts are sent by post within ten working days.",
+    "Questions can be raised at the ward office on weekdays.",
+]
+
+
+def test_repeated_headers_and_footers_are_removed():
+    cleaned, stats = clean_pages([_page(number, body) for number, body in enumerate(BODIES, 1)])
+
+    assert cleaned == BODIES
+    assert stats["page_numbers"] == 5
+    assert stats["boilerplate_lines"] == 15
+    assert stats["chars_saved"] > 0
+
+
+def test_short_pages_keep_their_body():
+    cleaned, _ = clean_pages([
+        "MUNICIPAL CORPORATION\nNotice 1\nThe tax is due.\nPage 1",
+        "MUNICIPAL CORPORATION\nNotice 2\nThe tax is due.\nPage 2",
+    ])
+
+    assert cleaned == ["Notice 1\nThe tax is due.", "Notice 2\nThe tax is due."]
+
+
+def test_identical_pages_are_never_emptied():
+    cleaned, _ = clean_pages(["APPLICATION FORM\nName of applicant: Ravi\nSignature"] * 3)
+
+    assert cleaned == ["Name of applicant: Ravi"] * 3
+
+
+def test_page_that_is_entirely_boilerplate_is_kept():
+    pages = [_page(number, body) for number, body in enumerate(BODIES[:3], 1)]
+    pages.append("MUNICIPAL CORPORATION OF PUNE\nPage 4 of 5")
+
+    cleaned, _ = clean_pages(pages)
+
+    assert cleaned[:3] == BODIES[:3]
+    assert cleaned[3] == "MUNICIPAL CORPORATION OF PUNE\nPage 4 of 5"
+
+
+def test_repeated_body_lines_outside_the_edges_are_kept():
+    body = "Line one of the notice.\nThe tax is due.\nLine three of the notice.\nLine four of the notice."
+    pages = [f"HEADER\nIntro {number}.\n{body}\nFooter text\nPage {number}" for number in range(1, 4)]
+
+    cleaned, _ = clean_pages(pages)
+
+    for page in cleaned:
+        assert "The tax is due." in page
+        assert "HEADER" not in page and "Footer text" not in page
+
+
+def test_single_page_is_not_stripped():
+    text = "Annual report\nThe budget grew this year.\n2024"
+
+    cleaned, stats = clean_pages([text])
+
+    assert cleaned == [text]
+    assert stats["page_numbers"] == 0
+
+
+def test_character_normalization():
+    cleaned, _ = clean_pages(["Zero\u200bwidth\u00ad and BOM\ufeff\x07 text, with \u0915\u094d\u200d\u0937 kept"])
+
+    assert cleaned == ["Zerowidth and BOM text, with \u0915\u094d\u200d\u0937 kept"]
+
+
+def test_whitespace_is_collapsed():
+    cleaned, _ = clean_pages(["Too   many  spaces\t here\n\n\n\n\nNext paragraph.  "])
+
+    assert cleaned == ["Too many spaces here\n\nNext paragraph."]
+
+
+def test_broken_lines_are_joined():
+    cleaned, stats = clean_pages(["The property tax must be paid\nbefore the end of the month. Late pay-\nments are fined.\nNew sentence."])
+
+    assert cleaned == ["The property tax must be paid before the end of the month. Late payments are fined.\nNew sentence."]
+    assert stats["joined_lines"] == 2
+
+
+def test_devanagari_lines_are_joined():
+    cleaned, _ = clean_pages(["संपत्ति कर महीने के अंत\nतक जमा करना होगा।\nनया वाक्य।"])
+
+    assert cleaned == ["संपत्ति कर महीने के अंत तक जमा करना होगा।\nनया वाक्य।"]
+
+
+def test_clean_text_splits_on_page_breaks():
+    text = PAGE_BREAK.join(_page(number, body) for number, body in enumerate(BODIES, 1))
+
+    cleaned, stats = clean_text(text)
+
+    assert cleaned == "\n\n".join(BODIES)
+    assert stats["pages"] == 5
+
+
+def test_cleanup_can_be_disabled(monkeypatch):
+    monkeypatch.setattr(cleanup, "CLEANUP_ENABLED", False)
+
+    cleaned, _ = clean_pages(["  MUNICIPAL CORPORATION\nNotice 1\nPage 1 ", "MUNICIPAL CORPORATION\nNotice 2\nPage 2"])
+
+    assert cleaned == ["MUNICIPAL CORPORATION\nNotice 1\nPage 1", "MUNICIPAL CORPORATION\nNotice 2\nPage 2"]
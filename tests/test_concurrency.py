@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("gevent")
+
+# Runs in its own interpreter: monkey-patching has to happen before anything else is imported.
+SCRIPT = """
+from gevent import monkey
+monkey.patch_all()
+import subprocess, sys, time
+import gevent
+from app.services.cache import SQLiteCache
+
+path = sys.argv[1]
+store = SQLiteCache(path)
+holder = subprocess.Popen([sys.executable, "-c", '''
+import sqlite3, sys, time
+conn = sqlite3.connect(sys.argv[1], isolation_level=None)
+conn.execute("BEGIN IMMEDIATE")
+print("locked", flush=True)
+time.sleep(1)
+conn.execute("COMMIT")
+''', path], stdout=subprocess.PIPE, text=True)
+holder.stdout.readline()
+
+ticks = []
+
+def tick():
+    started = time.monotonic()
+    while time.monotonic() - started < 0.8:
+        ticks.append(time.monotonic())
+        gevent.sleep(0.05)
+
+gevent.joinall([gevent.spawn(tick), gevent.spawn(store.set, "key", "value")])
+holder.wait()
+print(max(b - a for a, b in zip(ticks, ticks[1:])), store.get("key"))
+"""
+
+
+def test_a_locked_database_does_not_stall_other_greenlets(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT, str(tmp_path / "cache.sqlite3")],
+        capture_output=True, text=True, check=True, timeout=30,
+        env={**os.environ, "PYTHONPATH": root},
+    ).stdout.split()
+
+    assert float(output[0]) < 0.5
+    assert output[1] == "value"
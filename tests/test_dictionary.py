@@ -0,0 +1,83 @@
+import json
+
+import pytest
+from flask import Flask
+
+from app.routes.tools import tools
+from app.services import dictionary
+from app.services.admission import Overloaded
+from app.services.cache import SQLiteCache
+
+
+@pytest.fixture
+def word_list(tmp_path, monkeypatch):
+    monkeypatch.setattr(dictionary, "_store", SQLiteCache(str(tmp_path / "words.sqlite3")))
+    path = tmp_path / "words.txt"
+    path.write_text("penalty\nlevy\n", encoding="utf-8")
+    return path
+
+
+def test_prewarm_runs_once_per_word_list(word_list, monkeypatch):
+    runs = []
+    monkeypatch.setattr(dictionary, "prewarm_word_cache", lambda path, language: runs.append((path, language)))
+
+    assert dictionary.prewarm_once(str(word_list))
+    assert not dictionary.prewarm_once(str(word_list))
+    assert runs == [(str(word_list), "English")]
+
+    word_list.write_text("penalty\nlevy\ntariff\n", encoding="utf-8")
+    assert dictionary.prewarm_once(str(word_list))
+
+
+def test_failed_prewarm_can_run_again(word_list, monkeypatch):
+    def fail(path, language):
+        raise RuntimeError("Gemini unavailable")
+
+    monkeypatch.setattr(dictionary, "prewarm_word_cache", fail)
+    with pytest.raises(RuntimeError):
+        dictionary.prewarm_once(str(word_list))
+
+    monkeypatch.setattr(dictionary, "prewarm_word_cache", lambda path, language: None)
+    assert dictionary.prewarm_once(str(word_list))
+
+
+def test_bulk_lookup_passes_overload_on(word_list, monkeypatch):
+    def overloaded(batch, language):
+        raise Overloaded("llm", "timeout", 3)
+
+    monkeypatch.setattr(dictionary, "_fetch_meanings", overloaded)
+
+    with pytest.raises(Overloaded):
+        dictionary.lookup_words(["penalty"])
+
+
+def _events(response):
+    events = []
+    for block in response.get_data(as_text=True).strip().split("\n\n"):
+        name, data = block.split("\n", 1)
+        events.append((name[len("event: "):], json.loads(data[len("data: "):])))
+    return events
+
+
+def test_streamed_word_meaning_is_parsed_and_stored(word_list, monkeypatch):
+    prompts = []
+
+    def fake_stream(prompt, endpoint):
+        prompts.append(prompt)
+        yield '{"definition": "Un castigo", '
+        yield '"part_of_speech": "sustantivo", "example": "Pagó una multa."}'
+
+    monkeypatch.setattr(dictionary.llm, "stream", fake_stream)
+    app = Flask(__name__)
+    app.register_blueprint(tools)
+    client = app.test_client()
+
+    first = _events(client.post("/tools/word-meaning", json={"word": "Penalty", "language": "Spanish", "stream": True}))
+    second = _events(client.post("/tools/word-meaning", json={"word": "penalty", "language": "Spanish", "stream": True}))
+
+    meaning = {"definition": "Un castigo", "part_of_speech": "sustantivo", "example": "Pagó una multa."}
+    assert "Write the definition and example in Spanish." in prompts[0]
+    assert [name for name, _ in first] == ["token", "token", "done"]
+    assert first[-1][1] == {"result": json.dumps(meaning, ensure_ascii=False), "meaning": meaning, "cached": False}
+    assert second == [("done", {"result": json.dumps(meaning, ensure_ascii=False), "meaning": meaning, "cached": True})]
+    assert len(prompts) == 1
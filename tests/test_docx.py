@@ -0,0 +1,61 @@
+import docx
+import pytest
+from PIL import Image
+
+from app.services import ocr
+
+
+def _picture(tmp_path, name, size):
+    path = tmp_path / name
+    Image.new("RGB", size, "white").save(path)
+    return str(path)
+
+
+@pytest.fixture
+def notice(tmp_path):
+    document = docx.Document()
+    section = document.sections[0]
+    section.header.paragraphs[0].text = "Municipal Corporation"
+    section.footer.paragraphs[0].text = "Office copy"
+    document.add_paragraph("Property tax notice")
+    table = document.add_table(rows=2, cols=2)
+    for row, values in zip(table.rows, (("Ward", "Amount"), ("12", "4,500"))):
+        for cell, value in zip(row.cells, values):
+            cell.text = value
+    document.add_picture(_picture(tmp_path, "scan.png", (400, 300)))
+    document.add_picture(_picture(tmp_path, "logo.png", (40, 40)))
+    document.add_paragraph("Pay before the due date.")
+    path = tmp_path / "notice.docx"
+    document.save(path)
+    return str(path)
+
+
+def test_docx_text_keeps_document_order(notice, monkeypatch):
+    ocrd = []
+
+    def ocr_page(image_bytes, filename=None, **kwargs):
+        ocrd.append(filename)
+        return "Text of the scanned receipt"
+
+    monkeypatch.setattr(ocr, "ocr_image_page", ocr_page)
+
+    text = ocr.extract_from_word(notice)
+
+    assert text.splitlines() == [
+        "Municipal Corporation",
+        "Property tax notice",
+        "Ward | Amount",
+        "12 | 4,500",
+        "Text of the scanned receipt",
+        "Pay before the due date.",
+        "Office copy",
+    ]
+    # The logo is too small to OCR.
+    assert len(ocrd) == 1
+
+
+def test_docx_without_text_is_an_error(tmp_path):
+    path = tmp_path / "empty.docx"
+    docx.Document().save(path)
+
+    assert ocr.extract_from_word(str(path)).startswith("ERROR:")
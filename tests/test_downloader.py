@@ -0,0 +1,76 @@
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.utils import downloader
+from app.utils.downloader import DownloadError, download_file_from_url
+
+PDF = b"%PDF-1.4\n" + b"x" * 200_000
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        self.send_response(200)
+        if self.path == "/chunked":
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for start in range(0, len(PDF), 50_000):
+                piece = PDF[start:start + 50_000]
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(piece), piece))
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        if self.path == "/slow":
+            self.send_header("Content-Length", "1000")
+            self.end_headers()
+            try:
+                for _ in range(1000):
+                    self.wfile.write(b"x")
+                    self.wfile.flush()
+                    time.sleep(0.2)
+            except OSError:
+                pass
+            return
+        self.send_header("Content-Length", str(len(PDF)))
+        self.end_headers()
+        self.wfile.write(PDF)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def origin():
+    Handler.protocol_version = "HTTP/1.1"
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.parametrize("path", ["/file", "/chunked"])
+def test_download(origin, path):
+    file_path = download_file_from_url(origin + path)
+    try:
+        assert file_path.endswith(".pdf")
+        with open(file_path, "rb") as f:
+            assert f.read() == PDF
+    finally:
+        os.remove(file_path)
+
+
+def test_trickling_origin_is_cut_off_at_the_deadline(origin, monkeypatch):
+    monkeypatch.setattr(downloader, "DOWNLOAD_TOTAL_TIMEOUT", 1.0)
+
+    started = time.monotonic()
+    with pytest.raises(DownloadError, match="longer than 1 seconds"):
+        download_file_from_url(origin + "/slow")
+    assert time.monotonic() - started < 2
+
+
+def test_too_large_download_is_aborted(origin):
+    with pytest.raises(DownloadError, match="too large"):
+        download_file_from_url(origin + "/chunked", max_bytes=100_000)
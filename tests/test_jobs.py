@@ -0,0 +1,151 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from app.services import jobs
+from app.services.admission import Overloaded
+from app.services.jobs import JobStore, owner_alive, process_owner
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(jobs, "_store", store)
+    return store
+
+
+def _dead_owner():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}:0123456789ab"
+
+
+def _set(store, job_id, **columns):
+    assignments = ", ".join(f"{column} = ?" for column in columns)
+    with store._conn:
+        store._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*columns.values(), job_id))
+
+
+def _row(store, job_id):
+    return store._conn.execute("SELECT status, owner FROM jobs WHERE id = ?", (job_id,)).fetchone()
+
+
+def test_owner_alive():
+    assert owner_alive(process_owner())
+    assert not owner_alive(_dead_owner())
+    assert owner_alive("another-host:1:0123456789ab")
+
+
+def test_claim_records_the_owner(store):
+    job_id = store.create({"file_url": "u"})
+
+    assert store.claim(job_id)
+    assert not store.claim(job_id)
+    assert tuple(_row(store, job_id)) == ("running", process_owner())
+
+
+def test_jobs_of_an_exited_worker_are_adopted(store):
+    running = store.create({"file_url": "a"})
+    queued = store.create({"file_url": "b"})
+    store.claim(running)
+    for job_id in (running, queued):
+        _set(store, job_id, owner=_dead_owner())
+
+    assert store.adopt_orphans() == [running, queued]
+    assert tuple(_row(store, running)) == ("queued", process_owner())
+
+
+def test_live_owners_keep_their_jobs_until_the_heartbeat_goes_stale(store, monkeypatch):
+    job_id = store.create({"file_url": "u"})
+    store.claim(job_id)
+    other = f"{socket.gethostname()}:{os.getpid()}:another-one"
+    _set(store, job_id, owner=other, heartbeat_at=time.time())
+
+    assert store.adopt_orphans() == []
+
+    _set(store, job_id, heartbeat_at=time.time() - jobs.JOB_STALE_SECONDS - 1)
+    assert store.adopt_orphans() == [job_id]
+
+
+def test_own_jobs_are_never_adopted_and_heartbeats_refresh(store):
+    job_id = store.create({"file_url": "u"})
+    store.claim(job_id)
+    _set(store, job_id, heartbeat_at=0)
+
+    assert store.adopt_orphans() == []
+    store.heartbeat()
+    heartbeat_at = store._conn.execute("SELECT heartbeat_at FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    assert heartbeat_at > time.time() - 5
+
+
+def test_jobs_from_before_owners_are_adopted(store):
+    job_id = store.create({"file_url": "u"})
+    _set(store, job_id, owner=None, heartbeat_at=None)
+
+    assert store.adopt_orphans() == [job_id]
+
+
+def test_finished_jobs_are_left_alone(store):
+    job_id = store.create({"file_url": "u"})
+    store.claim(job_id)
+    store.finish(job_id, {"simplified_text": "done"}, 200)
+    _set(store, job_id, owner=_dead_owner())
+
+    assert store.adopt_orphans() == []
+
+
+def test_sweep_resubmits_adopted_jobs(store, monkeypatch):
+    submitted = []
+
+    class Executor:
+        def submit(self, function, *args):
+            submitted.append(args)
+
+    monkeypatch.setattr(jobs, "_get_executor", lambda: Executor())
+    job_id = store.create({"file_url": "u"})
+    store.claim(job_id)
+    _set(store, job_id, owner=_dead_owner())
+
+    assert jobs.sweep_jobs() == [job_id]
+    assert submitted == [(job_id,)]
+
+
+def test_overloaded_job_is_requeued_not_failed(store, monkeypatch):
+    retries = []
+
+    def overloaded(*args, **kwargs):
+        raise Overloaded("documents", "timeout", 7)
+
+    monkeypatch.setattr(jobs, "process_file_url", overloaded)
+    monkeypatch.setattr(jobs, "_retry_later", lambda job_id, delay: retries.append((job_id, delay)))
+    job_id = store.create({"file_url": "u", "language": "English", "auto_detect": False})
+
+    jobs.run_job(job_id)
+
+    assert tuple(_row(store, job_id)) == ("queued", process_owner())
+    assert store.get(job_id)["status_code"] is None
+    assert retries == [(job_id, 7)]
+    assert store.claim(job_id)
+
+
+def test_sweep_deletes_jobs_past_retention(store, monkeypatch):
+    monkeypatch.setattr(jobs, "_get_executor", lambda: None)
+    old = store.create({"file_url": "old"})
+    recent = store.create({"file_url": "recent"})
+    unfinished = store.create({"file_url": "unfinished"})
+    for job_id in (old, recent):
+        store.claim(job_id)
+        store.finish(job_id, {"simplified_text": "done"}, 200)
+    expired = time.time() - jobs.JOB_RETENTION_SECONDS - 1
+    _set(store, old, updated_at=expired)
+    _set(store, unfinished, updated_at=expired)
+
+    assert jobs.sweep_jobs() == []
+    assert store.get(old) is None
+    assert store.get(recent)["status"] == "succeeded"
+    assert store.get(unfinished)["status"] == "queued"
+    assert store.purge_finished(max_age=0) == 0
@@ -0,0 +1,128 @@
+import time
+
+import pytest
+from google.genai import errors
+
+from app.services import llm
+from app.services.llm import TokenBucket
+
+
+class FakeModels:
+    """Fails with the queued errors first, then answers."""
+
+    def __init__(self, *failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    def generate_content(self, model, contents, config=None):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return type("Response", (), {"text": f"answer to {contents}", "usage_metadata": None})()
+
+    def generate_content_stream(self, model, contents, config=None):
+        self.calls += 1
+        if self.failures and self.failures[0] is None:
+            self.failures.pop(0)
+            yield type("Chunk", (), {"text": "partial ", "usage_metadata": None})()
+            raise ConnectionError("stream cut off")
+        if self.failures:
+            raise self.failures.pop(0)
+        for piece in ("all ", "of it"):
+            yield type("Chunk", (), {"text": piece, "usage_metadata": None})()
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    def use(*failures):
+        models = FakeModels(*failures)
+        monkeypatch.setattr(llm, "get_client", lambda: type("Client", (), {"models": models})())
+        monkeypatch.setattr(llm, "_backoff", lambda attempt: 0)
+        monkeypatch.setattr(llm, "_rate_limiter", TokenBucket(0, 1))
+        monkeypatch.setattr(llm, "metrics", llm.LLMMetrics())
+        return models
+    return use
+
+
+def _api_error(code):
+    return errors.APIError(code, {"error": {"message": "failed", "status": "FAILED"}})
+
+
+def test_retryable_errors():
+    assert llm.is_retryable(_api_error(503))
+    assert llm.is_retryable(_api_error(429))
+    assert llm.is_retryable(ConnectionError("reset"))
+    assert not llm.is_retryable(_api_error(400))
+    assert not llm.is_retryable(ValueError("bad prompt"))
+
+
+def test_transient_errors_are_retried(gateway):
+    models = gateway(_api_error(503), ConnectionError("reset"))
+
+    assert llm.generate("hello", endpoint="test").text == "answer to hello"
+    assert models.calls == 3
+    assert llm.metrics.snapshot()["test"]["retries"] == 2
+    assert llm.metrics.snapshot()["test"]["errors"] == 2
+
+
+def test_retries_stop_at_the_limit(gateway, monkeypatch):
+    monkeypatch.setattr(llm, "LLM_MAX_RETRIES", 2)
+    models = gateway(*[_api_error(429)] * 5)
+
+    with pytest.raises(errors.APIError):
+        llm.generate("hello", endpoint="test")
+    assert models.calls == 3
+
+
+def test_permanent_errors_are_not_retried(gateway):
+    models = gateway(_api_error(400))
+
+    with pytest.raises(errors.APIError):
+        llm.generate("hello", endpoint="test")
+    assert models.calls == 1
+
+
+def test_stream_retries_only_before_the_first_piece(gateway):
+    models = gateway(_api_error(503))
+    assert "".join(llm.stream("hello", endpoint="test")) == "all of it"
+    assert models.calls == 2
+
+    models = gateway(None)
+    pieces = []
+    with pytest.raises(ConnectionError):
+        for piece in llm.stream("hello", endpoint="test"):
+            pieces.append(piece)
+    assert pieces == ["partial "]
+    assert models.calls == 1
+
+
+def test_backoff_is_jittered_and_capped(monkeypatch):
+    monkeypatch.setattr(llm, "LLM_RETRY_BASE_DELAY", 0.5)
+    monkeypatch.setattr(llm, "LLM_RETRY_MAX_DELAY", 3)
+
+    for attempt in range(8):
+        delays = [llm._backoff(attempt) for _ in range(50)]
+        assert all(0 <= delay <= min(3, 0.5 * 2 ** attempt) for delay in delays)
+        assert len(set(delays)) > 1
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=20, capacity=3)
+
+    start = time.monotonic()
+    for _ in range(3):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.03
+
+    for _ in range(2):
+        bucket.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_token_bucket_without_a_rate_never_waits():
+    bucket = TokenBucket(rate=0, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(100):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
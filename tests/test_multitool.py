@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+from app.services import multitool
+from app.services.admission import Overloaded
+
+
+def test_overload_is_not_reported_per_text(monkeypatch):
+    def overloaded(operations, group):
+        raise Overloaded("llm", "timeout", 3)
+
+    monkeypatch.setattr(multitool, "_run_group", overloaded)
+
+    with pytest.raises(Overloaded):
+        multitool.run_tool_operations([{"op": "summarize", "language": None}], ["Some text."])
+
+
+def test_parse_operations():
+    operations, error = multitool.parse_operations(["correct", {"op": "translate", "language": "Hindi"}])
+    assert error is None
+    assert operations == [{"op": "correct", "language": None}, {"op": "translate", "language": "Hindi"}]
+
+    assert multitool.parse_operations([])[1]
+    assert multitool.parse_operations(["rewrite"])[1].startswith("Unsupported operation")
+    assert multitool.parse_operations(["translate"])[1] == "translate operations need a language"
+    assert multitool.parse_operations(["correct"] * (multitool.TOOLS_BATCH_MAX_OPERATIONS + 1))[1]
+
+
+def test_prompt_lists_the_steps_in_order_and_numbers_the_texts():
+    operations, _ = multitool.parse_operations(["simplify", {"op": "translate", "language": "Marathi"}])
+
+    prompt = multitool._build_prompt(operations, [(0, "First text."), (3, "Fourth text.")])
+
+    assert prompt.index("1. Simplify it") < prompt.index("2. Translate it into Marathi.")
+    assert '[0]\n    "First text."' in prompt
+    assert '[3]\n    "Fourth text."' in prompt
+    assert '"step_1", "step_2"' in prompt
+
+
+def test_texts_are_packed_by_count_and_tokens(monkeypatch):
+    monkeypatch.setattr(multitool, "TOOLS_BATCH_TEXTS_PER_CALL", 2)
+    monkeypatch.setattr(multitool, "TOOLS_BATCH_CALL_TOKENS", 10)
+
+    groups = multitool._pack_texts(["a", "b", "c", "x" * 40, "d"])
+
+    assert groups == [[(0, "a"), (1, "b")], [(2, "c")], [(3, "x" * 40)], [(4, "d")]]
+
+
+def test_structured_responses_are_mapped_back_to_texts(monkeypatch):
+    monkeypatch.setattr(multitool, "TOOLS_BATCH_TEXTS_PER_CALL", 2)
+    prompts = []
+
+    class Response:
+        def __init__(self, text):
+            self.text = text
+
+    def generate(prompt, endpoint, config=None):
+        prompts.append(prompt)
+        if "[0]" in prompt:
+            return Response(json.dumps({"results": [
+                {"index": 1, "step_1": " Fixed two. ", "step_2": "Short two."},
+                {"index": 0, "step_1": "Fixed one.", "step_2": "Short one."},
+            ]}))
+        # The model left out the second step for this text.
+        return Response(json.dumps({"results": [{"index": 2, "step_1": "Fixed three.", "step_2": ""}]}))
+
+    monkeypatch.setattr(multitool.llm, "generate", generate)
+    operations, _ = multitool.parse_operations(["correct", "summarize"])
+
+    results, calls = multitool.run_tool_operations(operations, ["one", "two", "three"])
+
+    assert calls == 2
+    assert results[0] == {"index": 0, "operations": [
+        {"operation": "correct", "corrected_text": "Fixed one."},
+        {"operation": "summarize", "summary": "Short one."},
+    ]}
+    assert results[1]["operations"][0]["corrected_text"] == "Fixed two."
+    assert results[2] == {"index": 2, "error": "Sorry, I couldn't process this text."}
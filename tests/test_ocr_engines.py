@@ -0,0 +1,65 @@
+import os
+
+from app.services import ocr_engines
+from app.services.ocr_engines import LocalFirstEngine, TesseractEngine
+
+
+class FakeTesseract:
+    def __init__(self, languages):
+        self.languages = languages
+
+    def get_languages(self, config=''):
+        return self.languages
+
+
+class RecordingRemote:
+    def __init__(self):
+        self.calls = []
+
+    def ocr_image(self, image_bytes, language_code="eng", filename="page.jpg"):
+        self.calls.append(language_code)
+        return "text read by the remote engine"
+
+
+def _engine(monkeypatch, languages):
+    monkeypatch.setattr(ocr_engines, "pytesseract", FakeTesseract(languages))
+    engine = TesseractEngine(max_workers=1)
+    calls = []
+
+    def run_inline(func, *args):
+        calls.append(args)
+        return "text read by Tesseract"
+
+    monkeypatch.setattr(ocr_engines, "green_mode", lambda: True)
+    monkeypatch.setattr(engine, "_run_green", run_inline)
+    return engine, calls
+
+
+def test_missing_secondary_language_is_dropped(monkeypatch):
+    engine, calls = _engine(monkeypatch, ["eng", "tam"])
+    assert engine.ocr_image(b"image", "tam+eng") == "text read by Tesseract"
+    assert calls == [(b"image", "tam+eng")]
+
+    engine, calls = _engine(monkeypatch, ["tam"])
+    engine.ocr_image(b"image", "tam+eng")
+    assert calls == [(b"image", "tam")]
+
+
+def test_missing_primary_language_falls_back_to_remote(monkeypatch):
+    engine, calls = _engine(monkeypatch, ["eng", "hin", "mar"])
+    assert engine.ocr_image(b"image", "tam+eng").startswith("ERROR:")
+    assert calls == []
+
+    remote = RecordingRemote()
+    text = LocalFirstEngine(engine, remote).ocr_image(b"image", "tam+eng")
+    assert text == "text read by the remote engine"
+    assert remote.calls == ["tam+eng"]
+
+
+def test_pool_does_not_fork_the_worker():
+    engine = TesseractEngine(max_workers=1)
+    try:
+        assert engine._get_pool().submit(os.getpid).result(timeout=30) != os.getpid()
+        assert ocr_engines._pool_context().get_start_method() in ("forkserver", "spawn")
+    finally:
+        engine._get_pool().shutdown()
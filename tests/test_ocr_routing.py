@@ -0,0 +1,141 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app.services import ocr
+from app.services.cache import MemoryCache
+
+DEVANAGARI = "यह एक सरकारी सूचना है और इसमें कर की जानकारी दी गई है। " * 4
+ENGLISH = "This is a public notice about the property tax that is due this month. " * 4
+
+
+def _png(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (40, 40), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def detections(monkeypatch):
+    """Makes detect_script_in_image return the given verdicts, one per sample image."""
+    def use(*verdicts):
+        answers = iter(verdicts)
+        monkeypatch.setattr(ocr, "detect_script_in_image", lambda image: next(answers))
+        return [b"image"] * len(verdicts)
+    return use
+
+
+def test_failed_detection_keeps_requested_language(detections):
+    images = detections(None, None)
+    assert ocr.route_ocr_language("Hindi", sample_images=images) == "hin+eng"
+
+
+def test_failed_detection_keeps_english_with_auto_detect(detections):
+    images = detections(None)
+    assert ocr.route_ocr_language("English", auto_detect=True, sample_images=images) == "eng"
+
+
+def test_inconclusive_samples_are_ignored(detections):
+    images = detections(None, "marathi")
+    assert ocr.route_ocr_language("English", auto_detect=True, sample_images=images) == "mar+eng"
+
+
+def test_confident_english_overrules_requested_hindi(detections):
+    images = detections("english", "english")
+    assert ocr.route_ocr_language("Hindi", sample_images=images) == "eng"
+
+
+def test_mixed_detections_keep_requested_hindi(detections):
+    images = detections("english", "marathi")
+    assert ocr.route_ocr_language("Hindi", sample_images=images) == "hin+eng"
+
+
+def test_requested_language_breaks_hindi_marathi_tie(detections):
+    images = detections("hindi")
+    assert ocr.route_ocr_language("Marathi", sample_images=images) == "mar+eng"
+
+
+def test_english_without_auto_detect_skips_detection(detections):
+    detections()
+    assert ocr.route_ocr_language("English", sample_images=[b"image"]) == "eng"
+
+
+def test_undetectable_language_uses_its_code(detections):
+    detections()
+    assert ocr.route_ocr_language("Tamil", auto_detect=True, sample_images=[b"image"]) == "tam+eng"
+
+
+def test_text_hint_decides_without_images(detections):
+    detections()
+    assert ocr.route_ocr_language("English", auto_detect=True, text_hint=DEVANAGARI) == "hin+eng"
+    assert ocr.route_ocr_language("Hindi", text_hint=ENGLISH) == "eng"
+
+
+def test_numeric_text_hint_keeps_requested_language(detections):
+    detections()
+    assert ocr.route_ocr_language("Hindi", text_hint="1234 5678 90.00 " * 20) == "hin+eng"
+
+
+def test_classify_script_needs_enough_letters():
+    assert ocr.classify_script("12 / 3") is None
+    assert ocr.classify_script(ENGLISH) == "english"
+    assert ocr.classify_script(DEVANAGARI) == "hindi"
+    assert ocr.classify_script("ही माहिती आहे आणि ती सर्वांसाठी आहे. " * 3) == "marathi"
+
+
+def test_detection_failure_returns_none(monkeypatch):
+    class BrokenTesseract:
+        def image_to_string(self, *args, **kwargs):
+            raise OSError("tesseract is not installed")
+
+    monkeypatch.setattr(ocr, "pytesseract", BrokenTesseract())
+    assert ocr.detect_script_in_image(_png("white")) is None
+
+
+def test_blank_image_detection_is_inconclusive(monkeypatch):
+    class BlankTesseract:
+        def image_to_string(self, *args, **kwargs):
+            return " \n"
+
+    monkeypatch.setattr(ocr, "pytesseract", BlankTesseract())
+    assert ocr.detect_script_in_image(_png("gray")) is None
+
+
+def test_sample_pages_spreads_over_document():
+    assert ocr.sample_pages(range(10), 2) == [0, 9]
+    assert ocr.sample_pages(range(10), 3) == [0, 4, 9]
+    assert ocr.sample_pages([4], 2) == [4]
+    assert ocr.sample_pages(range(5), 0) == []
+
+
+def test_single_pass_detection_runs_tesseract_once_and_caches_the_verdict(monkeypatch):
+    calls = []
+
+    class DevanagariTesseract:
+        def image_to_string(self, image, lang=None):
+            calls.append((image.size, lang))
+            return DEVANAGARI
+
+    monkeypatch.setattr(ocr, "pytesseract", DevanagariTesseract())
+    monkeypatch.setattr(ocr, "_script_cache", MemoryCache(max_entries=8, ttl=None))
+    buffer = io.BytesIO()
+    Image.new("RGB", (4000, 1000), "white").save(buffer, format="PNG")
+
+    assert ocr.detect_script_in_image(buffer.getvalue()) == "hindi"
+    assert ocr.detect_script_in_image(buffer.getvalue()) == "hindi"
+    assert calls == [((ocr.SCRIPT_DETECT_MAX_SIDE, ocr.SCRIPT_DETECT_MAX_SIDE // 4), "hin+mar+eng")]
+
+
+def test_inconclusive_verdicts_are_not_cached(monkeypatch):
+    answers = iter([" \n", ENGLISH])
+
+    class Tesseract:
+        def image_to_string(self, *args, **kwargs):
+            return next(answers)
+
+    monkeypatch.setattr(ocr, "pytesseract", Tesseract())
+    monkeypatch.setattr(ocr, "_script_cache", MemoryCache(max_entries=8, ttl=None))
+
+    assert ocr.detect_script_in_image(_png("white")) is None
+    assert ocr.detect_script_in_image(_png("white")) == "english"
@@ -0,0 +1,204 @@
+from contextlib import contextmanager
+
+import pytest
+
+from app.services import ocr, pipeline
+from app.services.admission import Overloaded
+from app.services.cache import MemoryCache, ResultCache
+from app.services.cleanup import iter_clean_pages
+from app.services.ocr import ExtractionError, parse_page_ranges, select_pages
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    ([], None),
+    ("3", "3"),
+    ("3-5,8", "3-5,8"),
+    (" 8 , 3 - 5 ", "3-5,8"),
+    ("10-", "10-"),
+    ([3, "5-7"], "3,5-7"),
+    ("4-4", "4"),
+])
+def test_parse_page_ranges(value, expected):
+    assert parse_page_ranges(value) == expected
+
+
+@pytest.mark.parametrize("value", ["0", "5-3", "a", "1-2-3", "-4", [True], [1.5], ",,"])
+def test_parse_page_ranges_rejects(value):
+    with pytest.raises(ValueError):
+        parse_page_ranges(value)
+
+
+def test_select_pages():
+    assert select_pages(None, 4) == [0, 1, 2, 3]
+    assert select_pages(parse_page_ranges("2-3,1"), 4) == [0, 1, 2]
+    assert select_pages(parse_page_ranges("3-,2"), 5) == [1, 2, 3, 4]
+    assert select_pages("2-9", 3) == [1, 2]
+    assert select_pages("1-3,2-4", 10) == [0, 1, 2, 3]
+    assert select_pages(None, 10, max_pages=2) == [0, 1]
+
+
+def test_cleanup_pulls_pages_lazily():
+    read = []
+
+    def pages():
+        for number in range(1, 21):
+            read.append(number)
+            yield f"Body of page {number} with enough words to keep."
+
+    cleaned = iter_clean_pages(pages())
+    first = next(cleaned)
+
+    assert first.startswith("Body of page 1")
+    assert len(read) < 20
+    assert len(list(cleaned)) == 19
+
+
+def _extracted(monkeypatch, pages):
+    def fake_iter_pages(file_path, **kwargs):
+        for page in pages:
+            if isinstance(page, Exception):
+                raise page
+            yield page
+
+    monkeypatch.setattr(pipeline, "iter_pages_from_file", fake_iter_pages)
+
+
+def test_failed_pages_keep_their_place(monkeypatch):
+    _extracted(monkeypatch, [
+        {"page": 1, "text": "First page text."},
+        {"page": 2, "text": "", "error": "OCR timed out"},
+        {"page": 3, "text": "Third page text."},
+        {"page": 4, "text": "", "error": "OCR timed out"},
+    ])
+
+    pages = pipeline.extract_clean_pages("doc.pdf")
+
+    assert [page["page"] for page in pages] == [1, 2, 3, 4]
+    assert pages[1] == {"page": 2, "text": "", "error": "OCR timed out"}
+    assert pipeline.join_pages(pages) == "First page text.\n\nThird page text."
+
+
+def test_extraction_error_is_returned(monkeypatch):
+    _extracted(monkeypatch, [ExtractionError("ERROR: Could not extract readable text from this PDF.")])
+
+    assert pipeline.extract_clean_pages("doc.pdf") == "ERROR: Could not extract readable text from this PDF."
+
+
+def test_simplify_pages_reports_failed_pages(monkeypatch):
+    monkeypatch.setattr(pipeline, "simplify_document", lambda key, text, *args, **kwargs: f"simple: {text}")
+    consumed = []
+
+    def pages():
+        for page in ({"page": 1, "text": "One."}, {"page": 2, "text": "", "error": "OCR timed out"}, {"page": 3, "text": "Three."}):
+            consumed.append(page["page"])
+            yield page
+
+    results = pipeline.simplify_pages("key", pages(), "English")
+
+    assert consumed == [1, 2, 3]
+    assert results == [
+        {"page": 1, "original_text": "One.", "simplified_text": "simple: One."},
+        {"page": 2, "original_text": "", "error": "OCR timed out"},
+        {"page": 3, "original_text": "Three.", "simplified_text": "simple: Three."},
+    ]
+
+
+def test_failed_pages_are_reported(monkeypatch):
+    pages = [{"page": 1, "text": "First page text."}, {"page": 2, "text": "", "error": "OCR timed out"}]
+    monkeypatch.setattr(pipeline, "extract_document", lambda *args, **kwargs: ("key", pipeline.join_pages(pages), pages))
+    monkeypatch.setattr(pipeline, "simplify_document", lambda *args, **kwargs: "Simple text.")
+
+    body, status_code = pipeline._process_file_url("url", "English", False, None, None, None, None, None, False)
+
+    assert status_code == 200
+    assert body["original_text"] == "First page text."
+    assert body["failed_pages"] == [{"page": 2, "error": "OCR timed out"}]
+
+
+def test_no_failed_pages_key_when_all_pages_are_read():
+    assert pipeline.add_failed_pages({}, [{"page": 1, "text": "Text."}]) == {}
+
+
+@pytest.fixture
+def streamed(monkeypatch):
+    """Streams a document whose pages are given to the returned function; returns its events and cache."""
+    result_cache = ResultCache(MemoryCache())
+    calls = []
+
+    @contextmanager
+    def fake_download(*args, **kwargs):
+        yield "doc.pdf", "key"
+
+    def fake_stream(text, language, check_quality=True):
+        calls.append(text)
+        yield f"simple: {text}"
+
+    monkeypatch.setattr(pipeline, "downloaded_document", fake_download)
+    monkeypatch.setattr(pipeline, "get_result_cache", lambda: result_cache)
+    monkeypatch.setattr(pipeline, "stream_simplify_and_translate", fake_stream)
+    monkeypatch.setattr(pipeline, "SIMPLIFY_CHUNK_TOKENS", 5)
+
+    def stream(pages):
+        monkeypatch.setattr(pipeline, "iter_downloaded_pages", lambda *args, **kwargs: iter(pages))
+        return list(pipeline.stream_process_file_url("url", "English")), result_cache, calls
+
+    return stream
+
+
+def test_stream_never_drops_a_short_last_page(streamed):
+    first = "The first page has plenty of readable words in it."
+    events, result_cache, calls = streamed([{"page": 1, "text": first}, {"page": 2, "text": "End."}])
+
+    assert calls == [first, "End."]
+    name, body = events[-1]
+    assert name == "done"
+    assert body["simplified_text"] == f"simple: {first}\n\nsimple: End."
+    assert result_cache.get_result("key", "English", False) == body["simplified_text"]
+
+
+def test_stream_does_not_cache_a_refusal(streamed, monkeypatch):
+    monkeypatch.setattr(pipeline, "stream_simplify_and_translate", lambda *args, **kwargs: iter(["Simplification is impossible."]))
+
+    events, result_cache, _ = streamed([{"page": 1, "text": "The only page has plenty of readable words in it."}])
+
+    name, body = events[-1]
+    assert name == "error" and body["status_code"] == 422
+    assert result_cache.get_result("key", "English", False) is None
+
+
+@pytest.fixture
+def docx_with_image(tmp_path):
+    import docx
+    from PIL import Image
+
+    image_path = tmp_path / "scan.png"
+    Image.new("RGB", (400, 300), "white").save(image_path)
+    document = docx.Document()
+    document.add_paragraph("A notice with a scanned table below it.")
+    document.add_picture(str(image_path))
+    path = tmp_path / "notice.docx"
+    document.save(path)
+    return str(path)
+
+
+def test_overloaded_image_ocr_is_not_swallowed(docx_with_image, monkeypatch):
+    def overloaded(*args, **kwargs):
+        raise Overloaded("ocr", "timeout", 2)
+
+    monkeypatch.setattr(ocr, "ocr_image_page", overloaded)
+
+    with pytest.raises(Overloaded):
+        list(ocr.iter_pages_from_file(docx_with_image))
+
+
+def test_docx_with_a_failed_image_is_not_cached(docx_with_image, monkeypatch):
+    monkeypatch.setattr(ocr, "ocr_image_page", lambda *args, **kwargs: "ERROR: OCR timed out")
+    result_cache = ResultCache(MemoryCache())
+
+    pages = list(ocr.iter_pages_from_file(docx_with_image))
+    pipeline._cache_pages(result_cache, "key", False, "eng", pages)
+
+    assert pages == [{"page": 1, "text": "A notice with a scanned table below it.\n", "incomplete": True}]
+    assert result_cache.get_extracted("key", False, "eng") is None
@@ -0,0 +1,136 @@
+import io
+import threading
+import time
+
+import fitz
+import pytest
+from PIL import Image
+
+from app.services import ocr
+from app.services.admission import Overloaded
+
+
+@pytest.fixture
+def pdf():
+    doc = fitz.open()
+    for _ in range(6):
+        doc.new_page()
+    yield doc
+    doc.close()
+
+
+@pytest.fixture
+def rendered(monkeypatch):
+    """Renders page n as b"page-n", failing for the page numbers in the returned set."""
+    broken = set()
+
+    def render(page):
+        if page.number in broken:
+            raise ValueError("cannot render")
+        return f"page-{page.number}".encode(), ".png"
+
+    monkeypatch.setattr(ocr, "render_page_for_ocr", render)
+    return broken
+
+
+def test_pages_come_back_in_order_while_ocr_runs_concurrently(pdf, rendered, monkeypatch):
+    running, peak = [0], [0]
+    lock = threading.Lock()
+
+    def ocr_page(image_bytes, **kwargs):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        # Later pages finish first.
+        time.sleep(0.05 * (6 - int(image_bytes.decode().split("-")[1])))
+        with lock:
+            running[0] -= 1
+        return f"text of {image_bytes.decode()}"
+
+    monkeypatch.setattr(ocr, "ocr_image_page", ocr_page)
+    progress = []
+
+    pages = list(ocr.ocr_pdf_pages(pdf, max_workers=3, progress=lambda *args: progress.append(args)))
+
+    assert pages == [(n, f"text of page-{n}", None) for n in range(6)]
+    assert 1 < peak[0] <= 3
+    assert sorted(progress) == [("ocr", done, 6) for done in range(1, 7)]
+
+
+def test_failed_pages_keep_their_place(pdf, rendered, monkeypatch):
+    rendered.add(1)
+
+    def ocr_page(image_bytes, **kwargs):
+        if image_bytes == b"page-3":
+            return "ERROR: No text found in the image."
+        if image_bytes == b"page-4":
+            raise RuntimeError("engine crashed")
+        return "text"
+
+    monkeypatch.setattr(ocr, "ocr_image_page", ocr_page)
+
+    pages = list(ocr.ocr_pdf_pages(pdf, max_workers=2, page_numbers=[0, 1, 3, 4, 5]))
+
+    assert pages == [
+        (0, "text", None),
+        (1, "", "render failed: cannot render"),
+        (3, "", "No text found in the image."),
+        (4, "", "engine crashed"),
+        (5, "text", None),
+    ]
+
+
+def test_overloaded_ocr_is_raised(pdf, rendered, monkeypatch):
+    def ocr_page(image_bytes, **kwargs):
+        raise Overloaded("ocr", "timeout", 3)
+
+    monkeypatch.setattr(ocr, "ocr_image_page", ocr_page)
+
+    with pytest.raises(Overloaded):
+        list(ocr.ocr_pdf_pages(pdf, max_workers=2))
+
+
+def _png():
+    buffer = io.BytesIO()
+    Image.new("RGB", (200, 280), "white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def mixed_pdf(tmp_path):
+    """A text page, a scanned page, a blank page and a scan with a short text overlay."""
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "This page has a real text layer with enough characters to read. " * 2)
+    doc.new_page().insert_image(fitz.Rect(0, 0, 595, 842), stream=_png())
+    doc.new_page()
+    scan = doc.new_page()
+    scan.insert_image(scan.rect, stream=_png())
+    scan.insert_text((72, 72), "Scanned by the office copier, page 4 of 4.")
+    path = tmp_path / "mixed.pdf"
+    doc.save(str(path))
+    doc.close()
+    return str(path)
+
+
+def test_pdf_pages_are_classified_individually(mixed_pdf):
+    with fitz.open(mixed_pdf) as doc:
+        sources = [ocr.classify_pdf_page(page)[0] for page in doc]
+
+    assert sources == ["text", "ocr", "empty", "ocr"]
+
+
+def test_only_image_pages_are_ocrd(mixed_pdf, rendered, monkeypatch):
+    ocrd = []
+
+    def ocr_page(image_bytes, **kwargs):
+        ocrd.append(image_bytes)
+        return f"OCR text of {image_bytes.decode()}"
+
+    monkeypatch.setattr(ocr, "ocr_image_page", ocr_page)
+
+    pages = list(ocr.iter_pdf_pages(mixed_pdf))
+
+    assert ocrd == [b"page-1", b"page-3"]
+    assert [(page["page"], page["source"]) for page in pages] == [(1, "text"), (2, "ocr"), (3, "empty"), (4, "ocr")]
+    assert pages[0]["text"].startswith("This page has a real text layer")
+    assert pages[3]["text"] == "OCR text of page-3"
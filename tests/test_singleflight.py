@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from app.services import singleflight
+from app.services.admission import Overloaded
+from app.services.singleflight import LocalFlights, SQLiteFlights, coalesce
+
+
+class Killed(BaseException):
+    """Stands in for GreenletExit and other BaseExceptions that end a leader."""
+
+
+def _leader_and_follower(flights, compute, follower_compute=lambda: pytest.fail("follower computed")):
+    """Runs a leader that waits until a follower has joined, returning what each got."""
+    started = threading.Event()
+    release = threading.Event()
+    outcomes = {}
+
+    def leader_compute():
+        started.set()
+        release.wait(5)
+        return compute()
+
+    def call(name, function):
+        try:
+            outcomes[name] = flights.run("key", function)
+        except BaseException as e:
+            outcomes[name] = e
+
+    leader = threading.Thread(target=call, args=("leader", leader_compute))
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call, args=("follower", follower_compute))
+    follower.start()
+    while not follower.is_alive():
+        time.sleep(0.01)
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+    return outcomes
+
+
+def test_followers_share_the_leaders_value():
+    flights = LocalFlights()
+
+    outcomes = _leader_and_follower(flights, lambda: 42)
+
+    assert outcomes == {"leader": (42, True), "follower": (42, False)}
+    assert len(flights) == 0
+
+
+def test_followers_get_the_leaders_exception():
+    flights = LocalFlights()
+
+    def fail():
+        raise ValueError("OCR failed")
+
+    outcomes = _leader_and_follower(flights, fail)
+
+    assert isinstance(outcomes["leader"], ValueError)
+    assert outcomes["follower"] is outcomes["leader"]
+    assert len(flights) == 0
+
+
+def test_followers_get_a_leaders_base_exception():
+    flights = LocalFlights()
+
+    def kill():
+        raise Killed()
+
+    outcomes = _leader_and_follower(flights, kill)
+
+    assert isinstance(outcomes["leader"], Killed)
+    assert outcomes["follower"] is outcomes["leader"]
+    assert len(flights) == 0
+
+
+def test_followers_of_an_overloaded_leader_run_it_themselves():
+    flights = LocalFlights()
+
+    def overloaded():
+        raise Overloaded("documents", "timeout", 5)
+
+    outcomes = _leader_and_follower(flights, overloaded, follower_compute=lambda: 42)
+
+    assert isinstance(outcomes["leader"], Overloaded)
+    assert outcomes["follower"] == (42, True)
+    assert len(flights) == 0
+
+
+def test_coalesce_runs_once_for_concurrent_callers():
+    calls = []
+    gate = threading.Event()
+
+    def compute():
+        calls.append(1)
+        gate.wait(5)
+        return {"text": "simple"}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(coalesce("test", "same-key", compute)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    gate.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"text": "simple"}] * 5
+
+
+@pytest.fixture
+def stores(tmp_path):
+    path = str(tmp_path / "flights.sqlite3")
+    return SQLiteFlights(path), SQLiteFlights(path)
+
+
+def test_other_workers_read_the_published_result(stores):
+    first, second = stores
+
+    assert first.acquire("key") == ("leader", None)
+    assert second.acquire("key") == ("running", None)
+    first.publish("key", {"text": "simple"})
+
+    assert second.acquire("key") == ("done", {"text": "simple"})
+
+
+def test_published_result_expires(stores, monkeypatch):
+    first, second = stores
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_RESULT_TTL", 0.05)
+
+    first.acquire("key")
+    first.publish("key", "value")
+    time.sleep(0.1)
+
+    assert second.acquire("key") == ("leader", None)
+
+
+def test_expired_lease_is_taken_over(stores, monkeypatch):
+    first, second = stores
+    monkeypatch.setattr(singleflight, "SINGLEFLIGHT_LEASE_SECONDS", 0.05)
+
+    first.acquire("key")
+    time.sleep(0.1)
+
+    assert second.acquire("key") == ("leader", None)
+
+
+def test_failed_leader_releases_its_lease(stores):
+    first, second = stores
+
+    first.acquire("key")
+    first.release("key")
+
+    assert second.acquire("key") == ("leader", None)
@@ -0,0 +1,69 @@
+import pytest
+
+from app.services.cleanup import TEXT_MIN_QUALITY, text_quality
+from app.services.gemini import OCR_FAILURE_MESSAGE
+from app.services.pipeline import check_extracted_text
+
+INVOICE = """INVOICE No. 2024/117
+Item | Qty | Rate | Amount
+Cement bags | 20 | 350.00 | 7,000.00
+Steel rods (12mm) | 15 | 1,250.50 | 18,757.50
+Sand (cu.ft) | 100 | 45.00 | 4,500.00
+Sub-total | | | 30,257.50
+GST @18% | | | 5,446.35
+Total | | | ₹35,703.85"""
+
+BORDERED_TABLE = """+------------+------------+---------+
+| Name       | Date       | Amount  |
++============+============+=========+
+| R. Sharma  | 12/03/2024 | 1,200   |
+| S. Patil   | 15/03/2024 | 950     |
++------------+------------+---------+"""
+
+NUMBERS = "2023-24 1,20,000 3.5% 45/2 12:30 0.75 Rs.500 ₹1,000 Q1 Q2 18% 2,450.00"
+
+HINDI = "यह एक सरकारी सूचना है। संपत्ति कर महीने के अंत तक जमा करना होगा। देर से भुगतान करने पर जुर्माना लगेगा।"
+MARATHI = "ही सूचना सर्व नागरिकांसाठी आहे. मालमत्ता कर महिन्याच्या शेवटपर्यंत भरणे आवश्यक आहे."
+DEVANAGARI_TABLE = "क्रमांक | नाम | राशि\n१ | रमेश | ₹१,२००\n२ | सुरेश | ₹९५०"
+ENGLISH = "The property tax must be paid before the end of the month."
+
+GIBBERISH = "~~ |\\ ;;: @#% ^^ &*( )_+ =-` '' \"\" ,.<> ?/ }{ ][ l1I| ~` ^% $# @!"
+STRAY_MARKS = "i l . , ' ` ~ - _ | ! 1 i l j ; : ' \" , . i l"
+
+
+@pytest.mark.parametrize("text", [INVOICE, BORDERED_TABLE, NUMBERS, HINDI, MARATHI, DEVANAGARI_TABLE, ENGLISH])
+def test_real_text_clears_the_gate_with_margin(text):
+    assert text_quality(text) >= TEXT_MIN_QUALITY + 0.25
+
+
+@pytest.mark.parametrize("text", [GIBBERISH, STRAY_MARKS])
+def test_noise_is_below_the_gate(text):
+    assert text_quality(text) < TEXT_MIN_QUALITY
+
+
+def test_empty_and_layout_only_text_scores_zero():
+    assert text_quality("") == 0.0
+    assert text_quality("| | +---+ ===") == 0.0
+
+
+def test_lone_latin_letters_are_noise_but_lone_devanagari_letters_are_words():
+    assert text_quality("x q z ~ ;") < TEXT_MIN_QUALITY
+    assert text_quality("व न क") >= TEXT_MIN_QUALITY
+
+
+@pytest.mark.parametrize("text", [INVOICE, BORDERED_TABLE, HINDI, DEVANAGARI_TABLE])
+def test_check_extracted_text_accepts_tables_and_devanagari(text):
+    assert check_extracted_text(text) is None
+
+
+def test_check_extracted_text_rejects_noise_with_its_score():
+    body, status_code = check_extracted_text(GIBBERISH)
+
+    assert status_code == 422
+    assert body["error"] == OCR_FAILURE_MESSAGE
+    assert body["quality"] < TEXT_MIN_QUALITY
+
+
+def test_check_extracted_text_rejects_errors_and_tiny_text():
+    assert check_extracted_text("ERROR: Could not extract readable text from this PDF.")[1] == 422
+    assert check_extracted_text("  ok ")[1] == 422